@@ -5,7 +5,7 @@ Generates:
 1) HTML digest
 2) DOCX digest
 Daily automated space news for IIRS employees
-LAST 24 HOURS ROLLING WINDOW
+NEW ITEMS SINCE THE LAST SUCCESSFUL RUN (24 HOURS ON FIRST RUN)
 """
 
 # =========================
@@ -13,15 +13,41 @@ LAST 24 HOURS ROLLING WINDOW
 # =========================
 import os
 import re
+import sys
 import html
+import gc
+import base64
+import hashlib
+import json
+import zlib
+import struct
+import zipfile
+import math
+import mmap
+import fcntl
 import time
+import argparse
+import resource
+import shutil
+import subprocess
+import tempfile
+import textwrap
+import threading
+import tracemalloc
+import multiprocessing
+import queue
 import email.utils
+import xml.etree.ElementTree as ET
 import requests
 import feedparser
 
 from io import BytesIO
+from itertools import islice
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime, date, timedelta, timezone
-from urllib.parse import urlparse, parse_qs, unquote, urljoin
+from urllib.parse import urlparse, urlunparse, parse_qs, parse_qsl, urlencode, unquote, urljoin, quote
 
 from bs4 import BeautifulSoup
 from newspaper import Article, Config
@@ -35,8 +61,10 @@ from docx.opc.constants import RELATIONSHIP_TYPE
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 
-
-print("🚀 Starting IIRS Daily Space Digest - LAST 24 HOURS WINDOW...")
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
 
 # =========================
@@ -51,49 +79,879 @@ NATIONAL_KEYWORDS = r'(?i)(isro|nrsc|nsil|chandrayaan| IIST |gaganyaan|pslv|glsv
 
 INTERNATIONAL_KEYWORDS = r'(?i)(nasa|esa|jaxa|cnsa|roscosmos|spacex|blue origin|artemis|starship|crew dragon|iss|international space station|hubble|james webb|mars rover|perseverance|insight|booster|orbital|launch|spacecraft|astronaut|spacewalk|satellite|mission|space agency)'
 
-REGIONAL_FEEDS = [
-    'https://www.amarujala.com/rss/uttarakhand.rss',
-    'https://khabardevbhoomi.com/feed/',
-    'https://devbhoomimedia.com/feed',
-    'https://pioneeredge.in/feed',
-    'https://www.livehindustan.com/uttarakhand/rss',
-    'https://timesofindia.indiatimes.com/city/delhi/rssfeeds/1311474.cms',
-    'https://indianexpress.com/section/cities/delhi/feed/',
-    'https://www.hindustantimes.com/cities/delhi-news/rssfeed/',
-]
+KEYWORD_PATTERNS = {
+    'regional': REGIONAL_KEYWORDS,
+    'national': NATIONAL_KEYWORDS,
+    'international': INTERNATIONAL_KEYWORDS,
+}
+
+# Editable feed registry: categories, their quotas and feeds. A feed URL may
+# contain {after}, filled in per run from the feed's watermark.
+FEED_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feeds.json')
+
+
+def load_feed_registry(path=FEED_REGISTRY_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        registry = json.load(f)
+
+    categories = []
+    for category in registry.get('categories', []):
+        feeds = []
+        for feed in category.get('feeds', []):
+            if isinstance(feed, str):
+                feed = {'url': feed}
+            if not feed.get('enabled', True):
+                continue
+            feeds.append({'url': feed['url'], 'priority': float(feed.get('priority', 1.0))})
+
+        keywords = category.get('keywords', category['name'])
+        categories.append({
+            'name': category['name'],
+            'label': f"{category.get('icon', '')} {category.get('label', category['name'].title())}".strip(),
+            'icon': category.get('icon', ''),
+            'keyword_pattern': KEYWORD_PATTERNS.get(keywords, keywords),
+            'max_articles': int(category.get('max_articles', 6)),
+            'edition': bool(category.get('edition', False)),
+            'feeds': feeds,
+        })
+
+    return categories
+
+
+def registry_feed_urls(registry):
+    return [feed['url'] for category in registry for feed in category['feeds']]
+
+
+# =========================
+# HTTP Helpers
+# =========================
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+HTTP_SESSION = requests.Session()
+
+# `timeout` bounds the wait for the server and then the whole body, so a host
+# that trickles or stalls mid-response costs at most about twice the timeout.
+# Bodies larger than MAX_RESPONSE_BYTES are abandoned rather than buffered.
+HTTP_TIMEOUT = 20
+MAX_RESPONSE_BYTES = 10 * 1024 * 1024
+
+
+class ResponseTooLarge(requests.RequestException):
+    pass
+
+
+def iter_response_body(response, chunk_size=65536, max_bytes=MAX_RESPONSE_BYTES, deadline=None):
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit() and int(length) > max_bytes:
+        response.close()
+        raise ResponseTooLarge(f"{length} bytes exceeds {max_bytes}")
+
+    # A read blocked on a stalled socket never returns to check the clock;
+    # the watchdog shuts the connection so it fails instead.
+    expired = threading.Event()
+
+    def expire():
+        expired.set()
+        getattr(response.raw, 'shutdown', response.close)()
+
+    watchdog = threading.Timer(deadline, expire) if deadline else None
+    if watchdog:
+        watchdog.daemon = True
+        watchdog.start()
+
+    received = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            received += len(chunk)
+            if received > max_bytes:
+                raise ResponseTooLarge(f"body exceeds {max_bytes} bytes")
+            if expired.is_set():
+                break
+            yield chunk
+        if expired.is_set():
+            raise requests.Timeout(f"body incomplete after {deadline}s")
+    except (requests.RequestException, OSError) as e:
+        if expired.is_set() and not isinstance(e, requests.Timeout):
+            raise requests.Timeout(f"body incomplete after {deadline}s") from e
+        raise
+    finally:
+        if watchdog:
+            watchdog.cancel()
+        response.close()
+
+
+def read_response(response, max_bytes=MAX_RESPONSE_BYTES, deadline=None):
+    response._content = b''.join(iter_response_body(response, max_bytes=max_bytes, deadline=deadline))
+    response._content_consumed = True
+    return response
+
+
+def http_get(url, headers=None, timeout=None, stream=False, max_bytes=MAX_RESPONSE_BYTES):
+    timeout = timeout or HTTP_TIMEOUT
+    request_headers = dict(DEFAULT_HEADERS)
+    if headers:
+        request_headers.update(headers)
+
+    if HTTP_ARCHIVE is None:
+        response = HTTP_SESSION.get(url, headers=request_headers, timeout=timeout, stream=True)
+        return response if stream else read_response(response, max_bytes, timeout)
+
+    key = archive_key(url, headers)
+    if HTTP_ARCHIVE.replaying:
+        return HTTP_ARCHIVE.replay(key)
+
+    try:
+        response = HTTP_SESSION.get(url, headers=request_headers, timeout=timeout, stream=True)
+        read_response(response, max_bytes, timeout)
+    except requests.RequestException as e:
+        HTTP_ARCHIVE.record(key, {'error': f"{type(e).__name__}: {e}"})
+        raise
+    HTTP_ARCHIVE.record_response(key, response)
+    return response
+
+
+def http_post(url, data, headers=None, timeout=20):
+    request_headers = dict(DEFAULT_HEADERS)
+    if headers:
+        request_headers.update(headers)
+
+    if HTTP_ARCHIVE is None:
+        return HTTP_SESSION.post(url, data=data, headers=request_headers, timeout=timeout)
+
+    key = 'POST ' + url + ' ' + hashlib.sha1(data.encode('utf-8')).hexdigest()
+    if HTTP_ARCHIVE.replaying:
+        return HTTP_ARCHIVE.replay(key)
+
+    try:
+        response = HTTP_SESSION.post(url, data=data, headers=request_headers, timeout=timeout)
+    except requests.RequestException as e:
+        HTTP_ARCHIVE.record(key, {'error': f"{type(e).__name__}: {e}"})
+        raise
+    HTTP_ARCHIVE.record_response(key, response)
+    return response
+
+
+def http_head(url, timeout=None):
+    # Follows redirects; the caller reads response.url.
+    timeout = timeout or HTTP_TIMEOUT / 2
+    if HTTP_ARCHIVE is None:
+        return HTTP_SESSION.head(url, headers=DEFAULT_HEADERS, timeout=timeout, allow_redirects=True)
+
+    key = 'HEAD ' + url
+    if HTTP_ARCHIVE.replaying:
+        return HTTP_ARCHIVE.replay(key)
+
+    try:
+        response = HTTP_SESSION.head(url, headers=DEFAULT_HEADERS, timeout=timeout, allow_redirects=True)
+    except requests.RequestException as e:
+        HTTP_ARCHIVE.record(key, {'error': f"{type(e).__name__}: {e}"})
+        raise
+    HTTP_ARCHIVE.record_response(key, response)
+    return response
+
+
+# =========================
+# HTTP Archive
+# =========================
+# --record-archive writes every exchange of a run into one file: zlib
+# records appended as they happen, then a compressed index and a fixed-size
+# footer pointing at it. --replay-archive reads the footer and index only and
+# seeks to each record on demand, so nothing touches the network and the
+# archive is never loaded whole.
+#
+#   ARCHIVE_MAGIC | record ... | index | <index offset: 8 bytes> ARCHIVE_FOOTER
+
+ARCHIVE_MAGIC = b'IIRSARC1'
+ARCHIVE_FOOTER = b'IIRSIDX1'
+ARCHIVE_META_KEY = '__meta__'
+
+HTTP_ARCHIVE = None
+
+
+def archive_key(url, headers=None):
+    key = 'GET ' + url
+    if headers and headers.get('Range'):
+        key += ' Range=' + headers['Range']
+    if headers and (headers.get('If-None-Match') or headers.get('If-Modified-Since')):
+        key += ' conditional'
+    return key
+
+
+def pack_archive_record(header, body=b''):
+    return zlib.compress(json.dumps(header, sort_keys=True).encode('utf-8') + b'\n' + body, 6)
+
+
+def unpack_archive_record(blob):
+    header, _, body = zlib.decompress(blob).partition(b'\n')
+    return json.loads(header), body
+
+
+class HttpArchiveWriter:
+    replaying = False
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.index = {}
+        self.lock = threading.Lock()
+        self.file = open(path, 'wb')
+        self.file.write(ARCHIVE_MAGIC)
+        self.record(ARCHIVE_META_KEY, meta)
+
+    def record(self, key, header, body=b''):
+        blob = pack_archive_record(dict(header, key=key), body)
+        with self.lock:
+            if key in self.index or self.file is None:
+                return
+            self.index[key] = [self.file.tell(), len(blob)]
+            self.file.write(blob)
+
+    def record_response(self, key, response):
+        self.record(key, {
+            'url': response.url,
+            'status': response.status_code,
+            'headers': dict(response.headers),
+            'encoding': response.encoding,
+        }, response.content)
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            index_offset = self.file.tell()
+            self.file.write(zlib.compress(json.dumps(self.index).encode('utf-8')))
+            self.file.write(struct.pack('>Q', index_offset) + ARCHIVE_FOOTER)
+            self.file.close()
+            self.file = None
+        print(f"📼 Recorded {len(self.index) - 1} exchanges to {self.path} "
+              f"({os.path.getsize(self.path) / 1024:.0f} KB)")
+
+
+class HttpArchiveReader:
+    replaying = True
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'rb')
+        if self.file.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+            raise ValueError(f"{path} is not a digest archive")
+
+        self.file.seek(-16, os.SEEK_END)
+        footer = self.file.read(16)
+        if footer[8:] != ARCHIVE_FOOTER:
+            raise ValueError(f"{path} has no index (recording was interrupted?)")
+        index_offset = struct.unpack('>Q', footer[:8])[0]
+        self.file.seek(index_offset)
+        index_end = os.path.getsize(path) - 16
+        self.index = json.loads(zlib.decompress(self.file.read(index_end - index_offset)))
+        self.meta = self.load(ARCHIVE_META_KEY)[0]
+        self.misses = 0
+
+    def load(self, key):
+        location = self.index.get(key)
+        if location is None:
+            return None
+        with self.lock:
+            self.file.seek(location[0])
+            blob = self.file.read(location[1])
+        return unpack_archive_record(blob)
+
+    def record(self, key, header, body=b''):
+        pass
+
+    def replay(self, key):
+        entry = self.load(key)
+        if entry is None:
+            self.misses += 1
+            raise requests.ConnectionError(f"not in archive: {key}")
+
+        header, body = entry
+        if header.get('error'):
+            raise requests.ConnectionError(header['error'])
+
+        response = requests.Response()
+        response.status_code = header['status']
+        response.headers = requests.structures.CaseInsensitiveDict(header['headers'])
+        response.url = header['url']
+        response.encoding = header['encoding']
+        response._content = body
+        response._content_consumed = True
+        return response
+
+    def close(self):
+        self.file.close()
+        print(f"📼 Replayed from {self.path} ({self.misses} requests not in archive)")
+
+
+def archived_call(name, arg, func):
+    # Non-HTTP lookups made by libraries with their own clients (the Google
+    # News decoder) are archived by result.
+    if HTTP_ARCHIVE is None:
+        return func()
+    key = f"{name} {arg}"
+    if HTTP_ARCHIVE.replaying:
+        entry = HTTP_ARCHIVE.load(key)
+        if entry is None:
+            HTTP_ARCHIVE.misses += 1
+            return None
+        return entry[0].get('result')
+    result = func()
+    HTTP_ARCHIVE.record(key, {'result': result})
+    return result
+
+
+# Frozen during replay so cutoffs, ranking, dates and file names match the
+# recorded run.
+RUN_CLOCK = None
+
+
+def run_now(tz=None):
+    if RUN_CLOCK is None:
+        return datetime.now(tz)
+    return RUN_CLOCK.astimezone(tz)
+
+
+# =========================
+# Run State
+# =========================
+
+STATE_DIR = os.environ.get('IIRS_DIGEST_STATE_DIR', '.digest_state')
+
+
+def state_path(name):
+    return os.path.join(STATE_DIR, name)
+
+
+# All JSON run state - watermarks, feed stats, extracts, the image index and
+# the rest - lives as named records in one file, .digest_state/state.snap:
+#   header   b'IIRSSNAP', format version
+#   records  compact JSON, appended on save
+#   index    JSON {name: [offset, length, crc32]}
+#   footer   index offset, length and crc32, b'SNAPEND!'
+# A save appends its record and a fresh index and footer; the newest intact
+# footer wins, so a torn write falls back to the one before. Opening maps the
+# file and reads only the index; a record is read, checked against its CRC
+# and decoded when it is loaded, so state a run never asks for costs nothing.
+# Once dead records pass half the file, the next save compacts it into a new
+# file, verifying every live record on the way. Image blobs, thumbnails and
+# the article archive stay plain files.
+SNAPSHOT_FILE = 'state.snap'
+SNAPSHOT_MAGIC = b'IIRSSNAP'
+SNAPSHOT_END = b'SNAPEND!'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8sI')
+SNAPSHOT_FOOTER = struct.Struct('<QII8s')
+SNAPSHOT_COMPACT_RATIO = 0.5
+SNAPSHOT_COMPACT_MIN_BYTES = 256 * 1024
+
+STATE_SNAPSHOT = None
+
+
+class SnapshotCorrupt(ValueError):
+    pass
+
+
+class StateSnapshot:
+    def __init__(self, path):
+        self.path = path
+        self.index = {}
+        self.file = None
+        self.map = None
+        self.size = 0
+        self.stamp = None
+        self.corrupt = None
+        self.lock = threading.RLock()
+        self.open()
+
+    def file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        if self.file is not None:
+            self.file.close()
+        self.file = self.map = None
+        self.index = {}
+        self.size = 0
+
+    def open(self):
+        self.close()
+        self.corrupt = None
+        self.stamp = self.file_stamp()
+        if self.stamp is None or self.stamp[1] == 0:
+            return
+        self.file = open(self.path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version = SNAPSHOT_HEADER.unpack_from(self.map, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise SnapshotCorrupt(f"not a version {SNAPSHOT_VERSION} snapshot")
+            self.index = self.read_index()
+        except (SnapshotCorrupt, struct.error, ValueError) as e:
+            print(f"⚠️ State snapshot {self.path} unreadable: {e}")
+            self.close()
+            self.corrupt = str(e)
+
+    def read_index(self):
+        # Walk back from the end to the newest footer whose index checks out.
+        end = self.size
+        while end >= SNAPSHOT_HEADER.size + SNAPSHOT_FOOTER.size:
+            offset, length, crc, magic = SNAPSHOT_FOOTER.unpack_from(self.map, end - SNAPSHOT_FOOTER.size)
+            if magic == SNAPSHOT_END and offset + length == end - SNAPSHOT_FOOTER.size and \
+                    zlib.crc32(self.map[offset:offset + length]) == crc:
+                return json.loads(self.map[offset:offset + length])
+            found = self.map.rfind(SNAPSHOT_END, 0, end - len(SNAPSHOT_END))
+            if found < 0:
+                break
+            end = found + len(SNAPSHOT_END)
+        raise SnapshotCorrupt("no intact index")
+
+    def refresh(self):
+        # Another process (a shard worker, say) may have saved since.
+        if self.file_stamp() != self.stamp:
+            self.open()
+
+    def __contains__(self, name):
+        with self.lock:
+            self.refresh()
+            return name in self.index
+
+    def names(self):
+        with self.lock:
+            self.refresh()
+            return dict(self.index)
+
+    def read(self, name):
+        offset, length, crc = self.index[name]
+        data = self.map[offset:offset + length]
+        if zlib.crc32(data) != crc:
+            raise SnapshotCorrupt(f"record {name} fails its checksum")
+        return data
+
+    def get(self, name):
+        with self.lock:
+            self.refresh()
+            return json.loads(self.read(name))
+
+    def put(self, name, data):
+        # data=None removes the record.
+        payload = None
+        if data is not None:
+            payload = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self.lock, open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.open()
+            if self.corrupt:
+                os.replace(self.path, self.path + '.corrupt')
+                print(f"⚠️ Set aside {self.path}.corrupt; starting a fresh snapshot")
+                self.open()
+            index = dict(self.index)
+            index.pop(name, None)
+            live = sum(length for _, length, _ in index.values()) + len(payload or b'')
+            if self.size > SNAPSHOT_COMPACT_MIN_BYTES and live < self.size * SNAPSHOT_COMPACT_RATIO:
+                self.compact(index, name, payload)
+            else:
+                self.append(index, name, payload)
+            self.open()
+
+    def write_index(self, f, index):
+        raw = json.dumps(index, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        offset = f.tell()
+        f.write(raw)
+        f.write(SNAPSHOT_FOOTER.pack(offset, len(raw), zlib.crc32(raw), SNAPSHOT_END))
+
+    def append(self, index, name, payload):
+        with open(self.path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION))
+            if payload is not None:
+                index[name] = [f.tell(), len(payload), zlib.crc32(payload)]
+                f.write(payload)
+            self.write_index(f, index)
+
+    def compact(self, index, name, payload):
+        tmp_path = self.path + '.tmp'
+        before = self.size
+        compacted = {}
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION))
+            for other in sorted(index):
+                try:
+                    data = self.read(other)
+                except SnapshotCorrupt as e:
+                    print(f"⚠️ Dropping state {other} from the snapshot: {e}")
+                    continue
+                compacted[other] = [f.tell(), len(data), index[other][2]]
+                f.write(data)
+            if payload is not None:
+                compacted[name] = [f.tell(), len(payload), zlib.crc32(payload)]
+                f.write(payload)
+            self.write_index(f, compacted)
+
+        # Read the new file back before it replaces the old one.
+        check = StateSnapshot(tmp_path)
+        try:
+            if check.corrupt or set(check.index) != set(compacted):
+                raise SnapshotCorrupt(f"compacted snapshot does not read back: {check.corrupt}")
+            for other in compacted:
+                check.read(other)
+        finally:
+            check.close()
+        os.replace(tmp_path, self.path)
+        print(f"🗜️ State snapshot compacted: {before / 1024:.0f} KB -> {os.path.getsize(self.path) / 1024:.0f} KB")
+
+
+def get_state_snapshot():
+    global STATE_SNAPSHOT
+    path = state_path(SNAPSHOT_FILE)
+    if STATE_SNAPSHOT is None or STATE_SNAPSHOT.path != path:
+        if STATE_SNAPSHOT is not None:
+            STATE_SNAPSHOT.close()
+        STATE_SNAPSHOT = StateSnapshot(path)
+    return STATE_SNAPSHOT
+
+
+def show_state(name=''):
+    snapshot = get_state_snapshot()
+    if name:
+        print(json.dumps(load_json_state(name), indent=1, sort_keys=True))
+        return
+    print(f"{snapshot.path}: {snapshot.size / 1024:.0f} KB")
+    for record_name, (offset, length, crc) in sorted(snapshot.names().items()):
+        print(f"{record_name:<32} {length / 1024:>9.1f} KB  crc {crc:08x}")
+
+
+def load_json_state(name, default=None):
+    # A plain JSON file from before the snapshot is read until its first save.
+    try:
+        snapshot = get_state_snapshot()
+        if name in snapshot:
+            return snapshot.get(name)
+        with open(state_path(name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable state {name}: {e}")
+        return default
+
+
+def save_json_state(name, data):
+    get_state_snapshot().put(name, data)
+    try:
+        os.remove(state_path(name))
+    except FileNotFoundError:
+        pass
 
-yesterday = (date.today() - timedelta(days=1)).strftime('%Y-%m-%d')
-google_isro = f'https://news.google.com/rss/search?q=ISRO+OR+NRSC+OR+IIRS+after:{yesterday}&hl=en-IN&gl=IN&-site:indianexpress.com&-site:thehindu.com&-site:timesofindia.indiatimes.com&-site:isro.gov.in&-site:economictimes.indiatimes.com'
-
-NATIONAL_FEEDS = [
-    'https://timesofindia.indiatimes.com/rssfeeds/1201659.cms',
-    'https://indianexpress.com/section/science/feed/',
-    'https://www.thehindu.com/sci-tech/science/rssfeed/',
-    'https://www.thehindu.com/news/national/rssfeed/',
-    'https://www.isro.gov.in/rssnews.xml',
-    'https://government.economictimes.indiatimes.com/rss/digital-india',
-    'https://government.economictimes.indiatimes.com/rss/policy',
-    'https://government.economictimes.indiatimes.com/rss/governance',
-    'https://government.economictimes.indiatimes.com/rss/smart-infra',
-    'https://government.economictimes.indiatimes.com/rss/Defence',
-    'https://government.economictimes.indiatimes.com/rss/economy',
-    google_isro
-]
 
-INTERNATIONAL_FEEDS = [
-    'https://www.esa.int/rss/rss-topnews.xml',
-    'https://www.esa.int/rss/programmes.xml',
-    'https://www.esa.int/rss/space_science.xml',
-    'https://www.esa.int/rss/earth_observation.xml',
-    'https://www.nasa.gov/rss/dyn/breaking_news.rss',
-    'https://www.nasa.gov/rss/dyn/images_of_the_day.rss',
-    'https://www.space.com/feeds/all',
-    'https://spaceflightnow.com/feed/',
-    'https://phys.org/rss-feed/space-news/',
-    'https://www.thespacereview.com/rss.xml',
-    'https://interestingengineering.com/feed',
+def delete_json_state(name):
+    save_json_state(name, None)
+
+
+# =========================
+# Google News Links
+# =========================
+# A news.google.com link is decoded in two steps: the article's RSS page
+# carries a signature and timestamp, and a batchexecute POST trades those
+# for the publisher URL. The POST takes many articles at once, so a run
+# costs one params fetch per distinct article (concurrent) plus one POST per
+# GNEWS_BATCH_SIZE articles, instead of a full round trip per link.
+
+GOOGLE_NEWS_BASE = os.environ.get('IIRS_GOOGLE_NEWS_BASE', 'https://news.google.com')
+GNEWS_BATCH_SIZE = 20
+GNEWS_WORKERS = 4
+GNEWS_MAX_RETRIES = 4
+GNEWS_BACKOFF_SECONDS = 2.0
+
+GNEWS_SIGNATURE = re.compile(r'data-n-a-sg="([^"]+)"')
+GNEWS_TIMESTAMP = re.compile(r'data-n-a-ts="([^"]+)"')
+GNEWS_CONTEXT = [
+    ["X", "X", ["X", "X"], None, None, 1, 1, "US:en", None, 1, None, None, None, None, None, 0, 1],
+    "X", "X", 1, [1, 1, 1], 1, 1, None, 0, 0, None, 0,
 ]
 
+# Decoded links for this run; every later lookup (DOCX included) is free.
+GNEWS_DECODED = {}
+GNEWS_FAILED = set()
+_GNEWS_LOCK = threading.Lock()
+_GNEWS_PAUSE_UNTIL = [0.0]
+GNEWS_REQUESTS = Counter()
+
+
+def google_news_article_id(url):
+    try:
+        parsed = urlparse(url)
+        path = parsed.path.split('/')
+        if parsed.hostname == 'news.google.com' and len(path) > 1 and path[-2] in ('articles', 'read'):
+            return path[-1] or None
+    except Exception:
+        pass
+    return None
+
+
+def gnews_request(send, kind):
+    # Throttling pauses every worker, not just the one that was told to wait.
+    delay = GNEWS_BACKOFF_SECONDS
+    for attempt in range(GNEWS_MAX_RETRIES + 1):
+        wait = _GNEWS_PAUSE_UNTIL[0] - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+        GNEWS_REQUESTS[kind] += 1
+        response = send()
+        if response.status_code not in (429, 503) or attempt == GNEWS_MAX_RETRIES:
+            response.raise_for_status()
+            return response
+
+        try:
+            pause = float(response.headers.get('Retry-After', ''))
+        except ValueError:
+            pause = delay
+        GNEWS_REQUESTS['throttled'] += 1
+        print(f"⏳ Google News throttled ({response.status_code}), pausing {pause:.1f}s")
+        with _GNEWS_LOCK:
+            _GNEWS_PAUSE_UNTIL[0] = max(_GNEWS_PAUSE_UNTIL[0], time.monotonic() + pause)
+        delay *= 2
+
+
+def fetch_gnews_params(article_id, source_url):
+    query = parse_qs(urlparse(source_url).query)
+    locale = '&'.join(
+        f"{name}={quote(query.get(name, [default])[0], safe='')}"
+        for name, default in (('hl', 'en-US'), ('gl', 'US'), ('ceid', 'US:en'))
+    )
+    url = f"{GOOGLE_NEWS_BASE}/rss/articles/{article_id}?{locale}"
+    try:
+        response = gnews_request(lambda: http_get(url), 'params')
+        signature = GNEWS_SIGNATURE.search(response.text)
+        timestamp = GNEWS_TIMESTAMP.search(response.text)
+        if signature and timestamp:
+            return signature.group(1), timestamp.group(1)
+    except Exception as e:
+        print(f"⚠️ Google News params failed for {article_id[:20]}...: {e}")
+    return None
+
+
+def build_gnews_batch(items):
+    envelopes = []
+    for request_id, article_id, timestamp, signature in items:
+        inner = ["garturlreq", GNEWS_CONTEXT, article_id,
+                 int(timestamp) if str(timestamp).isdigit() else timestamp, signature]
+        envelopes.append(["Fbv4je", json.dumps(inner, separators=(',', ':')), None, str(request_id)])
+    return 'f.req=' + quote(json.dumps([envelopes], separators=(',', ':')))
+
+
+def parse_gnews_batch(text):
+    body = text.split('\n\n', 1)[1] if '\n\n' in text else text
+    body = body.lstrip()
+    if body.startswith(")]}'"):
+        body = body[4:].lstrip()
+
+    decoded = {}
+    for row in json.loads(body):
+        if not (isinstance(row, list) and len(row) >= 3 and row[1] == 'Fbv4je'):
+            continue
+        payload = json.loads(row[2]) if isinstance(row[2], str) else row[2]
+        if isinstance(payload, list) and payload and payload[0] == 'garturlres':
+            request_id = next((str(cell) for cell in reversed(row[3:]) if cell is not None), None)
+            decoded[request_id] = payload[1]
+    return decoded
+
+
+def decode_gnews_batch(items):
+    url = f"{GOOGLE_NEWS_BASE}/_/DotsSplashUi/data/batchexecute"
+    body = build_gnews_batch(items)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded;charset=UTF-8'}
+    try:
+        response = gnews_request(lambda: http_post(url, body, headers=headers, timeout=30), 'batch')
+        return parse_gnews_batch(response.text)
+    except Exception as e:
+        print(f"⚠️ Google News batch of {len(items)} failed: {e}")
+        return {}
+
+
+def decode_google_news_urls(urls):
+    pending = {}
+    for url in unique(urls):
+        if url in GNEWS_DECODED or url in GNEWS_FAILED:
+            continue
+        article_id = google_news_article_id(url)
+        if article_id:
+            pending.setdefault(article_id, []).append(url)
+    if not pending:
+        return {url: GNEWS_DECODED.get(url, url) for url in urls}
+
+    ids = list(pending)
+    with ThreadPoolExecutor(max_workers=max(1, min(GNEWS_WORKERS, len(ids)))) as pool:
+        params = list(pool.map(lambda i: fetch_gnews_params(i, pending[i][0]), ids))
+
+    items = [
+        (n, article_id, found[1], found[0])
+        for n, (article_id, found) in enumerate(zip(ids, params)) if found
+    ]
+    decoded = {}
+    for start in range(0, len(items), GNEWS_BATCH_SIZE):
+        decoded.update(decode_gnews_batch(items[start:start + GNEWS_BATCH_SIZE]))
+
+    resolved = 0
+    with _GNEWS_LOCK:
+        for n, article_id in enumerate(ids):
+            target = decoded.get(str(n))
+            if target and target.startswith('http'):
+                resolved += 1
+                for url in pending[article_id]:
+                    GNEWS_DECODED[url] = target
+            else:
+                GNEWS_FAILED.update(pending[article_id])
+
+    print(f"🔓 Decoded {resolved}/{len(ids)} Google News links with "
+          f"{(len(items) + GNEWS_BATCH_SIZE - 1) // GNEWS_BATCH_SIZE} batch request(s)")
+    return {url: GNEWS_DECODED.get(url, url) for url in urls}
+
+
+# =========================
+# URL Canonicalization
+# =========================
+# One article reaches the feeds as a Google News redirect, an MSN wrapper,
+# an AMP page or a link with tracking parameters. normalize_url cleans a URL
+# but keeps it fetchable; canonical_key goes further (scheme, www/amp/m
+# hosts, AMP paths, trailing slash, query order) and is only used to spot
+# duplicates.
+
+# Only names no site uses for content: generic ones (ref, spm, ...) can
+# select the article on some hosts, so they stay.
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl',
+}
+AMP_PARAMS = {'amp', 'outputtype', 'amp_js_v', 'usqp'}
+AMP_PATH_PATTERN = re.compile(r'(/amp/?$|\.amp(?=\.html?$)|/amp(?=/))', re.I)
+HOST_VARIANT_PREFIXES = ('www.', 'amp.', 'm.', 'mobile.')
+
+# url -> canonical URL, for every URL seen this run (inputs and outputs).
+CANONICAL_URLS = {}
+
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+
+def normalize_url(url):
+    if not url or not url[:4].lower() == 'http':
+        return url
+    try:
+        parsed = urlparse(url.strip())
+        scheme = parsed.scheme.lower()
+        host = (parsed.hostname or '').rstrip('.')
+        port = parsed.port
+    except ValueError:
+        return url
+
+    netloc = host
+    if port and (scheme, port) not in (('http', 80), ('https', 443)):
+        netloc += f':{port}'
+    # Kept parameters stay byte for byte: re-encoding would turn ?a into ?a=
+    # or change escapes, and some servers treat those as different pages.
+    query = '&'.join(
+        segment for segment in parsed.query.split('&')
+        if segment and not is_tracking_param(unquote(segment.split('=', 1)[0].replace('+', ' ')))
+    )
+    return urlunparse((scheme, netloc, parsed.path or '/', parsed.params, query, ''))
+
+
+def canonical_key(url):
+    url = normalize_url(url)
+    if not url or not url.startswith('http'):
+        return url
+    parsed = urlparse(url)
+
+    host = parsed.hostname or ''
+    for prefix in HOST_VARIANT_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    path = AMP_PATH_PATTERN.sub('', parsed.path).rstrip('/') or '/'
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if name.lower() not in AMP_PARAMS
+    )
+    return host + path + ('?' + urlencode(query) if query else '')
+
+
+def trusted_canonical(url, canonical):
+    # Some sites point every page's rel=canonical at the homepage or at
+    # another domain; only follow it within the same site.
+    if not canonical or not canonical.startswith('http'):
+        return False
+    site = canonical_key(url).split('/', 1)[0]
+    target = canonical_key(canonical)
+    return target.split('/', 1)[0] == site and '/' in target and not target.endswith('/')
+
+
+def follow_redirects(url):
+    try:
+        response = http_head(url)
+        if response.status_code < 400 and response.url:
+            return response.url
+    except Exception:
+        pass
+    return url
+
+
+def canonicalize_article_url(url):
+    if not url or not url.startswith('http'):
+        return url
+    if url in CANONICAL_URLS:
+        return CANONICAL_URLS[url]
+
+    canonical = normalize_url(url)
+    if canonical not in CANONICAL_URLS:
+        canonical = normalize_url(follow_redirects(canonical))
+
+    page = EXTRACT_CACHE.get(canonical)
+    if page and trusted_canonical(canonical, page.get('canonical')):
+        canonical = normalize_url(page['canonical'])
+
+    CANONICAL_URLS[url] = CANONICAL_URLS[canonical] = canonical
+    return canonical
+
+
+def select_canonical_candidates(ranked, top_n, seen_keys):
+    # Resolve only as many as needed; when one turns out to be a duplicate,
+    # the next ranked candidate takes its place.
+    selected = []
+    position = 0
+    while len(selected) < top_n and position < len(ranked):
+        batch = ranked[position:position + top_n - len(selected)]
+        position += len(batch)
+
+        links = [candidate['link'] for candidate in batch]
+        decode_google_news_urls(links)
+        with ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, len(links)))) as pool:
+            finals = list(pool.map(resolve_final_article_url, links))
+
+        for candidate, final_link in zip(batch, finals):
+            key = canonical_key(final_link)
+            if key in seen_keys:
+                print(f"♻️ Same article as an earlier pick: {candidate['title'][:60]}")
+                continue
+            seen_keys.add(key)
+            selected.append((candidate, final_link))
+
+    return selected
+
 
 # =========================
 # Image Extraction Helpers
@@ -164,16 +1022,23 @@ def resolve_google_news_url(url):
     if not url or "news.google.com" not in url:
         return url
 
+    if url not in GNEWS_DECODED and url not in GNEWS_FAILED:
+        decode_google_news_urls([url])
+    if url in GNEWS_DECODED:
+        return GNEWS_DECODED[url]
+
+    # Links the batch protocol could not handle go once through the library.
+    GNEWS_DECODED[url] = url
     try:
-        decoded = gnewsdecoder(url)
+        decoded = archived_call('gnewsdecoder', url, lambda: gnewsdecoder(url))
         if isinstance(decoded, dict) and decoded.get("status"):
             decoded_url = decoded.get("decoded_url")
             if decoded_url and decoded_url.startswith("http"):
-                return decoded_url
+                GNEWS_DECODED[url] = decoded_url
     except:
         pass
 
-    return url
+    return GNEWS_DECODED[url]
 
 
 def resolve_msn_original_url(url):
@@ -181,55 +1046,11 @@ def resolve_msn_original_url(url):
         return url
 
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0',
-            'Accept-Language': 'en-US,en;q=0.9'
-        }
-        response = requests.get(url, headers=headers, timeout=20)
+        response = http_get(url)
         response.raise_for_status()
-        html_text = response.text
-
-        soup = BeautifulSoup(html_text, 'html.parser')
-
-        canonical = soup.find('link', rel='canonical')
-        if canonical and canonical.get('href'):
-            canon_url = canonical['href'].strip()
-            if canon_url.startswith('http') and 'msn.com' not in canon_url:
-                return canon_url
-
-        og_url = soup.find('meta', attrs={'property': 'og:url'})
-        if og_url and og_url.get('content'):
-            og_val = og_url['content'].strip()
-            if og_val.startswith('http') and 'msn.com' not in og_val:
-                return og_val
-
-        for tag in soup.find_all('meta'):
-            for attr in ['content', 'value']:
-                val = tag.get(attr)
-                if val and isinstance(val, str) and val.startswith('http'):
-                    if 'msn.com' not in val and 'assets.msn.com' not in val and 'static.msn.com' not in val:
-                        return val.strip()
-
-        candidates = re.findall(r'https?://[^\s"\'<>\\]+', html_text)
-        for cand in candidates:
-            cand = unquote(cand.strip())
-            if (
-                cand.startswith('http')
-                and 'msn.com' not in cand
-                and 'assets.msn.com' not in cand
-                and 'static.msn.com' not in cand
-                and not any(x in cand.lower() for x in ['facebook.com', 'twitter.com', 'instagram.com', 'youtube.com'])
-            ):
-                return cand
-
-        parsed = urlparse(url)
-        query = parse_qs(parsed.query)
-        for key in ['url', 'src', 'source', 'redirect', 'u']:
-            if key in query:
-                possible = unquote(query[key][0])
-                if possible.startswith('http') and 'msn.com' not in possible:
-                    return possible
-
+        original = run_parser(find_msn_original_url, url, response.content, response.encoding)
+        if original:
+            return original
     except Exception:
         pass
 
@@ -239,137 +1060,65 @@ def resolve_msn_original_url(url):
 def resolve_final_article_url(url):
     if not url:
         return url
+    if url in CANONICAL_URLS:
+        return CANONICAL_URLS[url]
 
-    if 'news.google.com' in url:
-        url = resolve_google_news_url(url)
+    resolved = url
+    if 'news.google.com' in resolved:
+        resolved = resolve_google_news_url(resolved)
 
-    if 'msn.com' in url:
-        url = resolve_msn_original_url(url)
+    if 'msn.com' in resolved:
+        resolved = resolve_msn_original_url(resolved)
 
-    return url
+    resolved = canonicalize_article_url(resolved)
+    CANONICAL_URLS[url] = resolved
+    return resolved
 
 
 def extract_image_from_raw_html(url):
-    try:
-        headers = {
-            "User-Agent": "Mozilla/5.0",
-            "Accept-Language": "en-US,en;q=0.9"
-        }
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-        html_text = response.text
-
-        patterns = [
-            r'<meta[^>]+property=["\']og:image["\'][^>]+content=["\']([^"\']+)["\']',
-            r'<meta[^>]+property=["\']og:image:url["\'][^>]+content=["\']([^"\']+)["\']',
-            r'<meta[^>]+name=["\']twitter:image["\'][^>]+content=["\']([^"\']+)["\']',
-            r'<meta[^>]+name=["\']twitter:image:src["\'][^>]+content=["\']([^"\']+)["\']',
-            r'<img[^>]+data-lazy-src=["\']([^"\']+)["\']',
-            r'<img[^>]+data-src=["\']([^"\']+)["\']',
-            r'<img[^>]+data-srcset=["\']([^"\']+)["\']',
-            r'<img[^>]+src=["\']([^"\']+)["\']'
-        ]
-
-        for pattern in patterns:
-            matches = re.findall(pattern, html_text, flags=re.I)
-            for match in matches:
-                img = match.strip().split()[0]
-                if img.startswith("//"):
-                    img = "https:" + img
-                elif img.startswith("/"):
-                    img = urljoin(url, img)
-                if is_valid_image_url(img):
-                    return img
-    except:
-        pass
-
+    page = get_page_extract(url)
+    if page and page['raw_html_images']:
+        return page['raw_html_images'][0]
     return None
 
 
 def extract_image_from_jsonld_or_scripts(url):
-    try:
-        headers = {
-            "User-Agent": "Mozilla/5.0",
-            "Accept-Language": "en-US,en;q=0.9"
-        }
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-        html_text = response.text
-
-        patterns = [
-            r'"image"\s*:\s*"([^"]+)"',
-            r'"thumbnailUrl"\s*:\s*"([^"]+)"',
-            r'"contentUrl"\s*:\s*"([^"]+)"',
-            r'"url"\s*:\s*"([^"]+\.(?:jpg|jpeg|png|webp))"'
-        ]
-
-        for pattern in patterns:
-            matches = re.findall(pattern, html_text, flags=re.I)
-            for img in matches:
-                img = img.replace("\\/", "/")
-                if img.startswith("//"):
-                    img = "https:" + img
-                elif img.startswith("/"):
-                    img = urljoin(url, img)
-                if is_valid_image_url(img):
-                    return img
-    except:
-        pass
-
+    page = get_page_extract(url)
+    if page and page['jsonld_images']:
+        return page['jsonld_images'][0]
     return None
 
 
 def extract_image_with_newspaper(url):
-    if not url or not url.startswith("http"):
-        return None
-
-    try:
-        config = Config()
-        config.browser_user_agent = 'Mozilla/5.0'
-        config.request_timeout = 20
-
-        article = Article(url, config=config)
-        article.download()
-        article.parse()
-
-        if article.top_image and article.top_image.startswith("http") and is_valid_image_url(article.top_image):
-            return article.top_image
-
-        if article.images:
-            images = []
-            for img in article.images:
-                if isinstance(img, str) and img.startswith("http") and is_valid_image_url(img):
-                    images.append(img)
-            if images:
-                images = sorted(images, key=score_image_url, reverse=True)
-                return images[0]
-    except:
-        pass
-
+    page = get_page_extract(url)
+    if page and page['newspaper_images']:
+        return page['newspaper_images'][0]
     return None
 
 
-def extract_first_image_url(entry, article_url=None):
-    article_url = resolve_final_article_url(article_url) if article_url else None
+MAX_IMAGE_CANDIDATES = 6
 
-    if article_url:
-        image = extract_image_with_newspaper(article_url)
-        if image:
-            return image
+# Cheapest first: the feed entry's own media costs nothing, the page <head>
+# one partial request, the full page a download and a newspaper parse. A
+# strategy only wins, and only counts a hit, if one of its images passes the
+# header probe. Per domain, a network strategy that has never found a usable
+# image after a few tries is skipped, except on every tenth article, when the
+# whole chain runs again.
+IMAGE_STRATEGIES = ('feed', 'head', 'page')
+IMAGE_STRATEGY_STATE = 'image_strategies.json'
+IMAGE_STRATEGY_MIN_TRIES = 3
+IMAGE_STRATEGY_RETRY_EVERY = 10
 
-        image = extract_image_from_raw_html(article_url)
-        if image:
-            return image
+IMAGE_STRATEGY_STATS = None
 
-        image = extract_image_from_jsonld_or_scripts(article_url)
-        if image:
-            return image
 
+def feed_image_candidates(entry, article_url=None):
+    candidates = []
     try:
         for item in entry.get("media_content", []):
             url = item.get("url")
             if is_valid_image_url(url):
-                return url
+                candidates.append(url)
     except:
         pass
 
@@ -377,7 +1126,7 @@ def extract_first_image_url(entry, article_url=None):
         for item in entry.get("media_thumbnail", []):
             url = item.get("url")
             if is_valid_image_url(url):
-                return url
+                candidates.append(url)
     except:
         pass
 
@@ -388,95 +1137,1574 @@ def extract_first_image_url(entry, article_url=None):
             rel = link.get("rel", "")
             if href and href.startswith("http") and (rel == "enclosure" or str(link_type).startswith("image/")):
                 if is_valid_image_url(href):
-                    return href
+                    candidates.append(href)
     except:
         pass
 
-    return None
+    return unique(candidates)
+
+
+def head_image_candidates(entry, article_url):
+    head = fetch_page_head(article_url)
+    return find_head_images(head, article_url) if head else []
+
+
+def page_image_candidates(entry, article_url):
+    # In order of trust: newspaper's pick, then raw HTML, then JSON-LD.
+    page = get_page_extract(article_url)
+    if not page:
+        return []
+    return unique(page['newspaper_images'] + page['raw_html_images'] + page['jsonld_images'])
+
+
+IMAGE_STRATEGY_FUNCTIONS = {
+    'feed': feed_image_candidates,
+    'head': head_image_candidates,
+    'page': page_image_candidates,
+}
+
+
+def image_domain(url):
+    host = urlparse(url).netloc.lower() if url else ''
+    return host[4:] if host.startswith('www.') else host
+
+
+class ImageStrategyStats:
+    def __init__(self, domains):
+        self.domains = domains
+        self.used = Counter()
+        self.delta = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        return cls(load_json_state(IMAGE_STRATEGY_STATE, {}) or {})
+
+    def plan(self, domain):
+        with self.lock:
+            stats = self.domains.get(domain, {})
+            if stats.get('articles', 0) % IMAGE_STRATEGY_RETRY_EVERY == IMAGE_STRATEGY_RETRY_EVERY - 1:
+                return list(IMAGE_STRATEGIES)
+            plan = [
+                name for name in IMAGE_STRATEGIES
+                if name == 'feed' or not (
+                    stats.get(name, [0, 0])[0] >= IMAGE_STRATEGY_MIN_TRIES and stats.get(name, [0, 0])[1] == 0
+                )
+            ]
+            return plan if len(plan) > 1 else list(IMAGE_STRATEGIES)
+
+    def record(self, domain, name, found):
+        with self.lock:
+            self.add(self.domains, domain, name, [1, int(found)])
+            self.add(self.delta, domain, name, [1, int(found)])
+
+    def finish(self, domain, winner):
+        with self.lock:
+            self.add(self.domains, domain, 'articles', 1)
+            self.add(self.delta, domain, 'articles', 1)
+            self.used[winner or 'none'] += 1
+
+    @staticmethod
+    def add(domains, domain, name, value):
+        stats = domains.setdefault(domain, {})
+        if isinstance(value, list):
+            stats[name] = [a + b for a, b in zip(stats.get(name, [0, 0]), value)]
+        else:
+            stats[name] = stats.get(name, 0) + value
+
+    def changes(self):
+        # A shard's counts, added to the stored ones by the merge.
+        with self.lock:
+            return {'domains': self.delta, 'used': dict(self.used)}
+
+    def merge(self, changes):
+        with self.lock:
+            for domain, stats in changes.get('domains', {}).items():
+                for name, value in stats.items():
+                    self.add(self.domains, domain, name, value)
+            self.used.update(changes.get('used', {}))
+
+    def save(self):
+        save_json_state(IMAGE_STRATEGY_STATE, self.domains)
+        self.delta = {}
+        if self.used:
+            found = ', '.join(f"{self.used[name]} {name}" for name in IMAGE_STRATEGIES + ('none',) if self.used[name])
+            print(f"🖼️ Image strategies: {found}")
+        self.used = Counter()
+
+
+def get_image_strategy_stats():
+    global IMAGE_STRATEGY_STATS
+    if IMAGE_STRATEGY_STATS is None:
+        IMAGE_STRATEGY_STATS = ImageStrategyStats.load()
+    return IMAGE_STRATEGY_STATS
+
+
+def usable_image_candidates(urls):
+    # Probes are cached, so screen_image_candidates does not repeat them.
+    cache = get_image_probes()
+    probes = cache.probe_all(urls)
+    return [url for url in unique(urls) if cache.verdict(probes[url]) is None]
+
+
+def extract_image_candidates(entry, article_url=None):
+    # Ranked list, best first: everything the first successful strategy
+    # found, then whatever else is already in hand - the feed's media, the
+    # page if it was fetched - as fallbacks for digest-level dedup.
+    article_url = resolve_final_article_url(article_url) if article_url else None
+    stats = get_image_strategy_stats()
+    domain = image_domain(article_url)
+
+    candidates = []
+    winner = None
+    for name in stats.plan(domain):
+        if name != 'feed' and not article_url:
+            continue
+        found = IMAGE_STRATEGY_FUNCTIONS[name](entry, article_url)
+        usable = usable_image_candidates(found) if found else []
+        stats.record(domain, name, bool(usable))
+        if usable:
+            candidates, winner = usable, name
+            break
+    stats.finish(domain, winner)
+
+    candidates = candidates + feed_image_candidates(entry)
+    if article_url and EXTRACT_CACHE.get(article_url):
+        candidates += page_image_candidates(entry, article_url)
+    return unique(candidates)[:MAX_IMAGE_CANDIDATES]
 
 
-def try_download_image(image_url, timeout=20):
+def extract_first_image_url(entry, article_url=None):
+    candidates = extract_image_candidates(entry, article_url)
+    return candidates[0] if candidates else None
+
+
+def try_download_image(image_url, timeout=None):
     if not image_url:
         return None
 
-    try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(image_url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        content_type = response.headers.get("Content-Type", "").lower()
+    record = get_image_store().get(image_url, timeout=timeout)
+    if not record:
+        return None
+    return get_image_store().open(record)
 
-        if "image" not in content_type:
-            return None
 
-        return BytesIO(response.content)
-    except Exception:
+def open_stored_image(image_url):
+    # Stored records read the blob an earlier run kept; only an image the
+    # store no longer has is downloaded again.
+    if not image_url:
         return None
+    store = get_image_store()
+    record = store.stored(image_url)
+    return store.open(record) if record else try_download_image(image_url)
 
 
 # =========================
-# Text Helpers
+# Page Extraction
 # =========================
+# CPU-bound parsing of downloaded pages. The functions here take raw HTML
+# bytes and return small picklable results, so they can run in a process
+# pool (--parse-workers) instead of serialising on the GIL.
+
+MIN_BODY_CHARS = 300
+
+RAW_HTML_IMAGE_PATTERNS = [
+    r'<meta[^>]+property=["\']og:image["\'][^>]+content=["\']([^"\']+)["\']',
+    r'<meta[^>]+property=["\']og:image:url["\'][^>]+content=["\']([^"\']+)["\']',
+    r'<meta[^>]+name=["\']twitter:image["\'][^>]+content=["\']([^"\']+)["\']',
+    r'<meta[^>]+name=["\']twitter:image:src["\'][^>]+content=["\']([^"\']+)["\']',
+    r'<img[^>]+data-lazy-src=["\']([^"\']+)["\']',
+    r'<img[^>]+data-src=["\']([^"\']+)["\']',
+    r'<img[^>]+data-srcset=["\']([^"\']+)["\']',
+    r'<img[^>]+src=["\']([^"\']+)["\']'
+]
 
-def clean_source_name(source_name):
-    if not source_name:
-        return "Unknown Source"
-    source_name = html.unescape(str(source_name))
-    return re.sub(r'\.\.\.$', '', source_name).strip()
+# What the <head> alone can tell: social-card meta and image_src links.
+HEAD_IMAGE_PATTERNS = RAW_HTML_IMAGE_PATTERNS[:4] + [
+    r'<link[^>]+rel=["\']image_src["\'][^>]+href=["\']([^"\']+)["\']'
+]
 
+JSONLD_IMAGE_PATTERNS = [
+    r'"image"\s*:\s*"([^"]+)"',
+    r'"thumbnailUrl"\s*:\s*"([^"]+)"',
+    r'"contentUrl"\s*:\s*"([^"]+)"',
+    r'"url"\s*:\s*"([^"]+\.(?:jpg|jpeg|png|webp))"'
+]
 
-def sanitize_filename(name):
-    return re.sub(r'[^a-zA-Z0-9_-]+', '_', name)
+ARTICLE_BODY_PATTERNS = [
+    r'<article[^>]*>(.*?)</article>',
+    r'<main[^>]*>(.*?)</main>',
+    r'<div[^>]+class=["\'][^"\']*(?:article|story|content|main-content|post-content|entry-content|td-post-content|news-detail|story-detail)[^"\']*["\'][^>]*>(.*?)</div>'
+]
 
+CANONICAL_LINK_PATTERN = r'<link[^>]+rel=["\']canonical["\'][^>]+href=["\']([^"\']+)["\']'
+AMPHTML_LINK_PATTERN = r'<link[^>]+rel=["\']amphtml["\'][^>]+href=["\']([^"\']+)["\']'
 
-def normalize_text(text):
-    if not text:
-        return ""
 
-    text = html.unescape(str(text))
+def decode_html(html_bytes, encoding=None):
+    try:
+        return html_bytes.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return html_bytes.decode('utf-8', errors='replace')
 
-    replacements = {
-        "\u2018": "'",
-        "\u2019": "'",
-        "\u201c": '"',
-        "\u201d": '"',
-        "\u2013": "-",
-        "\u2014": "-",
-        "\u00a0": " ",
-        "\u200b": "",
-        "\ufeff": "",
-        "\\|": "|",
-        "\\'": "'",
-        '\\"': '"',
-    }
 
-    for old, new in replacements.items():
-        text = text.replace(old, new)
+def unique(items):
+    seen = set()
+    result = []
+    for item in items:
+        if item and item not in seen:
+            seen.add(item)
+            result.append(item)
+    return result
+
+
+def find_raw_html_images(html_text, url):
+    images = []
+    for pattern in RAW_HTML_IMAGE_PATTERNS:
+        for match in re.findall(pattern, html_text, flags=re.I):
+            parts = match.strip().split()
+            if not parts:
+                continue
+            img = normalize_img_url(parts[0], url)
+            if is_valid_image_url(img):
+                images.append(img)
+    return unique(images)
+
+
+def find_jsonld_images(html_text, url):
+    images = []
+    for pattern in JSONLD_IMAGE_PATTERNS:
+        for match in re.findall(pattern, html_text, flags=re.I):
+            img = normalize_img_url(match, url)
+            if is_valid_image_url(img):
+                images.append(img)
+    return unique(images)
+
+
+def find_head_images(head_text, url):
+    images = []
+    for pattern in HEAD_IMAGE_PATTERNS:
+        for match in re.findall(pattern, head_text, flags=re.I):
+            img = normalize_img_url(match.strip(), url)
+            if is_valid_image_url(img):
+                images.append(img)
+    return unique(images + find_jsonld_images(head_text, url))
+
+
+def extract_body_with_regex(html_text):
+    raw_html = re.sub(r'<script.*?>.*?</script>', ' ', html_text, flags=re.I | re.S)
+    raw_html = re.sub(r'<style.*?>.*?</style>', ' ', raw_html, flags=re.I | re.S)
+
+    extracted = ''
+    for pattern in ARTICLE_BODY_PATTERNS:
+        matches = re.findall(pattern, raw_html, flags=re.I | re.S)
+        if matches:
+            flat = []
+            for m in matches[:2]:
+                if isinstance(m, tuple):
+                    flat.extend([x for x in m if x])
+                else:
+                    flat.append(m)
+            extracted = ' '.join(flat)
+            break
 
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = re.sub(r'\r\n?', '\n', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    if not extracted:
+        extracted = raw_html
 
-    return text.strip()
+    extracted = re.sub(r'</p>|<br\s*/?>|</div>|</section>|</article>|</li>|</h[1-6]>', '\n', extracted, flags=re.I)
+    extracted = re.sub(r'<li[^>]*>', '- ', extracted, flags=re.I)
+    extracted = re.sub(r'<[^>]+>', ' ', extracted)
 
+    return clean_body_text(extracted)
 
-def clean_body_text(text, title=""):
-    text = normalize_text(text)
-    if not text:
-        return ""
 
-    lines = [ln.strip() for ln in text.splitlines()]
+def parse_with_newspaper(url, html_text):
+    result = {'text': '', 'canonical': None, 'images': []}
+    try:
+        config = Config()
+        config.browser_user_agent = 'Mozilla/5.0'
+        config.request_timeout = 20
 
-    bad_phrases = [
-        "your browser does not support javascript",
-        "related articles",
-        "add asianet newsable as a preferred source",
-        "google news",
-        "follow us on",
-        "read more",
-        "advertisement",
-        "recommended stories",
-        "suggested articles",
-        "share this article",
+        article = Article(url, config=config)
+        article.download(input_html=html_text)
+        article.parse()
+
+        result['text'] = clean_body_text(article.text or '')
+
+        if article.canonical_link and article.canonical_link.startswith('http'):
+            result['canonical'] = article.canonical_link
+
+        images = []
+        if article.top_image and article.top_image.startswith("http") and is_valid_image_url(article.top_image):
+            images.append(article.top_image)
+        if article.images:
+            others = [
+                img for img in article.images
+                if isinstance(img, str) and img.startswith("http") and is_valid_image_url(img)
+            ]
+            images.extend(sorted(others, key=score_image_url, reverse=True))
+        result['images'] = unique(images)
+    except Exception:
+        pass
+    return result
+
+
+def extract_page(url, html_bytes, encoding=None):
+    html_text = decode_html(html_bytes, encoding)
+    result = {
+        'url': url,
+        'canonical': None,
+        'text': '',
+        'regex_text': '',
+        'newspaper_images': [],
+        'raw_html_images': find_raw_html_images(html_text, url),
+        'jsonld_images': find_jsonld_images(html_text, url),
+    }
+
+    canonical = re.search(CANONICAL_LINK_PATTERN, html_text, flags=re.I)
+    if canonical:
+        result['canonical'] = normalize_img_url(canonical.group(1), url)
+
+    parsed = parse_with_newspaper(url, html_text)
+    result['text'] = parsed['text']
+    result['newspaper_images'] = parsed['images']
+    if parsed['canonical']:
+        result['canonical'] = parsed['canonical']
+
+    # The regex pass is only needed when newspaper found too little text.
+    if len(result['text']) < 2 * MIN_BODY_CHARS:
+        result['regex_text'] = extract_body_with_regex(html_text)
+
+    return result
+
+
+def find_msn_original_url(url, html_bytes, encoding=None):
+    html_text = decode_html(html_bytes, encoding)
+    soup = BeautifulSoup(html_text, 'html.parser')
+
+    canonical = soup.find('link', rel='canonical')
+    if canonical and canonical.get('href'):
+        canon_url = canonical['href'].strip()
+        if canon_url.startswith('http') and 'msn.com' not in canon_url:
+            return canon_url
+
+    og_url = soup.find('meta', attrs={'property': 'og:url'})
+    if og_url and og_url.get('content'):
+        og_val = og_url['content'].strip()
+        if og_val.startswith('http') and 'msn.com' not in og_val:
+            return og_val
+
+    for tag in soup.find_all('meta'):
+        for attr in ['content', 'value']:
+            val = tag.get(attr)
+            if val and isinstance(val, str) and val.startswith('http'):
+                if 'msn.com' not in val and 'assets.msn.com' not in val and 'static.msn.com' not in val:
+                    return val.strip()
+
+    candidates = re.findall(r'https?://[^\s"\'<>\\]+', html_text)
+    for cand in candidates:
+        cand = unquote(cand.strip())
+        if (
+            cand.startswith('http')
+            and 'msn.com' not in cand
+            and 'assets.msn.com' not in cand
+            and 'static.msn.com' not in cand
+            and not any(x in cand.lower() for x in ['facebook.com', 'twitter.com', 'instagram.com', 'youtube.com'])
+        ):
+            return cand
+
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    for key in ['url', 'src', 'source', 'redirect', 'u']:
+        if key in query:
+            possible = unquote(query[key][0])
+            if possible.startswith('http') and 'msn.com' not in possible:
+                return possible
+
+    return None
+
+
+# =========================
+# Page Fetching
+# =========================
+
+PARSE_POOL = None
+FETCH_WORKERS = 4
+PAGE_SAVE_DIR = None
+
+# In-run memo: each article page is downloaded and parsed once, however many
+# image and body extractors ask for it.
+EXTRACT_CACHE = {}
+_SAVE_LOCK = threading.Lock()
+
+
+def parse_worker_ready():
+    return os.getpid()
+
+
+def start_parse_pool(workers):
+    # Workers come from a forkserver (spawn where there is none), never from a
+    # fork of this process once fetch threads hold locks; they are all started
+    # here, before the run opens any threads.
+    global PARSE_POOL
+    if workers and workers > 0:
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        PARSE_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        for future in [PARSE_POOL.submit(parse_worker_ready) for _ in range(workers)]:
+            future.result()
+        print(f"⚙️ Parsing pages in {workers} worker processes ({method})")
+
+
+def stop_parse_pool():
+    global PARSE_POOL
+    if PARSE_POOL is not None:
+        PARSE_POOL.shutdown()
+        PARSE_POOL = None
+
+
+def run_parser(func, *args):
+    if PARSE_POOL is None:
+        return func(*args)
+    return PARSE_POOL.submit(func, *args).result()
+
+
+def save_page_copy(url, content):
+    if not PAGE_SAVE_DIR:
+        return
+    name = sanitize_filename(url)[:120] + '.html'
+    with _SAVE_LOCK:
+        os.makedirs(PAGE_SAVE_DIR, exist_ok=True)
+        with open(os.path.join(PAGE_SAVE_DIR, name), 'wb') as f:
+            f.write(content)
+        with open(os.path.join(PAGE_SAVE_DIR, 'index.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'file': name, 'url': url}) + '\n')
+
+
+def get_page_extract(url):
+    if not url or not url.startswith("http"):
+        return None
+
+    if url in EXTRACT_CACHE:
+        return EXTRACT_CACHE[url]
+
+    store = get_extract_store()
+    result = None
+    try:
+        response = hedged_get(url, headers=store.validators(url))
+        if response.status_code != 304:
+            response.raise_for_status()
+            save_page_copy(url, response.content)
+        result = store.lookup(url, response)
+        if result is None and response.status_code != 304:
+            result = run_parser(extract_page, url, response.content, response.encoding)
+            store.put(url, response, result)
+    except Exception:
+        pass
+
+    EXTRACT_CACHE[url] = result
+    return result
+
+
+# Only the start of a page is read for its <head>; servers that honour Range
+# send no more than that, the rest are cut off once </head> arrives.
+HEAD_PROBE_BYTES = 65536
+PAGE_HEADS = {}
+
+
+def fetch_page_head(url):
+    if not url or not url.startswith("http"):
+        return None
+    if url in PAGE_HEADS:
+        return PAGE_HEADS[url]
+
+    head = None
+    try:
+        response = http_get(url, headers={'Range': f'bytes=0-{HEAD_PROBE_BYTES - 1}'}, stream=True)
+        if response.status_code in (200, 206):
+            data = bytearray()
+            chunks = iter_response_body(response, chunk_size=8192, deadline=HTTP_TIMEOUT)
+            try:
+                for chunk in chunks:
+                    data.extend(chunk)
+                    if len(data) >= HEAD_PROBE_BYTES or re.search(rb'</head\s*>', data, flags=re.I):
+                        break
+            finally:
+                chunks.close()
+            text = decode_html(bytes(data[:HEAD_PROBE_BYTES]), response.encoding)
+            head = re.split(r'</head\s*>', text, maxsplit=1, flags=re.I)[0]
+    except Exception:
+        pass
+
+    PAGE_HEADS[url] = head
+    return head
+
+
+def prefetch_page_extracts(urls):
+    # Downloads overlap in threads; parsing goes to the process pool if one
+    # is running, otherwise it runs in the fetching thread.
+    pending = [url for url in unique(urls) if url and url not in EXTRACT_CACHE]
+    if len(pending) < 2 or FETCH_WORKERS < 2:
+        return
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        list(pool.map(get_page_extract, pending))
+
+
+# =========================
+# Hedged Requests
+# =========================
+# With --hedge, a page fetch still running after the 95th percentile of past
+# fetch times is raced against an equivalent page: the AMP or canonical link
+# from the probed <head>, else the same URL on a fresh connection. The first
+# usable answer wins and the other is cut off. Hedges are capped at
+# HEDGE_MAX_FRACTION of page fetches. Record/replay never hedges.
+
+HEDGE_STATE = 'fetch_latency.json'
+HEDGE_PERCENTILE = 95
+HEDGE_INITIAL_DELAY = 2.0
+HEDGE_MIN_DELAY = 0.2
+HEDGE_MIN_SAMPLES = 10
+HEDGE_SAMPLES = 200
+HEDGE_MAX_FRACTION = 0.1
+
+HEDGING = False
+HEDGE_STATS = None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(pct / 100 * len(ordered))) - 1)] if ordered else 0.0
+
+
+class HedgeStats:
+    def __init__(self, samples):
+        self.samples = list(samples)[-HEDGE_SAMPLES:]
+        self.fresh = []
+        self.latencies = []
+        self.requests = 0
+        self.hedges = 0
+        self.wins = Counter()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        return cls((load_json_state(HEDGE_STATE, {}) or {}).get('samples', []))
+
+    def delay(self):
+        with self.lock:
+            if len(self.samples) < HEDGE_MIN_SAMPLES:
+                return HEDGE_INITIAL_DELAY
+            return max(HEDGE_MIN_DELAY, percentile(self.samples, HEDGE_PERCENTILE))
+
+    def start(self):
+        with self.lock:
+            self.requests += 1
+
+    def allow_hedge(self):
+        with self.lock:
+            if self.hedges + 1 > HEDGE_MAX_FRACTION * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def finish(self, elapsed, primary_elapsed, winner):
+        # A cancelled primary is known only to have taken at least this long.
+        with self.lock:
+            self.latencies.append(elapsed)
+            self.samples = (self.samples + [round(primary_elapsed, 3)])[-HEDGE_SAMPLES:]
+            self.fresh.append(round(primary_elapsed, 3))
+            self.wins[winner] += 1
+
+    def changes(self):
+        with self.lock:
+            return {'samples': self.fresh[-HEDGE_SAMPLES:], 'latencies': self.latencies,
+                    'requests': self.requests, 'hedges': self.hedges, 'wins': dict(self.wins)}
+
+    def merge(self, changes):
+        with self.lock:
+            self.samples = (self.samples + changes.get('samples', []))[-HEDGE_SAMPLES:]
+            self.latencies.extend(changes.get('latencies', []))
+            self.requests += changes.get('requests', 0)
+            self.hedges += changes.get('hedges', 0)
+            self.wins.update(changes.get('wins', {}))
+
+    def summary(self):
+        if not self.latencies:
+            return None
+        won = ', '.join(f"{count} {name}" for name, count in sorted(self.wins.items()) if name != 'primary')
+        return (f"p50 {percentile(self.latencies, 50):.2f} s, p95 {percentile(self.latencies, 95):.2f} s, "
+                f"max {max(self.latencies):.2f} s; {self.hedges}/{self.requests} hedged"
+                + (f", won by {won}" if won else ''))
+
+    def save(self):
+        save_json_state(HEDGE_STATE, {'samples': self.samples})
+        summary = self.summary()
+        if summary:
+            print(f"⏱️ Page fetches: {summary}")
+        self.latencies = []
+        self.fresh = []
+        self.requests = self.hedges = 0
+        self.wins = Counter()
+
+
+def get_hedge_stats():
+    global HEDGE_STATS
+    if HEDGE_STATS is None:
+        HEDGE_STATS = HedgeStats.load()
+    return HEDGE_STATS
+
+
+def hedge_variant(url):
+    head = PAGE_HEADS.get(url) or ''
+    for name, pattern in (('amp', AMPHTML_LINK_PATTERN), ('canonical', CANONICAL_LINK_PATTERN)):
+        match = re.search(pattern, head, flags=re.I)
+        if match:
+            variant = normalize_img_url(match.group(1).strip(), url)
+            if variant and variant != url:
+                return name, variant
+    return 'fresh', url
+
+
+def start_attempt(label, url, headers, results):
+    attempt = {'label': label, 'cancelled': threading.Event(), 'response': None, 'started': time.perf_counter()}
+
+    def run():
+        # The fresh-connection retry gets its own session and so its own socket.
+        session = HTTP_SESSION if label != 'fresh' else requests.Session()
+        request_headers = dict(DEFAULT_HEADERS)
+        request_headers.update(headers or {})
+        try:
+            response = session.get(url, headers=request_headers, timeout=HTTP_TIMEOUT, stream=True)
+            attempt['response'] = response
+            if attempt['cancelled'].is_set():
+                response.close()
+                raise requests.RequestException("cancelled")
+            outcome = read_response(response, MAX_RESPONSE_BYTES, HTTP_TIMEOUT)
+        except Exception as e:
+            outcome = e
+        finally:
+            if session is not HTTP_SESSION:
+                session.close()
+        results.put((attempt, outcome, time.perf_counter() - attempt['started']))
+
+    # Daemon threads: a loser stuck waiting for headers must not hold up exit.
+    threading.Thread(target=run, daemon=True).start()
+    return attempt
+
+
+def cancel_attempt(attempt):
+    attempt['cancelled'].set()
+    response = attempt['response']
+    if response is not None:
+        getattr(response.raw, 'shutdown', response.close)()
+
+
+def hedged_get(url, headers=None):
+    if not HEDGING or HTTP_ARCHIVE is not None:
+        return http_get(url, headers=headers)
+
+    stats = get_hedge_stats()
+    stats.start()
+    results = queue.Queue()
+    started = time.perf_counter()
+    attempts = [start_attempt('primary', url, headers, results)]
+
+    finished = []
+    try:
+        finished.append(results.get(timeout=stats.delay()))
+    except queue.Empty:
+        if stats.allow_hedge():
+            label, variant = hedge_variant(url)
+            # Validators belong to the primary URL's copy of the page.
+            attempts.append(start_attempt(label, variant, headers if variant == url else None, results))
+
+    winner = fallback = error = None
+    primary_elapsed = None
+    outstanding = list(attempts)
+    while outstanding:
+        attempt, outcome, elapsed = finished.pop() if finished else results.get()
+        outstanding.remove(attempt)
+        if attempt['label'] == 'primary':
+            primary_elapsed = elapsed
+        if isinstance(outcome, requests.Response) and outcome.status_code < 500:
+            winner = attempt['label'], outcome
+            break
+        if isinstance(outcome, requests.Response):
+            fallback = outcome
+        else:
+            error = outcome
+
+    for attempt in outstanding:
+        cancel_attempt(attempt)
+
+    elapsed = time.perf_counter() - started
+    stats.finish(elapsed, primary_elapsed if primary_elapsed is not None else elapsed,
+                 winner[0] if winner else 'none')
+    if winner:
+        return winner[1]
+    if fallback is not None:
+        return fallback
+    raise error
+
+
+# =========================
+# Extraction Cache
+# =========================
+# Page extracts outlive the run in the extracts.json state, keyed by final
+# URL with the page's ETag, Last-Modified and content hash. A later run sends
+# a conditional GET: a 304 skips download and parse, and a 200 whose body
+# hashes the same skips the parse. Least recently used pages are evicted once
+# the cache passes EXTRACT_STORE_MAX_BYTES.
+
+EXTRACT_STORE_STATE = 'extracts.json'
+EXTRACT_STORE_MAX_BYTES = 8 * 1024 * 1024
+
+EXTRACT_STORE = None
+_EXTRACT_STORE_LOCK = threading.Lock()
+
+
+class ExtractStore:
+    def __init__(self, data):
+        self.pages = data.get('pages', {})
+        self.totals = Counter(data.get('totals', {}))
+        self.counts = Counter()
+        self.touched = set()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        return cls(load_json_state(EXTRACT_STORE_STATE, {}) or {})
+
+    def validators(self, url):
+        with self.lock:
+            cached = self.pages.get(url)
+        if not cached:
+            return None
+        headers = {}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        return headers or None
+
+    def lookup(self, url, response):
+        # The cached extract if the response shows the page is unchanged.
+        with self.lock:
+            cached = self.pages.get(url)
+            if not cached:
+                self.counts['parsed'] += 1
+                return None
+            if response.status_code == 304:
+                outcome = 'revalidated'
+            elif cached['sha'] == hashlib.sha256(response.content).hexdigest():
+                outcome = 'unchanged'
+            else:
+                self.counts['parsed'] += 1
+                return None
+            self.counts[outcome] += 1
+            cached['used'] = run_now(timezone.utc).timestamp()
+            self.remember_validators(cached, response)
+            self.touched.add(url)
+            return cached['extract']
+
+    def remember_validators(self, cached, response):
+        # A 304 may omit them; keep what the 200 sent.
+        for field, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified')):
+            if response.headers.get(header):
+                cached[field] = response.headers[header]
+
+    def put(self, url, response, extract):
+        if not extract:
+            return
+        cached = {
+            'sha': hashlib.sha256(response.content).hexdigest(),
+            'used': run_now(timezone.utc).timestamp(),
+            'size': len(json.dumps(extract)),
+            'extract': extract,
+        }
+        self.remember_validators(cached, response)
+        with self.lock:
+            self.pages[url] = cached
+            self.touched.add(url)
+
+    def changes(self):
+        # What a shard stored or reused; the merge folds it into the store.
+        with self.lock:
+            return {
+                'pages': {url: self.pages[url] for url in sorted(self.touched) if url in self.pages},
+                'counts': dict(self.counts),
+            }
+
+    def merge(self, changes):
+        with self.lock:
+            self.pages.update(changes.get('pages', {}))
+            self.touched.update(changes.get('pages', {}))
+            self.counts.update(changes.get('counts', {}))
+
+    def evict(self):
+        total = sum(cached['size'] for cached in self.pages.values())
+        for url in sorted(self.pages, key=lambda u: self.pages[u]['used']):
+            if total <= EXTRACT_STORE_MAX_BYTES:
+                break
+            total -= self.pages.pop(url)['size']
+            self.counts['evicted'] += 1
+        return total
+
+    def flush(self):
+        # Mid-run write; the run's counts join the totals at save().
+        with self.lock:
+            self.evict()
+            save_json_state(EXTRACT_STORE_STATE, {'pages': self.pages, 'totals': dict(self.totals)})
+
+    def save(self):
+        total = self.evict()
+        self.totals.update(self.counts)
+        save_json_state(EXTRACT_STORE_STATE, {'pages': self.pages, 'totals': dict(self.totals)})
+
+        lookups = sum(self.counts[k] for k in ('revalidated', 'unchanged', 'parsed'))
+        if lookups:
+            hits = self.counts['revalidated'] + self.counts['unchanged']
+            overall = sum(self.totals[k] for k in ('revalidated', 'unchanged', 'parsed'))
+            overall_hits = self.totals['revalidated'] + self.totals['unchanged']
+            print(f"📄 Extract cache: {hits}/{lookups} pages reused ({self.counts['revalidated']} not modified, "
+                  f"{self.counts['unchanged']} same content), {self.counts['evicted']} evicted, "
+                  f"{len(self.pages)} kept ({total / 1024:.0f} KB); "
+                  f"all-time hit rate {100.0 * overall_hits / overall:.0f}%")
+        self.counts = Counter()
+        self.touched = set()
+
+
+def get_extract_store():
+    # First used from the prefetch threads; they must all get the same store.
+    global EXTRACT_STORE
+    with _EXTRACT_STORE_LOCK:
+        if EXTRACT_STORE is None:
+            EXTRACT_STORE = ExtractStore.load()
+    return EXTRACT_STORE
+
+
+# =========================
+# Image Store
+# =========================
+# Content-addressed: every image is kept once under images/<sha256>, with an
+# index mapping source URLs to blobs. A 64-bit difference hash (needs Pillow)
+# folds near-identical copies - the same stock render re-encoded or resized
+# by another outlet - onto the closest blob already stored. Hashes are indexed
+# by each of their 8 bytes: two within IMAGE_HASH_DISTANCE (< 8) bits share
+# at least one byte, so only blobs sharing one are compared. Once blobs pass
+# IMAGE_STORE_MAX_BYTES, the least recently used go, with their thumbnails.
+
+IMAGE_STORE_DIR = 'images'
+IMAGE_INDEX_STATE = 'images/index.json'
+IMAGE_HASH_DISTANCE = 6
+IMAGE_HASH_BANDS = 8
+IMAGE_STORE_MAX_BYTES = 256 * 1024 * 1024
+
+IMAGE_STORE = None
+
+
+def perceptual_hash(data):
+    if Image is None:
+        return None, None
+    try:
+        with Image.open(BytesIO(data)) as img:
+            size = img.size
+            small = img.convert('L').resize((9, 8), Image.LANCZOS)
+            pixels = small.tobytes()
+    except Exception:
+        return None, None
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    # A flat image has no gradients to compare; only exact matches count.
+    if bits == 0:
+        return None, size
+    return f'{bits:016x}', size
+
+
+def hash_distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def hash_bands(phash):
+    width = len(phash) // IMAGE_HASH_BANDS
+    return [f'{i}:{phash[i * width:(i + 1) * width]}' for i in range(IMAGE_HASH_BANDS)]
+
+
+class ImageStore:
+    def __init__(self, index):
+        self.urls = index.get('urls', {})
+        self.blobs = index.get('blobs', {})
+        self.failed = set()
+        self.lock = threading.Lock()
+        self.downloads = 0
+        self.hits = 0
+        self.evicted = 0
+        self.bands = {}
+        for sha, record in self.blobs.items():
+            self.index_hash(sha, record.get('phash'))
+
+    @classmethod
+    def load(cls):
+        return cls(load_json_state(IMAGE_INDEX_STATE, {}) or {})
+
+    def blob_path(self, sha):
+        return state_path(os.path.join(IMAGE_STORE_DIR, sha))
+
+    def record(self, sha):
+        record = self.blobs.get(sha)
+        if record and os.path.exists(self.blob_path(sha)):
+            return dict(record, sha=sha)
+        return None
+
+    def stored(self, url):
+        with self.lock:
+            sha = self.urls.get(url)
+            return self.record(sha) if sha else None
+
+    def index_hash(self, sha, phash):
+        if phash:
+            for band in hash_bands(phash):
+                self.bands.setdefault(band, set()).add(sha)
+
+    def unindex_hash(self, sha, phash):
+        if phash:
+            for band in hash_bands(phash):
+                shas = self.bands.get(band)
+                if shas is not None:
+                    shas.discard(sha)
+                    if not shas:
+                        del self.bands[band]
+
+    def find_similar(self, phash):
+        if not phash:
+            return None
+        near = []
+        for sha in set().union(*(self.bands.get(band, ()) for band in hash_bands(phash))):
+            distance = hash_distance(phash, self.blobs[sha]['phash'])
+            if distance <= IMAGE_HASH_DISTANCE and os.path.exists(self.blob_path(sha)):
+                near.append((distance, sha))
+        return min(near)[1] if near else None
+
+    def write_blob(self, sha, data, meta):
+        path = self.blob_path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        if sha in self.blobs:
+            self.unindex_hash(sha, self.blobs[sha].get('phash'))
+        self.blobs[sha] = meta
+        self.index_hash(sha, meta.get('phash'))
+
+    def archive_blob(self, url, record):
+        # Store hits and near-duplicate folds make no request of their own;
+        # archive the blob the run actually used so a replay matches it.
+        if HTTP_ARCHIVE is None:
+            return
+        if HTTP_ARCHIVE.replaying:
+            entry = HTTP_ARCHIVE.load('image ' + url)
+            if entry:
+                meta, data = entry
+                sha = meta.pop('sha')
+                with self.lock:
+                    if not self.record(sha):
+                        self.write_blob(sha, data, meta)
+                    self.urls[url] = sha
+        elif record:
+            HTTP_ARCHIVE.record('image ' + url, dict(record), self.open(record).getvalue())
+
+    def get(self, url, timeout=None):
+        if HTTP_ARCHIVE is not None and HTTP_ARCHIVE.replaying and url not in self.urls:
+            self.archive_blob(url, None)
+
+        with self.lock:
+            sha = self.urls.get(url)
+            record = self.record(sha) if sha else None
+            if url in self.failed:
+                return None
+        if record:
+            self.hits += 1
+            with self.lock:
+                self.blobs[sha]['used'] = run_now(timezone.utc).timestamp()
+            if HTTP_ARCHIVE is not None and not HTTP_ARCHIVE.replaying:
+                self.archive_blob(url, record)
+            return record
+
+        try:
+            response = http_get(url, timeout=timeout)
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").lower()
+            if "image" not in content_type:
+                raise ValueError(f"not an image: {content_type}")
+            data = response.content
+        except Exception:
+            with self.lock:
+                self.failed.add(url)
+            return None
+
+        sha = hashlib.sha256(data).hexdigest()
+        phash, size = perceptual_hash(data)
+
+        folded = False
+        with self.lock:
+            self.downloads += 1
+            if not self.record(sha):
+                similar = self.find_similar(phash)
+                if similar:
+                    sha = similar
+                    folded = True
+                else:
+                    self.write_blob(sha, data, {
+                        'phash': phash,
+                        'content_type': content_type,
+                        'bytes': len(data),
+                        'width': size[0] if size else None,
+                        'height': size[1] if size else None,
+                    })
+            self.urls[url] = sha
+            self.blobs[sha]['used'] = run_now(timezone.utc).timestamp()
+            record = self.record(sha)
+
+        if folded:
+            self.archive_blob(url, record)
+        return record
+
+    def open(self, record):
+        with open(self.blob_path(record['sha']), 'rb') as f:
+            return BytesIO(f.read())
+
+    def is_duplicate(self, record, used):
+        for other in used:
+            if record['sha'] == other['sha']:
+                return True
+            if record.get('phash') and other.get('phash') and \
+                    hash_distance(record['phash'], other['phash']) <= IMAGE_HASH_DISTANCE:
+                return True
+        return False
+
+    def evict(self):
+        # Blobs whose file is gone, then the least recently used over budget.
+        with self.lock:
+            gone = {sha for sha in self.blobs if not os.path.exists(self.blob_path(sha))}
+            total = sum(record.get('bytes') or 0 for sha, record in self.blobs.items() if sha not in gone)
+            for sha in sorted(set(self.blobs) - gone, key=lambda sha: (self.blobs[sha].get('used', 0), sha)):
+                if total <= IMAGE_STORE_MAX_BYTES:
+                    break
+                total -= self.blobs[sha].get('bytes') or 0
+                gone.add(sha)
+                self.evicted += 1
+                try:
+                    os.remove(self.blob_path(sha))
+                except FileNotFoundError:
+                    pass
+            for sha in gone:
+                self.unindex_hash(sha, self.blobs.pop(sha).get('phash'))
+            if gone:
+                self.urls = {url: sha for url, sha in self.urls.items() if sha not in gone}
+            return total
+
+    def save(self):
+        total = self.evict()
+        save_json_state(IMAGE_INDEX_STATE, {'urls': self.urls, 'blobs': self.blobs})
+        if self.evicted:
+            print(f"🖼️ Image store: {self.evicted} evicted, {len(self.blobs)} kept ({total / 1024 / 1024:.0f} MB)")
+            self.evicted = 0
+
+
+def get_image_store():
+    global IMAGE_STORE
+    if IMAGE_STORE is None:
+        IMAGE_STORE = ImageStore.load()
+    return IMAGE_STORE
+
+
+def dedupe_digest_images(news_items):
+    # Walk the digest in order; each item keeps its best candidate that does
+    # not repeat a picture already used higher up.
+    store = get_image_store()
+    used = []
+    swapped = dropped = 0
+
+    # Fallback candidates are only downloaded when the first choice clashes.
+    urls = unique((item.get('image_candidates') or [None])[0] for item in news_items)
+    if FETCH_WORKERS > 1 and len(urls) > 1:
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            list(pool.map(store.get, urls))
+
+    for item in news_items:
+        candidates = item.get('image_candidates')
+        if candidates is None:
+            # Already published (incremental runs): its picture stays taken.
+            record = store.get(item['image']) if item.get('image') else None
+            if record:
+                used.append(record)
+            continue
+
+        chosen = None
+        duplicates = 0
+        for url in candidates:
+            record = store.get(url)
+            if not record:
+                continue
+            if store.is_duplicate(record, used):
+                duplicates += 1
+                continue
+            chosen = url
+            used.append(record)
+            break
+
+        # Nothing downloadable means nothing to compare; leave the item alone.
+        if not duplicates:
+            if chosen:
+                item['image'] = chosen
+            continue
+
+        if chosen:
+            swapped += 1
+            print(f"🖼️ Duplicate image swapped: {item['title'][:50]}... -> {chosen}")
+        else:
+            dropped += 1
+            print(f"🖼️ Duplicate image dropped: {item['title'][:50]}...")
+        item['image'] = chosen
+
+    print(f"🖼️ Images: {len(used)} unique, {swapped} swapped, {dropped} dropped, "
+          f"{store.downloads} downloaded, {store.hits} from store")
+
+
+# =========================
+# Image Probing
+# =========================
+# URL hints cannot see a 1x1 tracker, a 120 px thumbnail or a dead link. Before
+# any full download, every candidate's first bytes are fetched (a Range
+# request, cut off as soon as the header is parsed) for its format and pixel
+# size; unusable ones are dropped and those of known size move ahead of the
+# rest. Images already in the store answer from their record. Results are
+# kept per URL in image_probes.json; failures only for the run.
+
+IMAGE_PROBE_STATE = 'image_probes.json'
+IMAGE_PROBE_BYTES = 65536
+IMAGE_PROBE_CHUNK = 4096
+IMAGE_PROBE_WORKERS = 8
+IMAGE_PROBE_CACHE_MAX = 5000
+IMAGE_MIN_WIDTH = 300
+IMAGE_MIN_HEIGHT = 150
+IMAGE_PROBE_FORMATS = ('jpeg', 'png', 'gif', 'webp')
+
+IMAGE_PROBES = None
+
+
+def parse_image_header(data):
+    # (format, width, height); the size is None while `data` stops short of it.
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        if len(data) >= 24 and data[12:16] == b'IHDR':
+            width, height = struct.unpack('>II', data[16:24])
+            return 'png', width, height
+        return 'png', None, None
+
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        if len(data) >= 10:
+            width, height = struct.unpack('<HH', data[6:10])
+            return 'gif', width, height
+        return 'gif', None, None
+
+    if data.startswith(b'\xff\xd8'):
+        # Walk the marker segments to the first start-of-frame.
+        i = 2
+        while i + 9 <= len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker == 0xFF:
+                i += 1
+                continue
+            if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                return 'jpeg', width, height
+            i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+        return 'jpeg', None, None
+
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        chunk = data[12:16]
+        if chunk == b'VP8 ' and len(data) >= 30:
+            width, height = struct.unpack('<HH', data[26:30])
+            return 'webp', width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L' and len(data) >= 25:
+            bits = int.from_bytes(data[21:25], 'little')
+            return 'webp', (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X' and len(data) >= 30:
+            return 'webp', int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        return 'webp', None, None
+
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'avif', None, None
+    if data.lstrip()[:5].lower() in (b'<?xml', b'<svg '):
+        return 'svg', None, None
+    return None, None, None
+
+
+def fetch_image_probe(url):
+    try:
+        response = http_get(url, headers={'Range': f'bytes=0-{IMAGE_PROBE_BYTES - 1}'}, stream=True)
+        if response.status_code not in (200, 206):
+            response.close()
+            return {'error': f"HTTP {response.status_code}"}
+        content_type = response.headers.get('Content-Type', '').lower()
+        if 'image' not in content_type:
+            response.close()
+            return {'error': f"not an image: {content_type}"}
+
+        data = bytearray()
+        fmt = width = None
+        chunks = iter_response_body(response, chunk_size=IMAGE_PROBE_CHUNK, deadline=HTTP_TIMEOUT)
+        try:
+            for chunk in chunks:
+                data.extend(chunk)
+                fmt, width, _ = parse_image_header(bytes(data))
+                if width is not None or len(data) >= IMAGE_PROBE_BYTES or (fmt is None and len(data) >= 32):
+                    break
+        finally:
+            chunks.close()
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+
+    fmt, width, height = parse_image_header(bytes(data))
+    return {'format': fmt, 'width': width, 'height': height, 'read': len(data)}
+
+
+class ImageProbeCache:
+    def __init__(self, probes):
+        self.probes = probes
+        self.failed = {}
+        self.fresh = set()
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    @classmethod
+    def load(cls):
+        return cls(load_json_state(IMAGE_PROBE_STATE, {}) or {})
+
+    def lookup(self, url):
+        with self.lock:
+            probe = self.failed.get(url) or self.probes.get(url)
+        # The image index is not part of a recording, so archived runs always probe.
+        if probe is None and HTTP_ARCHIVE is None:
+            store = get_image_store()
+            sha = store.urls.get(url)
+            record = store.record(sha) if sha else None
+            if record and record.get('width'):
+                fmt = (record.get('content_type') or '').split('/')[-1].split(';')[0].strip()
+                probe = {'format': 'jpeg' if fmt == 'jpg' else fmt, 'width': record['width'], 'height': record['height']}
+        return probe
+
+    def probe(self, url):
+        probe = self.lookup(url)
+        if probe is not None:
+            with self.lock:
+                self.counts['cached'] += 1
+            return probe
+
+        probe = fetch_image_probe(url)
+        with self.lock:
+            self.counts['probed'] += 1
+            self.counts['bytes'] += probe.get('read', 0)
+            if probe.get('error'):
+                self.failed[url] = probe
+            else:
+                self.probes.pop(url, None)
+                self.probes[url] = probe
+                self.fresh.add(url)
+        return probe
+
+    def probe_all(self, urls):
+        urls = unique(urls)
+        if len(urls) > 1:
+            with ThreadPoolExecutor(max_workers=min(IMAGE_PROBE_WORKERS, len(urls))) as pool:
+                return dict(zip(urls, pool.map(self.probe, urls)))
+        return {url: self.probe(url) for url in urls}
+
+    def changes(self):
+        with self.lock:
+            return {
+                'probes': {url: self.probes[url] for url in sorted(self.fresh) if url in self.probes},
+                'counts': dict(self.counts),
+            }
+
+    def merge(self, changes):
+        with self.lock:
+            for url, probe in changes.get('probes', {}).items():
+                self.probes.pop(url, None)
+                self.probes[url] = probe
+            self.counts.update(changes.get('counts', {}))
+
+    def verdict(self, probe):
+        # None for usable, else why not.
+        if probe.get('error'):
+            return 'error'
+        if probe.get('format') not in IMAGE_PROBE_FORMATS:
+            return 'format'
+        width, height = probe.get('width'), probe.get('height')
+        if width is not None and (width < IMAGE_MIN_WIDTH or height < IMAGE_MIN_HEIGHT):
+            return 'tracker' if width * height <= 4 else 'small'
+        return None
+
+    def save(self):
+        # Newest last; the oldest probes go first once the cache is full.
+        with self.lock:
+            keep = dict(list(self.probes.items())[-IMAGE_PROBE_CACHE_MAX:])
+        save_json_state(IMAGE_PROBE_STATE, keep)
+        if self.counts['probed'] or self.counts['cached']:
+            rejected = ', '.join(f"{self.counts[reason]} {reason}"
+                                 for reason in ('error', 'format', 'tracker', 'small') if self.counts[reason])
+            print(f"🔎 Image probes: {self.counts['probed']} probed ({self.counts['bytes'] / 1024:.0f} KB read), "
+                  f"{self.counts['cached']} cached; {self.counts['rejected']} rejected"
+                  + (f" ({rejected})" if rejected else ''))
+        self.counts = Counter()
+        self.fresh = set()
+
+
+def get_image_probes():
+    global IMAGE_PROBES
+    if IMAGE_PROBES is None:
+        IMAGE_PROBES = ImageProbeCache.load()
+    return IMAGE_PROBES
+
+
+def screen_image_candidates(news_items):
+    # One concurrent round of probes for every candidate of every item; each
+    # list keeps its order of trust, known-size images first.
+    items = [item for item in news_items if item.get('image_candidates')]
+    cache = get_image_probes()
+    probes = cache.probe_all([url for item in items for url in item['image_candidates']])
+
+    for item in items:
+        sized, unsized = [], []
+        for url in item['image_candidates']:
+            reason = cache.verdict(probes[url])
+            if reason:
+                cache.counts['rejected'] += 1
+                cache.counts[reason] += 1
+                continue
+            (sized if probes[url].get('width') else unsized).append(url)
+        item['image_candidates'] = sized + unsized
+        item['image'] = item['image_candidates'][0] if item['image_candidates'] else None
+
+
+# =========================
+# Thumbnails
+# =========================
+# The published page serves resized WebP/JPEG copies from assets/img next to
+# the HTML instead of hotlinking the originals. Variants are cached under the
+# state dir keyed by the blob's sha256, so each image is resized only once.
+# A blob's thumbnails go when the image store evicts the blob.
+
+THUMB_STATE_DIR = 'thumbs'
+THUMB_INDEX_STATE = 'thumbs/index.json'
+THUMB_WIDTHS = (400, 800, 1200)
+THUMB_DEFAULT_WIDTH = 800
+THUMB_SIZES = '(max-width: 768px) 95vw, 80vw'
+HTML_ASSET_DIR = 'assets'
+
+
+def save_thumbnail_variant(img, path, fmt):
+    tmp_path = path + '.tmp'
+    if fmt == 'webp':
+        img.save(tmp_path, 'WEBP', quality=75, method=4)
+    else:
+        img.save(tmp_path, 'JPEG', quality=78, optimize=True, progressive=True)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def make_thumbnail_set(store, record):
+    sha = record['sha']
+    with Image.open(store.open(record)) as original:
+        original = original.convert('RGB')
+        width, height = original.size
+        widths = sorted({min(w, width) for w in THUMB_WIDTHS})
+
+        os.makedirs(state_path(THUMB_STATE_DIR), exist_ok=True)
+        variants = []
+        for w in widths:
+            h = max(1, round(height * w / width))
+            resized = original.resize((w, h), Image.LANCZOS) if w != width else original
+            variant = {'w': w, 'h': h}
+            for fmt in ('webp', 'jpg'):
+                name = f'{sha[:20]}-{w}.{fmt}'
+                try:
+                    size = save_thumbnail_variant(resized, state_path(os.path.join(THUMB_STATE_DIR, name)), fmt)
+                except Exception:
+                    # Pillow built without WebP: JPEG only. A JPEG failure
+                    # drops the whole set and the page keeps the original.
+                    if fmt != 'webp':
+                        raise
+                    continue
+                variant[fmt] = name
+                variant[fmt + '_bytes'] = size
+            variants.append(variant)
+
+        tiny = original.resize((16, max(1, round(height * 16 / width))), Image.BILINEAR)
+        buffer = BytesIO()
+        tiny.save(buffer, 'JPEG', quality=40)
+        placeholder = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    return {'width': width, 'height': height, 'variants': variants, 'placeholder': placeholder}
+
+
+def publish_thumbnail(thumb, asset_dir):
+    img_dir = os.path.join(asset_dir, 'img')
+    os.makedirs(img_dir, exist_ok=True)
+    for variant in thumb['variants']:
+        for fmt in ('webp', 'jpg'):
+            name = variant.get(fmt)
+            if not name:
+                continue
+            target = os.path.join(img_dir, name)
+            if not os.path.exists(target):
+                shutil.copyfile(state_path(os.path.join(THUMB_STATE_DIR, name)), target)
+
+    # Every srcset needs its JPEG fallback; a set without one is not published.
+    variants = [v for v in thumb['variants'] if v.get('jpg')]
+    if not variants:
+        return None
+    base = f"{os.path.basename(asset_dir)}/img/"
+    default = min(variants, key=lambda v: abs(v['w'] - THUMB_DEFAULT_WIDTH))
+    return {
+        'width': default['w'],
+        'height': default['h'],
+        'src': base + default['jpg'],
+        'srcset_jpg': ', '.join(f"{base}{v['jpg']} {v['w']}w" for v in variants),
+        'srcset_webp': ', '.join(f"{base}{v['webp']} {v['w']}w" for v in variants if v.get('webp')),
+        'placeholder': thumb['placeholder'],
+        'bytes': default.get('webp_bytes') or default['jpg_bytes'],
+    }
+
+
+def prune_thumbnails(index, store):
+    with store.lock:
+        stale = [sha for sha in index if sha not in store.blobs]
+    for sha in stale:
+        for variant in index.pop(sha)['variants']:
+            for fmt in ('webp', 'jpg'):
+                if variant.get(fmt):
+                    try:
+                        os.remove(state_path(os.path.join(THUMB_STATE_DIR, variant[fmt])))
+                    except FileNotFoundError:
+                        pass
+    return len(stale)
+
+
+def prepare_thumbnails(news_items, asset_dir=HTML_ASSET_DIR):
+    if Image is None:
+        print("⚠️ Pillow not installed; HTML keeps hotlinked images")
+        return
+
+    store = get_image_store()
+    index = load_json_state(THUMB_INDEX_STATE, {}) or {}
+    made = reused = 0
+    original_bytes = thumb_bytes = 0
+
+    for item in news_items:
+        record = store.get(item['image']) if item.get('image') else None
+        if not record:
+            continue
+
+        sha = record['sha']
+        thumb = index.get(sha)
+        if thumb and all(v.get('jpg') and os.path.exists(state_path(os.path.join(THUMB_STATE_DIR, v['jpg'])))
+                         for v in thumb['variants']):
+            reused += 1
+        else:
+            try:
+                thumb = make_thumbnail_set(store, record)
+            except Exception as e:
+                print(f"⚠️ Thumbnail failed for {item['image']}: {e}")
+                continue
+            index[sha] = thumb
+            made += 1
+
+        published = publish_thumbnail(thumb, asset_dir)
+        if not published:
+            continue
+        item['thumbnail'] = published
+        original_bytes += record.get('bytes') or 0
+        thumb_bytes += item['thumbnail']['bytes']
+
+    pruned = prune_thumbnails(index, store)
+    save_json_state(THUMB_INDEX_STATE, index)
+    print(f"🖼️ Thumbnails: {made} generated, {reused} from cache" + (f", {pruned} pruned" if pruned else ''))
+    return original_bytes, thumb_bytes
+
+
+# =========================
+# Text Helpers
+# =========================
+
+def clean_source_name(source_name):
+    if not source_name:
+        return "Unknown Source"
+    source_name = html.unescape(str(source_name))
+    return re.sub(r'\.\.\.$', '', source_name).strip()
+
+
+def sanitize_filename(name):
+    return re.sub(r'[^a-zA-Z0-9_-]+', '_', name)
+
+
+def normalize_text(text):
+    if not text:
+        return ""
+
+    text = html.unescape(str(text))
+
+    replacements = {
+        "\u2018": "'",
+        "\u2019": "'",
+        "\u201c": '"',
+        "\u201d": '"',
+        "\u2013": "-",
+        "\u2014": "-",
+        "\u00a0": " ",
+        "\u200b": "",
+        "\ufeff": "",
+        "\\|": "|",
+        "\\'": "'",
+        '\\"': '"',
+    }
+
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\r\n?', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+
+    return text.strip()
+
+
+def clean_body_text(text, title=""):
+    text = normalize_text(text)
+    if not text:
+        return ""
+
+    lines = [ln.strip() for ln in text.splitlines()]
+
+    bad_phrases = [
+        "your browser does not support javascript",
+        "related articles",
+        "add asianet newsable as a preferred source",
+        "google news",
+        "follow us on",
+        "read more",
+        "advertisement",
+        "recommended stories",
+        "suggested articles",
+        "share this article",
         "click here",
     ]
 
@@ -542,16 +2770,39 @@ def sanitize_html_content(text):
 # News Timing
 # =========================
 
-def is_within_last_24_hours(entry):
-    now = datetime.now(timezone.utc)
-    cutoff_time = now - timedelta(hours=24)
+def parse_feed_date(date_str):
+    if not date_str:
+        return None
+
+    date_str = date_str.strip()
+
+    try:
+        parsed = email.utils.parsedate_to_datetime(date_str)
+    except (TypeError, ValueError, IndexError):
+        parsed = None
+
+    if parsed is None:
+        try:
+            parsed = datetime.fromisoformat(date_str)
+        except ValueError:
+            return None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    return parsed.astimezone(timezone.utc)
+
+
+def get_entry_published_time(entry):
+    published_dt = entry.get('published_dt')
+    if published_dt:
+        return published_dt
 
     pub_struct = entry.get('published_parsed') or entry.get('updated_parsed') or entry.get('created_parsed')
 
     if pub_struct:
         try:
-            pub_time = datetime(*pub_struct[:6], tzinfo=timezone.utc)
-            return pub_time >= cutoff_time
+            return datetime(*pub_struct[:6], tzinfo=timezone.utc)
         except:
             pass
 
@@ -561,77 +2812,739 @@ def is_within_last_24_hours(entry):
             parsed_tuple = email.utils.parsedate_tz(date_str)
             if parsed_tuple:
                 ts = email.utils.mktime_tz(parsed_tuple)
-                pub_time = datetime.fromtimestamp(ts, timezone.utc)
-                return pub_time >= cutoff_time
+                return datetime.fromtimestamp(ts, timezone.utc)
         except:
             pass
 
-    return False
+    return None
+
+
+def is_within_last_24_hours(entry, cutoff_time=None):
+    if cutoff_time is None:
+        cutoff_time = run_now(timezone.utc) - timedelta(hours=24)
+
+    pub_time = get_entry_published_time(entry)
+    if pub_time is None:
+        return False
+
+    return pub_time >= cutoff_time
 
 
 # =========================
-# Feed Fetching
+# Streaming Feed Parser
 # =========================
 
-def fetch_news_from_feeds(feeds, max_articles=6):
-    news = []
+FEED_ENTRY_LIMIT = 15
 
-    for url in feeds:
+MEDIA_NAMESPACE = 'http://search.yahoo.com/mrss/'
+
+FEED_ROOT_TAGS = ('rss', 'RDF', 'feed')
+FEED_ITEM_TAGS = ('item', 'entry')
+FEED_DATE_TAGS = ('pubDate', 'published', 'issued', 'date')
+
+
+class FeedEntry(dict):
+    # feedparser-compatible record: entry.title and entry.get('title') both work
+    __slots__ = ()
+
+    def __getattr__(self, name):
         try:
-            feed = feedparser.parse(url)
-            print(f"📱 {feed.feed.get('title', 'Unknown')} - checking...")
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
 
-            for entry in feed.entries[:15]:
-                if not is_within_last_24_hours(entry):
-                    continue
 
-                title_lower = entry.title.lower()
-                raw_summary = entry.get('summary', '') or entry.get('description', '')
-                summary_lower = raw_summary.lower()
-                full_text_check = title_lower + " " + summary_lower
+def split_xml_tag(tag):
+    if tag.startswith('{'):
+        namespace, _, name = tag[1:].partition('}')
+        return namespace, name
+    return '', tag
 
-                if url in REGIONAL_FEEDS:
-                    keyword_pattern = REGIONAL_KEYWORDS
-                elif url in NATIONAL_FEEDS:
-                    keyword_pattern = NATIONAL_KEYWORDS
-                else:
-                    keyword_pattern = INTERNATIONAL_KEYWORDS
 
-                if not re.search(keyword_pattern, title_lower):
-                    continue
+def add_media_item(element, name, media_content, media_thumbnail):
+    url = element.get('url')
+    if not url:
+        return
+    item = {'url': url}
+    if element.get('type'):
+        item['type'] = element.get('type')
+    if element.get('medium'):
+        item['medium'] = element.get('medium')
+    if name == 'thumbnail':
+        media_thumbnail.append(item)
+    else:
+        media_content.append(item)
+
+
+def feed_entry_from_element(element):
+    entry = FeedEntry()
+    links = []
+    media_content = []
+    media_thumbnail = []
+
+    for child in element:
+        namespace, name = split_xml_tag(child.tag)
+        text = (child.text or '').strip()
+
+        if namespace == MEDIA_NAMESPACE:
+            if name == 'group':
+                for media_child in child:
+                    _, media_name = split_xml_tag(media_child.tag)
+                    add_media_item(media_child, media_name, media_content, media_thumbnail)
+            else:
+                add_media_item(child, name, media_content, media_thumbnail)
+        elif name == 'title':
+            entry['title'] = text
+        elif name == 'link':
+            href = child.get('href')
+            if href:
+                rel = child.get('rel', 'alternate')
+                links.append({'href': href, 'rel': rel, 'type': child.get('type', '')})
+                if rel == 'alternate' and 'link' not in entry:
+                    entry['link'] = href
+            elif text:
+                entry['link'] = text
+        elif name in ('guid', 'id'):
+            entry['id'] = text
+        elif name in ('description', 'summary'):
+            entry.setdefault('summary', text)
+        elif name in FEED_DATE_TAGS:
+            entry.setdefault('published', text)
+        elif name in ('updated', 'modified'):
+            entry.setdefault('updated', text)
+        elif name == 'enclosure':
+            href = child.get('url')
+            if href:
+                links.append({'href': href, 'rel': 'enclosure', 'type': child.get('type', '')})
+
+    entry.setdefault('title', '')
+    entry.setdefault('link', entry.get('id', ''))
+    entry['links'] = links
+    if media_content:
+        entry['media_content'] = media_content
+    if media_thumbnail:
+        entry['media_thumbnail'] = media_thumbnail
+
+    published_dt = parse_feed_date(entry.get('published') or entry.get('updated'))
+    if published_dt:
+        entry['published_dt'] = published_dt
+        entry['published_parsed'] = published_dt.utctimetuple()
+
+    return entry
+
+
+# Lazily parses an RSS/Atom byte stream with an incremental XML parser.
+# Stops after `limit` entries, or at the first entry older than `cutoff_time`
+# while the entries seen so far are newest-first. Falls back to feedparser
+# when the document is not well-formed XML.
+class StreamingFeed:
+    def __init__(self, chunks, cutoff_time=None, limit=FEED_ENTRY_LIMIT, on_close=None):
+        self.feed = {}
+        self.used_fallback = False
+        self.stopped_early = False
+        self.cutoff_time = cutoff_time
+        self.limit = limit
+
+        self._chunks = iter(chunks)
+        self._on_close = on_close
+        self._raw = bytearray()
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._events = self._pull_events()
+        self._primed = []
+        self._fallback_entries = None
 
-                if re.search(EXCLUDED_KEYWORDS, full_text_check):
-                    print(f"🗑️ REMOVED (Excluded content): {entry.title[:40]}...")
-                    continue
+        try:
+            self._prime()
+        except ET.ParseError:
+            self._fall_back()
+
+    @classmethod
+    def from_bytes(cls, data, cutoff_time=None, limit=FEED_ENTRY_LIMIT, chunk_size=16384):
+        chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+        return cls(chunks, cutoff_time=cutoff_time, limit=limit)
+
+    def _pull_events(self):
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            self._raw.extend(chunk)
+            self._parser.feed(chunk)
+            yield from self._parser.read_events()
+        self._parser.close()
+        yield from self._parser.read_events()
+
+    def _prime(self):
+        # Read just far enough to know the feed title before handing out entries.
+        path = []
+        for event, element in self._events:
+            self._primed.append((event, element))
+            _, name = split_xml_tag(element.tag)
+
+            if len(self._primed) == 1 and name not in FEED_ROOT_TAGS:
+                raise ET.ParseError(f'not an RSS/Atom document: <{name}>')
+
+            if event == 'start':
+                if name in FEED_ITEM_TAGS:
+                    return
+                path.append(name)
+                continue
+
+            path.pop()
+            if name == 'title' and path and path[-1] in ('channel', 'feed'):
+                self.feed['title'] = (element.text or '').strip()
+                return
+
+    def _fall_back(self):
+        for chunk in self._chunks:
+            self._raw.extend(chunk)
+        self.close()
+
+        parsed = feedparser.parse(bytes(self._raw))
+        self.feed = parsed.feed
+        self.used_fallback = True
+        self._fallback_entries = parsed.entries
+
+    def _iter_elements(self):
+        yield from self._primed
+        self._primed = []
+        yield from self._events
+
+    def _iter_stream(self):
+        path = []
+        count = 0
+        newest_first = True
+        previous_time = None
+
+        for event, element in self._iter_elements():
+            _, name = split_xml_tag(element.tag)
+
+            if event == 'start':
+                path.append(name)
+                continue
+
+            if path:
+                path.pop()
+
+            if name == 'title' and path and path[-1] in ('channel', 'feed'):
+                self.feed.setdefault('title', (element.text or '').strip())
+                continue
+
+            if name not in FEED_ITEM_TAGS:
+                continue
+
+            entry = feed_entry_from_element(element)
+            element.clear()
+
+            pub_time = entry.get('published_dt')
+            if pub_time and previous_time and pub_time > previous_time:
+                newest_first = False
+            if pub_time:
+                previous_time = pub_time
+
+            if (
+                self.cutoff_time
+                and newest_first
+                and pub_time
+                and pub_time < self.cutoff_time
+            ):
+                self.stopped_early = True
+                return
 
-                original_link = entry.link
-                final_link = resolve_final_article_url(original_link)
+            count += 1
+            yield entry
 
-                image_url = extract_first_image_url(entry, final_link)
-                summary = sanitize_html_content(raw_summary)
-                title = re.sub(r'<[^>]+>', '', entry.title)
+            if count >= self.limit:
+                self.stopped_early = True
+                return
+
+    @property
+    def entries(self):
+        if self._fallback_entries is not None:
+            yield from self._fallback_entries[:self.limit]
+            return
+
+        seen = set()
+        try:
+            for entry in self._iter_stream():
+                seen.add(entry.get('id') or entry.get('link'))
+                yield entry
+        except ET.ParseError:
+            # Malformed part-way through: let feedparser's lenient parser
+            # recover the rest, skipping entries already handed out. Its
+            # entries need not line up with the stream's, so match by id.
+            self._fall_back()
+            count = len(seen)
+            for entry in self._fallback_entries:
+                if count >= self.limit:
+                    break
+                if (entry.get('id') or entry.get('link')) not in seen:
+                    count += 1
+                    yield entry
+        finally:
+            self.close()
+
+    def close(self):
+        if self._on_close:
+            self._on_close()
+            self._on_close = None
+
+
+# ETag/Last-Modified of feeds read in full by a run that published. Only the
+# service keeps them between runs: a refresh sends them back, and a feed
+# that has not changed costs a 304 and no parsing.
+FEED_VALIDATORS = {}
+PENDING_FEED_VALIDATORS = {}
+
+
+def remember_feed_validators(url, response):
+    validators = {}
+    if response.headers.get('ETag'):
+        validators['If-None-Match'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        validators['If-Modified-Since'] = response.headers['Last-Modified']
+    if validators:
+        PENDING_FEED_VALIDATORS[url] = validators
+
+
+def open_feed(url, cutoff_time=None, parser_mode='stream', limit=FEED_ENTRY_LIMIT, conditional=False):
+    headers = FEED_VALIDATORS.get(url) if conditional else None
+    response = http_get(url, headers=headers, stream=parser_mode == 'stream')
+    if response.status_code == 304:
+        response.close()
+        return feedparser.FeedParserDict(feed={'title': f"{url} (not modified)"}, entries=[])
+    response.raise_for_status()
+    remember_feed_validators(url, response)
+
+    if parser_mode == 'feedparser':
+        return feedparser.parse(response.content)
+
+    return StreamingFeed(
+        iter_response_body(response, chunk_size=16384, deadline=HTTP_TIMEOUT),
+        cutoff_time=cutoff_time,
+        limit=limit,
+        on_close=response.close
+    )
+
+
+# =========================
+# Feed Watermarks
+# =========================
+
+WATERMARK_STATE = 'watermarks.json'
+DEFAULT_WINDOW_HOURS = 24
+MAX_LOOKBACK_HOURS = 72
+MAX_SEEN_IDS = 200
+
+
+def entry_key(entry):
+    return entry.get('id') or entry.get('link') or entry.get('title', '')
+
+
+def expand_feed_url(url, cutoff_time):
+    return url.replace('{after}', cutoff_time.strftime('%Y-%m-%d'))
+
+
+# Per-feed high-water mark: the newest published time and entry id examined
+# by the last successful run. Each feed's lower bound is its mark (never older
+# than `earliest_cutoff`), or `default_cutoff` for feeds without one.
+class FeedWatermarks:
+    def __init__(self, marks, default_cutoff, earliest_cutoff):
+        self.marks = marks
+        self.default_cutoff = default_cutoff
+        self.earliest_cutoff = earliest_cutoff
+        self.updates = {}
+        self._newest = {}
+
+    @classmethod
+    def load(cls, now, catch_up_hours=None):
+        if catch_up_hours:
+            default_cutoff = earliest_cutoff = now - timedelta(hours=catch_up_hours)
+        else:
+            default_cutoff = now - timedelta(hours=DEFAULT_WINDOW_HOURS)
+            earliest_cutoff = now - timedelta(hours=MAX_LOOKBACK_HOURS)
+        return cls(load_json_state(WATERMARK_STATE, {}), default_cutoff, earliest_cutoff)
+
+    def mark_time(self, feed_key):
+        mark = self.marks.get(feed_key)
+        return parse_feed_date(mark.get('published')) if mark else None
+
+    def cutoff_for(self, feed_key):
+        mark_time = self.mark_time(feed_key)
+        if mark_time is None:
+            return self.default_cutoff
+        return max(mark_time, self.earliest_cutoff)
+
+    def is_seen(self, feed_key, entry):
+        mark = self.marks.get(feed_key)
+        if not mark:
+            return False
+
+        key = entry_key(entry)
+        if key in mark.get('seen_ids', []):
+            return True
+
+        return key == mark.get('entry_id') and get_entry_published_time(entry) == self.mark_time(feed_key)
+
+    def observe(self, feed_key, entry):
+        pub_time = get_entry_published_time(entry)
+        if pub_time is None:
+            return
+        newest = self._newest.get(feed_key)
+        if newest is None or pub_time > newest[0]:
+            self._newest[feed_key] = (pub_time, entry_key(entry))
+
+    def finish_feed(self, feed_key, complete, published_keys):
+        previous = self.marks.get(feed_key) or {
+            'published': self.cutoff_for(feed_key).isoformat(),
+            'entry_id': '',
+        }
+        newest = self._newest.get(feed_key)
+        previous_time = self.mark_time(feed_key)
+
+        if complete and newest and (previous_time is None or newest[0] >= previous_time):
+            record = {'published': newest[0].isoformat(), 'entry_id': newest[1], 'seen_ids': []}
+        else:
+            # Stopped at the quota part-way through the window: keep the old
+            # lower bound so unread entries are examined next run, and
+            # remember what was already published from it.
+            record = dict(previous)
+            seen_ids = list(previous.get('seen_ids', [])) + list(published_keys)
+            record['seen_ids'] = seen_ids[-MAX_SEEN_IDS:]
+
+        self.updates[feed_key] = record
+
+    def save(self):
+        if not self.updates:
+            return
+        merged = dict(self.marks)
+        merged.update(self.updates)
+        save_json_state(WATERMARK_STATE, merged)
+        print(f"💾 Watermarks updated for {len(self.updates)} feeds")
+
+
+# =========================
+# Feed Statistics
+# =========================
+
+FEED_STATS_STATE = 'feed_stats.json'
+STATS_DECAY = 0.3
+PRIOR_RUNS = 2
+PRIOR_YIELD = 1.0
+PRIOR_LATENCY = 2.0
+# How much a feed's track record moves its candidates' ranking scores.
+FEED_RANK_EXPONENT = 0.15
+FEED_RANK_MIN = 0.75
+FEED_RANK_MAX = 1.5
+
+
+def ewma(previous, value, decay=STATS_DECAY):
+    if previous is None:
+        return float(value)
+    return previous + decay * (value - previous)
+
+
+# Per-feed history across runs: entries that passed the filters, fetch
+# latency and error rate, kept as exponentially weighted averages. Feeds with
+# little history are smoothed towards an optimistic prior so they get read.
+class FeedStats:
+    def __init__(self, stats):
+        self.stats = stats
+        self.touched = set()
+
+    @classmethod
+    def load(cls):
+        return cls(load_json_state(FEED_STATS_STATE, {}))
+
+    def record(self, feed_key, passed=0, latency=None, error=False):
+        current = self.stats.setdefault(feed_key, {
+            'runs': 0, 'errors': 0, 'error_rate': 0.0, 'yield': None, 'latency': None,
+        })
+        current['runs'] += 1
+        current['errors'] += int(error)
+        current['error_rate'] += STATS_DECAY * (float(error) - current['error_rate'])
+        if not error:
+            current['yield'] = ewma(current['yield'], passed)
+        if latency is not None:
+            current['latency'] = ewma(current['latency'], latency)
+        current['last_run'] = run_now(timezone.utc).isoformat()
+        self.touched.add(feed_key)
+
+    def expected_rate(self, feed_key, priority=1.0):
+        current = self.stats.get(feed_key) or {}
+        successes = current.get('runs', 0) - current.get('errors', 0)
+
+        observed_yield = current.get('yield')
+        if observed_yield is None:
+            observed_yield, successes = PRIOR_YIELD, 0
+        expected_yield = (observed_yield * successes + PRIOR_YIELD * PRIOR_RUNS) / (successes + PRIOR_RUNS)
+
+        latency = current.get('latency')
+        if latency is None:
+            latency = PRIOR_LATENCY
+
+        reliability = 1.0 - current.get('error_rate', 0.0)
+        return priority * expected_yield * reliability / (latency + 1.0)
+
+    def order(self, feeds):
+        # Highest expected passing entries per second first; ties keep config order.
+        # The order only decides picks under --selection first. Rank mode reads
+        # every feed and scores all candidates, so there history counts through
+        # rank_weight instead.
+        ranked = sorted(
+            enumerate(feeds),
+            key=lambda pair: (-self.expected_rate(pair[1]['url'], pair[1]['priority']), pair[0])
+        )
+        return [feed for _, feed in ranked]
+
+    def rank_weight(self, feed_key):
+        # Expected rate against a feed with no history: a fresh feed scores
+        # 1.0, a prolific, fast and reliable one a little more.
+        prior = PRIOR_YIELD / (PRIOR_LATENCY + 1.0)
+        ratio = self.expected_rate(feed_key) / prior
+        if ratio <= 0:
+            return FEED_RANK_MIN
+        return max(FEED_RANK_MIN, min(FEED_RANK_MAX, ratio ** FEED_RANK_EXPONENT))
+
+    def save(self):
+        if self.touched:
+            save_json_state(FEED_STATS_STATE, self.stats)
 
-                news.append({
-                    'title': title,
-                    'link': final_link,
-                    'source': feed.feed.get('title', 'Space News'),
-                    'summary': summary,
-                    'image': image_url
-                })
 
-                print(f"✅ NEW (24h): {title[:60]}...")
-                print(f"🔗 Original link: {original_link}")
-                print(f"🔗 Final link: {final_link}")
-                print(f"🖼️ Image found: {image_url}")
+# =========================
+# Relevance Ranking
+# =========================
+
+TITLE_TERM_WEIGHT = 3
+RECENCY_HALF_LIFE_HOURS = 12.0
+MIN_RECENCY_FACTOR = 0.5
+
+
+# TF-IDF over the category's keyword vocabulary: each candidate is reduced to
+# the keyword terms it mentions (title terms weighted up), and terms that most
+# of today's candidates share ("launch") count for less than distinctive ones.
+def score_candidates(candidates, keyword_pattern, now=None):
+    if not candidates:
+        return candidates
+
+    if now is None:
+        now = run_now(timezone.utc)
+
+    matcher = re.compile(keyword_pattern)
+    term_counts = []
+    document_frequency = Counter()
+
+    for candidate in candidates:
+        counts = Counter()
+        # group(0): raw-regex keywords may carry groups, which findall would return instead.
+        for match in matcher.finditer(candidate['title']):
+            counts[match.group(0).strip().lower()] += TITLE_TERM_WEIGHT
+        for match in matcher.finditer(candidate['summary']):
+            counts[match.group(0).strip().lower()] += 1
+        term_counts.append(counts)
+        document_frequency.update(counts.keys())
+
+    total = len(candidates)
+    idf = {
+        term: math.log((1 + total) / (1 + df)) + 1.0
+        for term, df in document_frequency.items()
+    }
+
+    for candidate, counts in zip(candidates, term_counts):
+        relevance = sum((1.0 + math.log(count)) * idf[term] for term, count in counts.items())
+
+        recency = MIN_RECENCY_FACTOR
+        if candidate.get('published'):
+            age_hours = max((now - candidate['published']).total_seconds() / 3600.0, 0.0)
+            decay = 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+            recency = MIN_RECENCY_FACTOR + (1.0 - MIN_RECENCY_FACTOR) * decay
+
+        candidate['score'] = relevance * candidate.get('priority', 1.0) * candidate.get('feed_weight', 1.0) * recency
+
+    return candidates
+
+
+def rank_candidates(candidates, keyword_pattern, top_n=6, now=None):
+    started = time.perf_counter()
+    score_candidates(candidates, keyword_pattern, now=now)
+
+    ranked = sorted(
+        candidates,
+        key=lambda c: (-c['score'], -(c['published'].timestamp() if c.get('published') else 0), c['link'])
+    )
+
+    # Cheap duplicates go here, before any network: same title, or links that
+    # only differ by tracking parameters, AMP or host variants.
+    unique_ranked = []
+    seen = set()
+    for candidate in ranked:
+        keys = (canonical_key(candidate['link']), re.sub(r'\W+', ' ', candidate['title']).strip().lower())
+        if any(key in seen for key in keys):
+            continue
+        seen.update(keys)
+        unique_ranked.append(candidate)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"🏁 Ranked {len(candidates)} candidates in {elapsed_ms:.1f} ms, top {min(top_n, len(unique_ranked))}:")
+    for candidate in unique_ranked[:top_n]:
+        print(f"   {candidate['score']:6.2f}  {candidate['title'][:70]}")
+
+    return unique_ranked
+
+
+# =========================
+# Feed Fetching
+# =========================
+
+def iter_feed_candidates(url, keyword_pattern, feed_cutoff, parser_mode='stream', watermarks=None, priority=1.0):
+    feed = open_feed(
+        expand_feed_url(url, feed_cutoff), cutoff_time=feed_cutoff, parser_mode=parser_mode,
+        conditional=watermarks is not None
+    )
+    source = feed.feed.get('title', 'Space News')
+    print(f"📱 {feed.feed.get('title', 'Unknown')} - checking...")
+
+    for entry in islice(feed.entries, FEED_ENTRY_LIMIT):
+        if not is_within_last_24_hours(entry, feed_cutoff):
+            continue
+
+        if watermarks:
+            watermarks.observe(url, entry)
+            if watermarks.is_seen(url, entry):
+                continue
+
+        title_lower = entry.title.lower()
+        raw_summary = entry.get('summary', '') or entry.get('description', '')
+        summary_lower = raw_summary.lower()
+        full_text_check = title_lower + " " + summary_lower
+
+        if not re.search(keyword_pattern, title_lower):
+            continue
+
+        if re.search(EXCLUDED_KEYWORDS, full_text_check):
+            print(f"🗑️ REMOVED (Excluded content): {entry.title[:40]}...")
+            continue
+
+        yield {
+            'title': re.sub(r'<[^>]+>', '', entry.title),
+            'link': entry.link,
+            'source': source,
+            'summary': sanitize_html_content(raw_summary),
+            'published': get_entry_published_time(entry),
+            'priority': priority,
+            'feed': url,
+            'key': entry_key(entry),
+            'entry': entry,
+        }
+
+
+def enrich_candidate(candidate, final_link=None, image_candidates=None):
+    original_link = candidate['link']
+    if final_link is None:
+        final_link = resolve_final_article_url(original_link)
+    if image_candidates is None:
+        image_candidates = extract_image_candidates(candidate['entry'], final_link)
+    image_url = image_candidates[0] if image_candidates else None
+    title = candidate['title']
+
+    print(f"✅ NEW: {title[:60]}...")
+    print(f"🔗 Original link: {original_link}")
+    print(f"🔗 Final link: {final_link}")
+    print(f"🖼️ Image found: {image_url}")
+
+    return {
+        'title': title,
+        'link': final_link,
+        'source': candidate['source'],
+        'summary': candidate['summary'],
+        'image': image_url,
+        'image_candidates': image_candidates
+    }
+
+
+def enrich_candidates(selected):
+    # Image strategies may touch the network, so they run side by side; the
+    # items are still built (and printed) in ranking order.
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, len(selected)))) as pool:
+        image_lists = list(pool.map(lambda pair: extract_image_candidates(pair[0]['entry'], pair[1]), selected))
+    return [
+        enrich_candidate(candidate, final_link, image_candidates)
+        for (candidate, final_link), image_candidates in zip(selected, image_lists)
+    ]
+
+
+def fetch_news_from_feeds(feeds, max_articles=6, cutoff_time=None, parser_mode='stream', watermarks=None,
+                          keyword_pattern=INTERNATIONAL_KEYWORDS, feed_stats=None, selection='rank',
+                          seen_keys=None, candidates=None):
+    # `candidates`, if given, receives every entry that passed the filters.
+    news = []
+    if candidates is None:
+        candidates = []
+    if seen_keys is None:
+        seen_keys = set()
+
+    if cutoff_time is None:
+        cutoff_time = run_now(timezone.utc) - timedelta(hours=DEFAULT_WINDOW_HOURS)
+
+    for feed in feeds:
+        if isinstance(feed, str):
+            feed = {'url': feed, 'priority': 1.0}
+        url = feed['url']
+        # Taken before this fetch is recorded, so it reflects earlier runs only.
+        feed_weight = feed_stats.rank_weight(url) if feed_stats else 1.0
+
+        feed_cutoff = watermarks.cutoff_for(url) if watermarks else cutoff_time
+        published_keys = []
+        complete = True
+        started = time.perf_counter()
+        enrich_seconds = 0.0
+
+        try:
+            feed_candidates = iter_feed_candidates(
+                url, keyword_pattern, feed_cutoff,
+                parser_mode=parser_mode, watermarks=watermarks, priority=feed['priority']
+            )
+
+            for candidate in feed_candidates:
+                published_keys.append(candidate['key'])
+                candidate['feed_weight'] = feed_weight
+
+                if selection == 'rank':
+                    candidates.append(candidate)
+                    continue
+
+                enrich_started = time.perf_counter()
+                final_link = resolve_final_article_url(candidate['link'])
+                if canonical_key(final_link) not in seen_keys:
+                    seen_keys.add(canonical_key(final_link))
+                    news.append(enrich_candidate(candidate, final_link))
+                enrich_seconds += time.perf_counter() - enrich_started
 
                 if len(news) >= max_articles:
+                    complete = False
                     break
 
+            if watermarks:
+                watermarks.finish_feed(url, complete, published_keys)
+            if not complete:
+                # Entries past the quota are still unread; the next run must see them.
+                PENDING_FEED_VALIDATORS.pop(expand_feed_url(url, feed_cutoff), None)
+
+            if feed_stats:
+                latency = time.perf_counter() - started - enrich_seconds
+                feed_stats.record(url, passed=len(published_keys), latency=latency)
+
             if len(news) >= max_articles:
                 break
 
         except Exception as e:
             print(f"⚠️ Skip {url}: {e}")
+            PENDING_FEED_VALIDATORS.pop(expand_feed_url(url, feed_cutoff), None)
+            if feed_stats:
+                feed_stats.record(url, error=True, latency=time.perf_counter() - started - enrich_seconds)
+
+    if selection == 'rank':
+        ranked = rank_candidates(candidates, keyword_pattern, top_n=max_articles)
+        news = enrich_candidates(select_canonical_candidates(ranked, max_articles, seen_keys))
 
     return news
 
@@ -645,7 +3558,20 @@ def make_articles_html(news_list):
 
     for i, item in enumerate(news_list, 1):
         image_html = ''
-        if item.get("image"):
+        thumb = item.get("thumbnail")
+        if thumb:
+            webp_source = ''
+            if thumb["srcset_webp"]:
+                webp_source = f'<source type="image/webp" srcset="{thumb["srcset_webp"]}" sizes="{THUMB_SIZES}">'
+            image_html = (
+                f'<picture>{webp_source}'
+                f'<img src="{thumb["src"]}" srcset="{thumb["srcset_jpg"]}" sizes="{THUMB_SIZES}" '
+                f'width="{thumb["width"]}" height="{thumb["height"]}" alt="Space news image" '
+                f'class="card-image" loading="lazy" decoding="async" '
+                f'style="background-image:url({thumb["placeholder"]})" '
+                f'onerror="this.style.display=\'none\'"></picture>'
+            )
+        elif item.get("image"):
             image_html = (
                 f'<img src="{item["image"]}" alt="Space news image" '
                 f'class="card-image" loading="lazy" '
@@ -763,86 +3689,39 @@ def add_footer_to_section(section):
     paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
     paragraph.paragraph_format.space_before = Pt(6)
 
-    if paragraph.runs:
-        for run in paragraph.runs:
-            run.text = ""
-
-    add_top_border(paragraph, color="D9D9D9", size="6", space="4")
-
-    run = paragraph.add_run("Indian Institute of Remote Sensing (ISRO), Dehradun - 248001")
-    run.font.name = "Times New Roman"
-    run.font.size = Pt(9)
-
-
-def apply_footer_to_all_sections(doc):
-    for section in doc.sections:
-        add_footer_to_section(section)
-
-
-def fetch_full_article_text(url, fallback_summary="", title=""):
-    fallback_summary = clean_body_text(fallback_summary, title=title)
-
-    if not url or url == '#':
-        return fallback_summary
-
-    url = resolve_final_article_url(url)
-
-    try:
-        config = Config()
-        config.browser_user_agent = 'Mozilla/5.0'
-        config.request_timeout = 20
-
-        article = Article(url, config=config)
-        article.download()
-        article.parse()
+    if paragraph.runs:
+        for run in paragraph.runs:
+            run.text = ""
 
-        text = clean_body_text(article.text or '', title=title)
-        if len(text) >= 300:
-            return text
-    except Exception:
-        pass
+    add_top_border(paragraph, color="D9D9D9", size="6", space="4")
 
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-        raw_html = response.text
+    run = paragraph.add_run("Indian Institute of Remote Sensing (ISRO), Dehradun - 248001")
+    run.font.name = "Times New Roman"
+    run.font.size = Pt(9)
 
-        raw_html = re.sub(r'<script.*?>.*?</script>', ' ', raw_html, flags=re.I | re.S)
-        raw_html = re.sub(r'<style.*?>.*?</style>', ' ', raw_html, flags=re.I | re.S)
 
-        patterns = [
-            r'<article[^>]*>(.*?)</article>',
-            r'<main[^>]*>(.*?)</main>',
-            r'<div[^>]+class=["\'][^"\']*(?:article|story|content|main-content|post-content|entry-content|td-post-content|news-detail|story-detail)[^"\']*["\'][^>]*>(.*?)</div>'
-        ]
+def apply_footer_to_all_sections(doc):
+    # Continuous sections inherit the first section's footer through
+    # is_linked_to_previous; only unlinked sections need their own copy.
+    for section in doc.sections[1:]:
+        if not section.footer.is_linked_to_previous:
+            add_footer_to_section(section)
 
-        extracted = ''
-        for pattern in patterns:
-            matches = re.findall(pattern, raw_html, flags=re.I | re.S)
-            if matches:
-                flat = []
-                for m in matches[:2]:
-                    if isinstance(m, tuple):
-                        flat.extend([x for x in m if x])
-                    else:
-                        flat.append(m)
-                extracted = ' '.join(flat)
-                break
 
-        if not extracted:
-            extracted = raw_html
+def fetch_full_article_text(url, fallback_summary="", title=""):
+    fallback_summary = clean_body_text(fallback_summary, title=title)
 
-        extracted = re.sub(r'</p>|<br\s*/?>|</div>|</section>|</article>|</li>|</h[1-6]>', '\n', extracted, flags=re.I)
-        extracted = re.sub(r'<li[^>]*>', '- ', extracted, flags=re.I)
-        extracted = re.sub(r'<[^>]+>', ' ', extracted)
+    if not url or url == '#':
+        return fallback_summary
 
-        extracted = clean_body_text(extracted, title=title)
+    url = resolve_final_article_url(url)
 
-        if len(extracted) >= 300:
-            return extracted
-    except Exception:
-        pass
+    page = get_page_extract(url)
+    if page:
+        for text in (page['text'], page['regex_text']):
+            text = clean_body_text(text, title=title)
+            if len(text) >= MIN_BODY_CHARS:
+                return text
 
     return fallback_summary
 
@@ -853,7 +3732,6 @@ def add_article_body_in_two_columns(doc, paragraphs):
 
     col_section = doc.add_section(WD_SECTION.CONTINUOUS)
     set_section_columns(col_section, num_cols=2, space=360)
-    add_footer_to_section(col_section)
 
     for para in paragraphs:
         p = doc.add_paragraph()
@@ -869,10 +3747,9 @@ def add_article_body_in_two_columns(doc, paragraphs):
 
     back_to_one = doc.add_section(WD_SECTION.CONTINUOUS)
     set_section_columns(back_to_one, num_cols=1, space=360)
-    add_footer_to_section(back_to_one)
 
 
-def generate_docx(news_items, output_path, digest_date_str):
+def new_digest_document(heading, digest_date_str):
     doc = Document()
 
     section = doc.sections[0]
@@ -897,7 +3774,7 @@ def generate_docx(news_items, output_path, digest_date_str):
 
     header_box.add_run("\t")
 
-    run1 = header_box.add_run("IIRS Daily Space Digest")
+    run1 = header_box.add_run(heading)
     run1.bold = True
     run1.font.name = "Times New Roman"
     run1.font.size = Pt(12)
@@ -913,68 +3790,123 @@ def generate_docx(news_items, output_path, digest_date_str):
 
     doc.add_paragraph('')
 
-    for idx, item in enumerate(news_items, start=1):
-        title = normalize_text(item.get('title', 'Untitled'))
-        source = clean_source_name(item.get('source', ''))
-        link = resolve_final_article_url(normalize_text(item.get('link', '')))
-        summary = normalize_text(item.get('summary', ''))
-        image_url = item.get('image')
+    return doc
 
-        p = doc.add_paragraph()
-        p.paragraph_format.space_after = Pt(3)
-        run = p.add_run(f'{idx}. {title}')
-        run.bold = True
-        run.font.name = 'Times New Roman'
-        run.font.size = Pt(13)
 
-        meta_parts = []
-        if source:
-            meta_parts.append(source)
+def get_article_body_paragraphs(item, link, title, summary):
+    # Stored records already carry their body; only fresh items hit the network.
+    body_paragraphs = item.get('body')
+    if body_paragraphs is not None:
+        return body_paragraphs
 
-        if meta_parts:
-            meta = doc.add_paragraph()
-            meta.paragraph_format.space_after = Pt(3)
-            meta_run = meta.add_run(' | '.join(meta_parts))
-            meta_run.italic = True
-            meta_run.font.name = 'Times New Roman'
-            meta_run.font.size = Pt(10)
+    body_text = fetch_full_article_text(
+        url=link,
+        fallback_summary=summary,
+        title=title
+    )
 
-        if link and link != '#':
-            link_p = doc.add_paragraph()
-            link_p.paragraph_format.space_after = Pt(4)
-            link_p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-            add_hyperlink(link_p, "Read more", link)
+    body_text = clean_body_text(body_text, title=title)
+    body_paragraphs = split_into_paragraphs(body_text)
 
-        image_stream = try_download_image(image_url)
-        if image_stream:
-            try:
-                img_p = doc.add_paragraph()
-                img_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                img_run = img_p.add_run()
-                img_run.add_picture(image_stream, width=Inches(4.8))
-                img_p.paragraph_format.space_after = Pt(6)
-            except Exception:
-                pass
-
-        body_text = fetch_full_article_text(
-            url=link,
-            fallback_summary=summary,
-            title=title
-        )
+    if not body_paragraphs:
+        fallback_clean = clean_body_text(summary, title=title)
+        body_paragraphs = split_into_paragraphs(fallback_clean)
+
+    if isinstance(item, dict):
+        item['body'] = body_paragraphs
 
-        body_text = clean_body_text(body_text, title=title)
-        body_paragraphs = split_into_paragraphs(body_text)
+    return body_paragraphs
 
-        if not body_paragraphs:
-            fallback_clean = clean_body_text(summary, title=title)
-            body_paragraphs = split_into_paragraphs(fallback_clean)
 
-        add_article_body_in_two_columns(doc, body_paragraphs)
+def add_article_to_docx(doc, idx, item, is_last=False, open_image=try_download_image):
+    title = normalize_text(item.get('title', 'Untitled'))
+    source = clean_source_name(item.get('source', ''))
+    link = normalize_text(item.get('link', ''))
+    summary = normalize_text(item.get('summary', ''))
+    image_url = item.get('image')
 
-        if idx != len(news_items):
-            sep = doc.add_paragraph()
-            add_bottom_border(sep)
-            doc.add_paragraph('')
+    p = doc.add_paragraph()
+    p.paragraph_format.space_after = Pt(3)
+    run = p.add_run(f'{idx}. {title}')
+    run.bold = True
+    run.font.name = 'Times New Roman'
+    run.font.size = Pt(13)
+
+    meta_parts = []
+    if source:
+        meta_parts.append(source)
+
+    if meta_parts:
+        meta = doc.add_paragraph()
+        meta.paragraph_format.space_after = Pt(3)
+        meta_run = meta.add_run(' | '.join(meta_parts))
+        meta_run.italic = True
+        meta_run.font.name = 'Times New Roman'
+        meta_run.font.size = Pt(10)
+
+    if link and link != '#':
+        link_p = doc.add_paragraph()
+        link_p.paragraph_format.space_after = Pt(4)
+        link_p.alignment = WD_ALIGN_PARAGRAPH.LEFT
+        add_hyperlink(link_p, "Read more", link)
+
+    image_stream = open_image(image_url)
+    if image_stream:
+        try:
+            img_p = doc.add_paragraph()
+            img_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            img_run = img_p.add_run()
+            img_run.add_picture(image_stream, width=Inches(4.8))
+            img_p.paragraph_format.space_after = Pt(6)
+        except Exception:
+            pass
+        finally:
+            image_stream.close()
+
+    body_paragraphs = get_article_body_paragraphs(item, link, title, summary)
+    add_article_body_in_two_columns(doc, body_paragraphs)
+
+    if not is_last:
+        sep = doc.add_paragraph()
+        add_bottom_border(sep)
+        doc.add_paragraph('')
+
+
+def stamp_docx(path, when):
+    # python-docx stamps zip members with the wall clock; pin them to the
+    # run clock so a replay or a merge of the same shards writes the same bytes.
+    stamp = when.astimezone(IST_OFFSET).timetuple()[:6]
+    with zipfile.ZipFile(path) as source:
+        members = [(info.filename, source.read(info)) for info in source.infolist()]
+    with zipfile.ZipFile(path + '.tmp', 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, data in members:
+            target.writestr(zipfile.ZipInfo(name, date_time=stamp), data, zipfile.ZIP_DEFLATED)
+    os.replace(path + '.tmp', path)
+
+
+def append_to_docx(news_items, output_path, start_index):
+    # Earlier sections are left as they are; the previous last article gets
+    # the separator it was built without.
+    doc = Document(output_path)
+    sep = doc.add_paragraph()
+    add_bottom_border(sep)
+    doc.add_paragraph('')
+
+    for idx, item in enumerate(news_items, start=start_index):
+        add_article_to_docx(doc, idx, item, is_last=(idx == start_index + len(news_items) - 1))
+
+    apply_footer_to_all_sections(doc)
+    doc.save(output_path)
+    print(f'DOCX updated: {output_path} (+{len(news_items)} articles)')
+
+
+def generate_docx(news_items, output_path, digest_date_str, heading="IIRS Daily Space Digest", start_index=1,
+                  open_image=try_download_image):
+    doc = new_digest_document(heading, digest_date_str)
+
+    for idx, item in enumerate(news_items, start=start_index):
+        add_article_to_docx(doc, idx, item, is_last=(idx == start_index + len(news_items) - 1),
+                            open_image=open_image)
 
     apply_footer_to_all_sections(doc)
     doc.save(output_path)
@@ -982,59 +3914,137 @@ def generate_docx(news_items, output_path, digest_date_str):
 
 
 # =========================
-# Main Fetch
+# Article Store
 # =========================
+# Every published item is appended to .digest_state/articles/YYYYMMDD.jsonl,
+# body included, so weekly and monthly compendia need no network for text.
 
-print("🏔️ Fetching REGIONAL...")
-regional_news = fetch_news_from_feeds(REGIONAL_FEEDS, max_articles=5)
+ARTICLE_STORE_DIR = 'articles'
+COMPENDIUM_PERIODS = {'weekly': 7, 'monthly': 30}
+DEFAULT_VOLUME_SIZE = 250
 
-print("🇮🇳 Fetching NATIONAL...")
-national_news = fetch_news_from_feeds(NATIONAL_FEEDS, max_articles=6)
 
-print("🌌 Fetching INTERNATIONAL...")
-international_news = fetch_news_from_feeds(INTERNATIONAL_FEEDS, max_articles=8)
+class ArticleRecord:
+    __slots__ = ('date', 'category', 'title', 'link', 'source', 'summary', 'image', 'body')
 
-all_news = []
-for news_list, category in [
-    (regional_news, "🏔️ Regional Updates"),
-    (national_news, "🇮🇳 National Updates"),
-    (international_news, "🌌 International Updates")
-]:
-    for item in news_list:
-        item['category'] = category
-        all_news.append(item)
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
 
-if not all_news:
-    all_news.append({
-        'title': 'No space news in last 24h',
-        'link': '#',
-        'source': 'IIRS Digest',
-        'summary': 'Check back tomorrow!',
-        'image': None,
-        'category': 'System'
-    })
+    @classmethod
+    def from_line(cls, line):
+        data = json.loads(line)
+        body = data.get('body')
+        if isinstance(body, list):
+            data['body'] = '\n'.join(body)
+        return cls(**data)
+
+    def get(self, key, default=None):
+        if key == 'body':
+            return self.body.split('\n') if self.body else []
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+
+def article_store_path(day):
+    return state_path(os.path.join(ARTICLE_STORE_DIR, f'{day:%Y%m%d}.jsonl'))
+
+
+def append_article_records(news_items, day):
+    items = [item for item in news_items if item.get('link') and item.get('link') != '#']
+    if not items:
+        return
+
+    path = article_store_path(day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for item in items:
+            record = {name: item.get(name) for name in ArticleRecord.__slots__}
+            record['date'] = f'{day:%Y-%m-%d}'
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    print(f"🗄️ Stored {len(items)} articles in {path}")
+
+
+def iter_article_records(start_day, end_day):
+    seen_links = set()
+    day = start_day
+    while day <= end_day:
+        try:
+            with open(article_store_path(day), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = ArticleRecord.from_line(line)
+                    if record.link in seen_links:
+                        continue
+                    seen_links.add(record.link)
+                    yield record
+        except FileNotFoundError:
+            pass
+        day += timedelta(days=1)
+
+
+def load_published_items(day):
+    items = []
+    for record in iter_article_records(day, day):
+        item = {name: getattr(record, name) for name in ArticleRecord.__slots__}
+        # A stored empty body is a result too; only a missing one is fetched again.
+        item['body'] = None if record.body is None else record.get('body')
+        items.append(item)
+    return items
+
+
+def iter_batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def generate_compendium(period, end_day, output_dir='.', volume_size=DEFAULT_VOLUME_SIZE):
+    start_day = end_day - timedelta(days=COMPENDIUM_PERIODS[period] - 1)
+    heading = f"IIRS {period.title()} Space Compendium"
+    records = iter_article_records(start_day, end_day)
+
+    paths = []
+    next_index = 1
+    for volume, batch in enumerate(iter_batches(records, volume_size), start=1):
+        path = os.path.join(
+            output_dir,
+            f"iirs_{period}_space_compendium_{end_day:%d_%m_%Y}_vol{volume:02d}.docx"
+        )
+        date_str = f"{start_day:%d/%m/%Y} - {end_day:%d/%m/%Y} | Vol. {volume}"
+        generate_docx(batch, path, date_str, heading=heading, start_index=next_index,
+                      open_image=open_stored_image)
+        next_index += len(batch)
+        paths.append(path)
+        # Drop the volume's records and document tree before starting the next.
+        del batch
+        gc.collect()
+
+    print(f"📚 {period.title()} compendium: {next_index - 1} articles in {len(paths)} volume(s)")
+    return paths
 
 
 # =========================
 # HTML Output
 # =========================
 
-all_articles_html = make_articles_html(all_news)
+IST_OFFSET = timezone(timedelta(hours=5, minutes=30))
 
-ist_offset = timezone(timedelta(hours=5, minutes=30))
-timestamp = datetime.now(ist_offset).strftime("%d-%m-%Y | %H:%M IST")
 
-html_body = f"""<!DOCTYPE html>
-<html data-theme="dark">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<style>
-:root {{
+# Styles and script are shared files under assets/, named by content hash so
+# browsers keep them cached across days. The lite theme drops the starfield,
+# blur and hover animations for slow office PCs and phones.
+
+DIGEST_CSS = """
+:root {
     --bg-primary: #0a0a0a;
     --bg-secondary: rgba(10, 10, 10, 0.9);
     --card-bg: rgba(255,255,255,0.05);
-    --card-summary: rgba(255,255,255,0.02);
     --text-primary: #c0c0c0;
     --text-secondary: #a0a0a0;
     --text-light: #d0d0d0;
@@ -1043,155 +4053,240 @@ html_body = f"""<!DOCTYPE html>
     --border-card: rgba(255,255,255,0.1);
     --shadow-dark: rgba(0,0,0,0.8);
     --cyan-accent: #00ffff;
-}}
-[data-theme="light"] {{
-    --bg-primary: #f8fafc !important;
-    --bg-secondary: rgba(255, 255, 255, 0.98) !important;
-    --card-bg: rgba(255,255,255,0.95) !important;
-    --card-summary: rgba(248, 250, 252, 0.8) !important;
-    --text-primary: #1e293b !important;
-    --text-secondary: #475569 !important;
-    --text-light: #334155 !important;
-    --text-white: #0f172a !important;
-    --border-light: rgba(0,0,0,0.06) !important;
-    --border-card: rgba(0,0,0,0.08) !important;
-    --shadow-dark: rgba(0,0,0,0.1) !important;
-    --cyan-accent: #00b8d4 !important;
-}}
-
-* {{ box-sizing: border-box !important; }}
-html {{ background: var(--bg-primary) !important; min-height: 100vh !important; }}
-body {{
-    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif !important;
-    margin: 0 !important;
-    padding: 20px !important;
-    background: var(--bg-primary) !important;
-    color: var(--text-primary) !important;
-    min-height: 100vh !important;
-    display: flex !important;
-    flex-direction: column !important;
-    align-items: center !important;
-}}
-
-body::before {{
-    content: '' !important;
-    position: fixed !important;
-    top: 0; left: 0; width: 100%; height: 100%;
-    background-image:
-        radial-gradient(1px 1px at 20px 30px, rgba(255,255,255,0.4), transparent),
-        radial-gradient(1px 1px at 160px 30px, rgba(255,255,255,0.25), transparent);
-    background-size: 300px 300px !important;
-    animation: voidDrift 60s linear infinite !important;
-    pointer-events: none !important;
-    z-index: -1 !important;
-    opacity: 0.5 !important;
-}}
-@keyframes voidDrift {{ from {{ background-position: 0 0; }} to {{ background-position: 0 600px; }} }}
-
-.theme-toggle {{
-    position: fixed !important; top: 20px !important; right: 20px !important;
-    width: 45px !important; height: 45px !important;
-    border-radius: 50% !important; border: none !important;
-    background: rgba(255,255,255,0.1) !important;
-    color: #fff !important; font-size: 20px !important;
-    cursor: pointer !important; backdrop-filter: blur(10px) !important;
-    z-index: 1000 !important;
-}}
-
-.scroll-container {{
-    width: 80% !important;
-    max-width: none !important;
-    min-width: 600px !important;
-    background: var(--bg-secondary) !important;
-    backdrop-filter: blur(30px) !important;
-    border: 1px solid var(--border-light) !important;
-    border-radius: 24px !important;
-    padding: 40px !important;
-    box-shadow: 0 35px 70px var(--shadow-dark) !important;
-    margin-top: 20px !important;
-}}
-
-h2 {{
-    color: var(--text-white) !important;
-    text-align: center !important;
-    border-bottom: 2px solid var(--border-light) !important;
-    padding-bottom: 20px !important;
-    margin-bottom: 30px !important;
-    font-weight: 700 !important;
-    letter-spacing: 1px !important;
-}}
-
-.news-card {{ margin-bottom: 40px !important; }}
-.card-content {{
-    background: var(--card-bg) !important;
-    border: 1px solid var(--border-card) !important;
-    border-radius: 20px !important;
-    padding: 30px !important;
-    box-shadow: 0 10px 30px var(--shadow-dark) !important;
-    transition: transform 0.3s ease !important;
-}}
-.card-content:hover {{ transform: translateY(-5px) !important; border-color: var(--cyan-accent) !important; }}
-
-.card-image {{
-    width: 100% !important; height: 350px !important;
-    object-fit: cover !important;
-    border-radius: 12px !important; margin-bottom: 20px !important;
-    border: 1px solid var(--border-card) !important;
-}}
-
-.card-title a {{
-    color: var(--text-white) !important; text-decoration: none !important;
-    font-size: 24px !important;
-    font-weight: 600 !important; display: block !important;
-    margin-bottom: 10px !important;
-}}
-.card-title a:hover {{ text-decoration: underline !important; color: var(--cyan-accent) !important; }}
-
-.card-source {{
-    display: inline-block !important; padding: 5px 12px !important;
-    background: rgba(255,255,255,0.05) !important; border-radius: 15px !important;
-    font-size: 13px !important; color: var(--text-secondary) !important;
-    margin-bottom: 15px !important; border: 1px solid var(--border-light) !important;
-}}
-
-.card-summary {{
-    color: var(--text-light) !important; line-height: 1.7 !important;
-    font-size: 16px !important;
-    margin-bottom: 20px !important;
-}}
-
-.read-more {{
-    display: inline-block !important; padding: 10px 20px !important;
-    background: transparent !important; border: 1px solid var(--cyan-accent) !important;
-    color: var(--cyan-accent) !important; text-decoration: none !important;
-    border-radius: 25px !important; font-weight: 600 !important; font-size: 14px !important;
-    transition: all 0.3s ease !important;
-}}
-.read-more:hover {{ background: var(--cyan-accent) !important; color: #000 !important; }}
-
-.footer {{
-    text-align: center !important; margin-top: 40px !important;
-    color: var(--text-secondary) !important; font-size: 13px !important;
-    padding-bottom: 20px !important;
-}}
-
-@media (max-width: 1000px) {{
-    .scroll-container {{ width: 90% !important; min-width: 0 !important; }}
-}}
-@media (max-width: 768px) {{
-    .scroll-container {{ width: 95% !important; padding: 20px !important; }}
-    .card-content {{ padding: 20px !important; }}
-    h2 {{ font-size: 22px !important; }}
-    .card-image {{ height: 200px !important; }}
-}}
-</style>
+}
+[data-theme="light"] {
+    --bg-primary: #f8fafc;
+    --bg-secondary: rgba(255, 255, 255, 0.98);
+    --card-bg: rgba(255,255,255,0.95);
+    --text-primary: #1e293b;
+    --text-secondary: #475569;
+    --text-light: #334155;
+    --text-white: #0f172a;
+    --border-light: rgba(0,0,0,0.06);
+    --border-card: rgba(0,0,0,0.08);
+    --shadow-dark: rgba(0,0,0,0.1);
+    --cyan-accent: #00b8d4;
+}
+
+* { box-sizing: border-box; }
+html { background: var(--bg-primary); min-height: 100vh; }
+body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    margin: 0;
+    padding: 20px;
+    background: var(--bg-primary);
+    color: var(--text-primary);
+    min-height: 100vh;
+    display: flex;
+    flex-direction: column;
+    align-items: center;
+}
+
+.theme-toggle {
+    position: fixed; top: 20px; right: 20px;
+    width: 45px; height: 45px;
+    border-radius: 50%; border: none;
+    background: rgba(255,255,255,0.1);
+    color: #fff; font-size: 20px;
+    cursor: pointer;
+    z-index: 1000;
+}
+
+.scroll-container {
+    width: 80%;
+    min-width: 600px;
+    background: var(--bg-secondary);
+    border: 1px solid var(--border-light);
+    border-radius: 24px;
+    padding: 40px;
+    box-shadow: 0 35px 70px var(--shadow-dark);
+    margin-top: 20px;
+}
+
+h2 {
+    color: var(--text-white);
+    text-align: center;
+    border-bottom: 2px solid var(--border-light);
+    padding-bottom: 20px;
+    margin-bottom: 30px;
+    font-weight: 700;
+    letter-spacing: 1px;
+}
+.digest-meta { text-align: center; color: var(--text-secondary); margin-top: -20px; margin-bottom: 40px; }
+
+.news-card { margin-bottom: 40px; }
+.card-content {
+    background: var(--card-bg);
+    border: 1px solid var(--border-card);
+    border-radius: 20px;
+    padding: 30px;
+    box-shadow: 0 10px 30px var(--shadow-dark);
+}
+.card-content:hover { border-color: var(--cyan-accent); }
+
+.card-image {
+    display: block;
+    width: 100%; height: 350px;
+    object-fit: cover;
+    background-size: cover;
+    border-radius: 12px; margin-bottom: 20px;
+    border: 1px solid var(--border-card);
+}
+
+.card-title a {
+    color: var(--text-white); text-decoration: none;
+    font-size: 24px;
+    font-weight: 600; display: block;
+    margin-bottom: 10px;
+}
+.card-title a:hover { text-decoration: underline; color: var(--cyan-accent); }
+
+.card-source {
+    display: inline-block; padding: 5px 12px;
+    background: rgba(255,255,255,0.05); border-radius: 15px;
+    font-size: 13px; color: var(--text-secondary);
+    margin-bottom: 15px; border: 1px solid var(--border-light);
+}
+
+.card-summary {
+    color: var(--text-light); line-height: 1.7;
+    font-size: 16px;
+    margin-bottom: 20px;
+}
+
+.read-more {
+    display: inline-block; padding: 10px 20px;
+    background: transparent; border: 1px solid var(--cyan-accent);
+    color: var(--cyan-accent); text-decoration: none;
+    border-radius: 25px; font-weight: 600; font-size: 14px;
+}
+.read-more:hover { background: var(--cyan-accent); color: #000; }
+
+.footer {
+    text-align: center; margin-top: 40px;
+    color: var(--text-secondary); font-size: 13px;
+    padding-bottom: 20px;
+}
+
+@media (max-width: 1000px) {
+    .scroll-container { width: 90%; min-width: 0; }
+}
+@media (max-width: 768px) {
+    .scroll-container { width: 95%; padding: 20px; }
+    .card-content { padding: 20px; }
+    h2 { font-size: 22px; }
+    .card-image { height: 200px; }
+}
+"""
+
+# Effects layered on top for the full theme; skipped entirely by readers who
+# ask the OS for reduced motion.
+DIGEST_EFFECTS_CSS = """
+@media (prefers-reduced-motion: no-preference) {
+    body::before {
+        content: '';
+        position: fixed;
+        top: 0; left: 0; width: 100%; height: 100%;
+        background-image:
+            radial-gradient(1px 1px at 20px 30px, rgba(255,255,255,0.4), transparent),
+            radial-gradient(1px 1px at 160px 30px, rgba(255,255,255,0.25), transparent);
+        background-size: 300px 300px;
+        animation: voidDrift 60s linear infinite;
+        pointer-events: none;
+        z-index: -1;
+        opacity: 0.5;
+    }
+    @keyframes voidDrift { from { background-position: 0 0; } to { background-position: 0 600px; } }
+
+    .theme-toggle { backdrop-filter: blur(10px); }
+    .scroll-container { backdrop-filter: blur(30px); }
+    .card-content { transition: transform 0.3s ease; }
+    .card-content:hover { transform: translateY(-5px); }
+    .read-more { transition: all 0.3s ease; }
+}
+"""
+
+DIGEST_JS = """
+// Theme toggle, remembered across days
+const btn = document.getElementById('themeToggle');
+const html = document.documentElement;
+
+if (localStorage.getItem('theme') === 'light') {
+    html.setAttribute('data-theme', 'light');
+    btn.textContent = '🌙';
+}
+
+btn.addEventListener('click', () => {
+    if (html.getAttribute('data-theme') === 'light') {
+        html.removeAttribute('data-theme');
+        btn.textContent = '☀️';
+        localStorage.setItem('theme', 'dark');
+    } else {
+        html.setAttribute('data-theme', 'light');
+        btn.textContent = '🌙';
+        localStorage.setItem('theme', 'light');
+    }
+});
+"""
+
+HTML_THEMES = ('full', 'lite')
+
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};:,>])\s*', r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Line-based on purpose: drop comments, indentation and blank lines but
+    # never touch the tokens themselves.
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def write_hashed_asset(content, stem, ext, asset_dir):
+    data = content.encode('utf-8')
+    name = f"{stem}-{hashlib.sha256(data).hexdigest()[:10]}.{ext}"
+    path = os.path.join(asset_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(asset_dir, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    return {'href': f"{os.path.basename(asset_dir)}/{name}", 'bytes': len(data)}
+
+
+def write_static_assets(theme='full', asset_dir=HTML_ASSET_DIR):
+    css = DIGEST_CSS if theme == 'lite' else DIGEST_CSS + DIGEST_EFFECTS_CSS
+    return {
+        'css': write_hashed_asset(minify_css(css), f'digest-{theme}', 'css', asset_dir),
+        'js': write_hashed_asset(minify_js(DIGEST_JS), 'digest', 'js', asset_dir),
+    }
+
+
+def build_html_page(all_news, timestamp, assets):
+    all_articles_html = make_articles_html(all_news)
+
+    return f"""<!DOCTYPE html>
+<html data-theme="dark">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="{assets['css']['href']}">
+<script src="{assets['js']['href']}" defer></script>
 </head>
 <body>
 <button class="theme-toggle" id="themeToggle" title="Toggle Theme">☀️</button>
 
 <div class="scroll-container">
     <h2>🌌 IIRS Daily Space Digest</h2>
-    <p style="text-align:center; color:var(--text-secondary); margin-top:-20px; margin-bottom:40px;">
+    <p class="digest-meta">
         {timestamp} | {len(all_news)} Updates Found
     </p>
 
@@ -1202,50 +4297,1753 @@ h2 {{
         <small>Automated Digest System</small>
     </div>
 </div>
-
-<script>
-const btn = document.getElementById('themeToggle');
-const html = document.documentElement;
-
-if (localStorage.getItem('theme') === 'light') {{
-    html.setAttribute('data-theme', 'light');
-    btn.textContent = '🌙';
-}}
-
-btn.addEventListener('click', () => {{
-    if (html.getAttribute('data-theme') === 'light') {{
-        html.removeAttribute('data-theme');
-        btn.textContent = '☀️';
-        localStorage.setItem('theme', 'dark');
-    }} else {{
-        html.setAttribute('data-theme', 'light');
-        btn.textContent = '🌙';
-        localStorage.setItem('theme', 'light');
-    }}
-}});
-</script>
 </body>
 </html>
 """
 
-html_filename = f'IIRS_SpaceNews_Daily_{datetime.now().strftime("%Y%m%d")}.html'
-with open(html_filename, 'w', encoding='utf-8') as f:
-    f.write(html_body)
 
-print(f"✅ SAVED: {html_filename} with {len(all_news)} items")
+def check_page_budget(page_bytes, budget_kb, warn_only=False):
+    # Called once the run's outputs and state are saved, so an over-budget
+    # page costs the exit code, not the run's caches.
+    if not budget_kb or page_bytes is None or page_bytes <= budget_kb * 1024:
+        return
+    message = f"Page weight {page_bytes / 1024:.0f} KB exceeds the {budget_kb} KB budget"
+    if warn_only:
+        print(f"⚠️ {message}")
+        return
+    raise SystemExit(f"❌ {message}")
+
+
+# =========================
+# Digest Model and Renderers
+# =========================
+# A run's items are settled once - canonical links, deduplicated images,
+# article bodies - into a plain model. Renderers only read it, so a new
+# output format costs no network. They run one after another: rendering is
+# CPU-bound Python, and threads would only take turns on the GIL.
+
+RENDER_FORMATS = ('html', 'docx', 'json', 'email', 'editions')
+EMAIL_WIDTH = 76
+
+
+def build_digest_model(news_items, registry, html_path, docx_path, published_count=0):
+    started = time.perf_counter()
+    # Bodies need every fresh item's page anyway; fetch them together, and let
+    # each page top up its item's image fallbacks before images are deduped.
+    fresh = [item for item in news_items if item.get('body') is None and item.get('link', '#') != '#']
+    prefetch_page_extracts([item['link'] for item in fresh])
+    for item in fresh:
+        if item.get('image_candidates') is not None:
+            extra = page_image_candidates(None, item['link'])
+            item['image_candidates'] = unique(item['image_candidates'] + extra)[:MAX_IMAGE_CANDIDATES]
+    screen_image_candidates(news_items)
+    dedupe_digest_images(news_items)
+
+    for item in news_items:
+        title = normalize_text(item.get('title', 'Untitled'))
+        summary = normalize_text(item.get('summary', ''))
+        get_article_body_paragraphs(item, normalize_text(item.get('link', '')), title, summary)
+
+    now = run_now(IST_OFFSET)
+    model = {
+        'heading': "IIRS Daily Space Digest",
+        'generated': now,
+        'timestamp': now.strftime("%d-%m-%Y | %H:%M IST"),
+        'date_str': now.strftime('%A, %d/%m/%Y'),
+        'items': news_items,
+        'published_count': published_count,
+        'html_path': html_path,
+        'docx_path': docx_path,
+        'editions': [category for category in registry if category.get('edition')],
+    }
+    print(f"🧩 Digest model: {len(news_items)} items in {time.perf_counter() - started:.2f} s")
+    return model
+
+
+def render_html(model, args):
+    assets = write_static_assets(args.theme)
+    hotlinked_html = build_html_page(model['items'], model['timestamp'], assets)
+    image_weights = prepare_thumbnails(model['items']) or (0, 0)
+    html_body = build_html_page(model['items'], model['timestamp'], assets)
+
+    with open(model['html_path'], 'w', encoding='utf-8') as f:
+        f.write(html_body)
+
+    print(f"✅ SAVED: {model['html_path']} with {len(model['items'])} items")
+    asset_bytes = assets['css']['bytes'] + assets['js']['bytes']
+    before = len(hotlinked_html.encode('utf-8')) + asset_bytes + image_weights[0]
+    page_bytes = len(html_body.encode('utf-8')) + asset_bytes + image_weights[1]
+    print(f"⚖️ Page weight: {before / 1024:.0f} KB hotlinked originals -> "
+          f"{page_bytes / 1024:.0f} KB with {THUMB_DEFAULT_WIDTH}px thumbnails "
+          f"(css+js {asset_bytes / 1024:.1f} KB, {args.theme} theme)")
+    model['page_bytes'] = page_bytes
+    return [model['html_path']]
+
+
+def render_docx(model, args):
+    path = model['docx_path']
+    published = model['published_count']
+    if published:
+        append_to_docx(model['items'][published:], path, start_index=published + 1)
+    else:
+        generate_docx(news_items=model['items'], output_path=path, digest_date_str=model['date_str'])
+    if RUN_CLOCK is not None:
+        stamp_docx(path, RUN_CLOCK)
+    return [path]
+
+
+def render_json_feed(model, args):
+    items = []
+    for n, item in enumerate(model['items'], 1):
+        link = item.get('link')
+        entry = {
+            'id': link if link and link != '#' else f"digest-{model['generated']:%Y%m%d}-{n}",
+            'title': normalize_text(item.get('title', '')),
+            'summary': normalize_text(item.get('summary', '')),
+            'content_text': '\n\n'.join(item.get('body') or []),
+            'tags': [item.get('category', '')],
+            'authors': [{'name': clean_source_name(item.get('source', ''))}],
+        }
+        if link and link != '#':
+            entry['url'] = link
+        if item.get('image'):
+            entry['image'] = item['image']
+        items.append(entry)
+
+    path = os.path.splitext(model['html_path'])[0] + '.json'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': f"{model['heading']} - {model['date_str']}",
+            'description': 'Daily space news for IIRS staff',
+            'items': items,
+        }, f, ensure_ascii=False, indent=1)
+    return [path]
+
+
+def render_email(model, args):
+    # A light body for the circulation mail: text plus a small HTML part
+    # with inline styles and no images.
+    heading = f"{model['heading']} - {model['date_str']}"
+    text_lines = [heading, f"{len(model['items'])} updates", ""]
+    html_parts = [
+        f'<div style="font-family:Segoe UI,Arial,sans-serif;max-width:640px">'
+        f'<h2 style="margin:0 0 4px">{html.escape(model["heading"])}</h2>'
+        f'<p style="color:#555;margin:0 0 16px">{html.escape(model["date_str"])} | {len(model["items"])} updates</p>'
+    ]
+
+    category = None
+    for n, item in enumerate(model['items'], 1):
+        if item.get('category') != category:
+            category = item.get('category')
+            text_lines += [category or '', '-' * len(category or ''), '']
+            html_parts.append(f'<h3 style="margin:20px 0 8px">{html.escape(category or "")}</h3>')
+
+        title = normalize_text(item.get('title', ''))
+        source = clean_source_name(item.get('source', ''))
+        summary = normalize_text(item.get('summary', ''))
+        link = item.get('link', '')
+
+        text_lines.append(f"{n}. {title}")
+        text_lines.append(f"   {source}")
+        for line in textwrap.wrap(summary, EMAIL_WIDTH - 3):
+            text_lines.append(f"   {line}")
+        if link and link != '#':
+            text_lines.append(f"   {link}")
+        text_lines.append('')
+
+        title_html = html.escape(f"{n}. {title}")
+        if link and link != '#':
+            title_html = f'<a href="{html.escape(link)}" style="color:#0b57d0;text-decoration:none">{title_html}</a>'
+        html_parts.append(
+            f'<p style="margin:0 0 14px"><b>{title_html}</b><br>'
+            f'<span style="color:#777;font-size:12px">{html.escape(source)}</span><br>'
+            f'{html.escape(summary)}</p>'
+        )
+    html_parts.append('<p style="color:#777;font-size:12px">IIRS Library | Indian Institute of Remote Sensing | Dehradun</p></div>')
+
+    # Not IIRS_SpaceNews_Daily_*: the workflow copies that glob to index.html.
+    stem = f'IIRS_SpaceNews_Email_{model["generated"].strftime("%Y%m%d")}'
+    with open(stem + '.txt', 'w', encoding='utf-8') as f:
+        f.write('\n'.join(text_lines))
+    with open(stem + '.html', 'w', encoding='utf-8') as f:
+        f.write(''.join(html_parts))
+    return [stem + '.txt', stem + '.html']
+
+
+def render_editions(model, args):
+    paths = []
+    for category in model['editions']:
+        items = [item for item in model['items'] if item.get('category') == category['label']]
+        if not items:
+            continue
+        label = category['label'].replace(category['icon'], '').strip()
+        path = f"iirs_{category['name']}_space_digest_{model['generated']:%d_%m_%Y}.docx"
+        generate_docx(items, path, model['date_str'], heading=f"IIRS Space Digest - {label}")
+        if RUN_CLOCK is not None:
+            stamp_docx(path, RUN_CLOCK)
+        paths.append(path)
+    return paths
+
+
+RENDERERS = {
+    'html': render_html,
+    'docx': render_docx,
+    'json': render_json_feed,
+    'email': render_email,
+    'editions': render_editions,
+}
+
+
+def render_digest(model, args):
+    started = time.perf_counter()
+    timings = {}
+    formats = [name for name in RENDER_FORMATS if name in args.formats]
+    for name in formats:
+        format_started = time.perf_counter()
+        paths = RENDERERS[name](model, args)
+        timings[name] = (time.perf_counter() - format_started, paths)
+
+    print(f"🖨️ Rendered {len(formats)} formats in {time.perf_counter() - started:.2f} s:")
+    for name in formats:
+        elapsed, paths = timings[name]
+        print(f"   {name:<9} {elapsed:6.2f} s  {', '.join(paths) or '-'}")
+
+
+def parse_formats(value):
+    formats = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in formats if name not in RENDER_FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown format(s): {', '.join(unknown)}")
+    if not formats:
+        raise argparse.ArgumentTypeError("no format given")
+    return formats
+
+
+
+# =========================
+# Run Checkpoints
+# =========================
+# A run that dies part-way - killed, timed out, crashed while rendering -
+# leaves a checkpoint.json state record behind: every category already fetched
+# and enriched, with the watermark, feed-stat and feed-validator updates it
+# made, and once the model is built, each item's body and image. The image
+# index and page extracts are flushed alongside. A rerun with the same
+# options on the same day resumes from there; a run that publishes removes it.
+
+CHECKPOINT_STATE = 'checkpoint.json'
+CHECKPOINT_VERSION = 1
+
+RUN_CHECKPOINT = None
+
+
+def checkpoint_run_key(args, registry):
+    options = {
+        'day': run_now(IST_OFFSET).date().isoformat(),
+        'catch_up': args.catch_up,
+        'no_watermarks': args.no_watermarks,
+        'incremental': args.incremental,
+        'selection': args.selection,
+        'feed_parser': args.feed_parser,
+        'categories': [
+            [category['name'], category['max_articles'], [feed['url'] for feed in category['feeds']]]
+            for category in registry
+        ],
+    }
+    return hashlib.sha1(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class RunCheckpoint:
+    def __init__(self, run_key, data):
+        self.run_key = run_key
+        self.categories = data.get('categories', {})
+        self.watermarks = data.get('watermarks', {})
+        self.feed_stats = data.get('feed_stats', {})
+        self.validators = data.get('validators', {})
+
+    @classmethod
+    def open(cls, args, registry):
+        run_key = checkpoint_run_key(args, registry)
+        data = load_json_state(CHECKPOINT_STATE, {}) or {}
+        if args.no_resume or data.get('version') != CHECKPOINT_VERSION or data.get('run') != run_key:
+            return cls(run_key, {})
+        checkpoint = cls(run_key, data)
+        done = sum(len(items) for items in checkpoint.categories.values())
+        print(f"⏯️ Resuming from checkpoint: {len(checkpoint.categories)} categories, {done} items done")
+        return checkpoint
+
+    def restore(self, watermarks, feed_stats):
+        if watermarks:
+            watermarks.updates.update(self.watermarks)
+        feed_stats.stats.update(self.feed_stats)
+        feed_stats.touched.update(self.feed_stats)
+        PENDING_FEED_VALIDATORS.update(self.validators)
+
+    def finish_category(self, name, items, watermarks, feed_stats):
+        # Items are kept by reference; bodies and images added later are
+        # picked up by the next flush.
+        self.categories[name] = items
+        if watermarks:
+            self.watermarks = dict(watermarks.updates)
+        self.feed_stats = {key: feed_stats.stats[key] for key in feed_stats.touched}
+        self.validators = dict(PENDING_FEED_VALIDATORS)
+        self.flush()
+
+    def flush(self):
+        save_json_state(CHECKPOINT_STATE, {
+            'version': CHECKPOINT_VERSION,
+            'run': self.run_key,
+            'categories': self.categories,
+            'watermarks': self.watermarks,
+            'feed_stats': self.feed_stats,
+            'validators': self.validators,
+        })
+        get_image_store().save()
+        get_extract_store().flush()
+
+    def clear(self):
+        if CHECKPOINT_STATE in get_state_snapshot():
+            delete_json_state(CHECKPOINT_STATE)
+
+
+# =========================
+# Sharded Runs
+# =========================
+# `--shard I/N` reads the feeds whose URL hashes to shard I, ranks its own
+# candidates and enriches the top few per category (links, images, bodies).
+# It writes everything to shard-I-of-N.json: all filtered candidates, so the
+# merge can rank over the full set, plus the shard's watermark and feed stat
+# updates and what it added to the run caches (page extracts, image probes
+# and strategy counts, hedge samples). Workers never save those caches
+# themselves; concurrent saves would each overwrite the others' entries, so
+# the merge folds every shard's changes in and saves once. `--merge` re-ranks each category across shards, dedupes across
+# categories, enriches any pick a shard did not, and renders. The same
+# partials always merge to the same digest.
+
+SHARD_FORMAT_VERSION = 2
+SHARD_FILE_PATTERN = re.compile(r'^shard-(\d+)-of-(\d+)\.json$')
+# Shard-local ranking sees fewer candidates than the merge; a couple of extra
+# enriched picks per category keep late enrichment in the merge rare.
+SHARD_SPARE_PICKS = 2
+SHARD_MAX_AGE_HOURS = 6
+SHARD_ENTRY_FIELDS = ('media_content', 'media_thumbnail', 'links')
+# Page-derived only; title, source and summary come from whichever feed's
+# candidate the merge picks.
+SHARD_ARTICLE_FIELDS = ('image', 'image_candidates', 'body')
+
+
+def parse_shard(value):
+    match = re.match(r'^(\d+)/(\d+)$', value.strip())
+    if not match or not 0 <= int(match.group(1)) < int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"expected I/N with 0 <= I < N, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def shard_of(url, count):
+    # Stable across runs and machines, and adding a feed moves no other feed.
+    return int(hashlib.sha1(url.encode('utf-8')).hexdigest(), 16) % count
+
+
+def shard_file_name(shard, count):
+    return f'shard-{shard}-of-{count}.json'
+
+
+def shard_candidate_record(candidate):
+    entry = candidate.get('entry') or {}
+    return {
+        'title': candidate['title'],
+        'link': candidate['link'],
+        'source': candidate['source'],
+        'summary': candidate['summary'],
+        'published': candidate['published'].isoformat() if candidate.get('published') else None,
+        'priority': candidate['priority'],
+        'feed_weight': candidate.get('feed_weight', 1.0),
+        'feed': candidate['feed'],
+        'key': candidate['key'],
+        'entry': {name: entry.get(name) for name in SHARD_ENTRY_FIELDS if entry.get(name)},
+    }
+
+
+def shard_candidate_from_record(record):
+    candidate = dict(record)
+    candidate['published'] = datetime.fromisoformat(record['published']) if record['published'] else None
+    return candidate
+
+
+def run_shard(args, registry, shard, count):
+    now = run_now(timezone.utc)
+    cutoff_time = now - timedelta(hours=args.catch_up or DEFAULT_WINDOW_HOURS)
+    watermarks = None if args.no_watermarks else FeedWatermarks.load(now, catch_up_hours=args.catch_up)
+    feed_stats = FeedStats.load()
+    print(f"🧱 Shard {shard}/{count}")
+
+    partial = {
+        'version': SHARD_FORMAT_VERSION,
+        'shard': shard,
+        'count': count,
+        'run_clock': now.isoformat(),
+        'feeds': [],
+        'candidates': {},
+        'articles': {},
+    }
+    links = []
+    for category in registry:
+        feeds = [feed for feed in category['feeds'] if shard_of(feed['url'], count) == shard]
+        partial['candidates'][category['name']] = []
+        if not feeds:
+            continue
+        print(f"{category['icon']} Fetching {category['name'].upper()} ({len(feeds)} feeds)...")
+
+        if args.feed_order == 'adaptive':
+            feeds = feed_stats.order(feeds)
+        candidates = []
+        news_list = fetch_news_from_feeds(
+            feeds,
+            max_articles=category['max_articles'] + SHARD_SPARE_PICKS,
+            keyword_pattern=category['keyword_pattern'],
+            cutoff_time=cutoff_time,
+            parser_mode=args.feed_parser,
+            watermarks=watermarks,
+            feed_stats=feed_stats,
+            seen_keys=set(),
+            candidates=candidates
+        )
+
+        prefetch_page_extracts([item['link'] for item in news_list])
+        for item in news_list:
+            title = normalize_text(item.get('title', 'Untitled'))
+            summary = normalize_text(item.get('summary', ''))
+            get_article_body_paragraphs(item, normalize_text(item['link']), title, summary)
+            partial['articles'][item['link']] = {name: item.get(name) for name in SHARD_ARTICLE_FIELDS}
+
+        partial['feeds'].extend(feed['url'] for feed in feeds)
+        partial['candidates'][category['name']] = [shard_candidate_record(c) for c in candidates]
+        links.extend(candidate['link'] for candidate in candidates)
+
+    partial['resolved'] = {link: CANONICAL_URLS[link] for link in links if link in CANONICAL_URLS}
+    partial['watermarks'] = watermarks.updates if watermarks else {}
+    partial['feed_stats'] = {url: feed_stats.stats[url] for url in feed_stats.touched}
+    partial['caches'] = {
+        'extracts': get_extract_store().changes(),
+        'image_strategies': get_image_strategy_stats().changes(),
+        'image_probes': get_image_probes().changes(),
+    }
+    if HEDGING:
+        partial['caches']['hedge'] = get_hedge_stats().changes()
+
+    os.makedirs(args.shard_dir, exist_ok=True)
+    path = os.path.join(args.shard_dir, shard_file_name(shard, count))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(partial, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+    total = sum(len(c) for c in partial['candidates'].values())
+    print(f"🧱 Shard {shard}/{count}: {len(partial['feeds'])} feeds, {total} candidates, "
+          f"{len(partial['articles'])} enriched -> {path}")
+
+
+def load_shard_partials(shard_dir):
+    partials = []
+    if os.path.isdir(shard_dir):
+        for name in sorted(os.listdir(shard_dir)):
+            if not SHARD_FILE_PATTERN.match(name):
+                continue
+            with open(os.path.join(shard_dir, name), 'r', encoding='utf-8') as f:
+                partial = json.load(f)
+            if partial.get('version') != SHARD_FORMAT_VERSION:
+                print(f"⚠️ Skip {name}: format version {partial.get('version')}")
+                continue
+            partials.append(partial)
+
+    if not partials:
+        raise SystemExit(f"❌ No shard partials in {shard_dir}")
+
+    counts = {partial['count'] for partial in partials}
+    if len(counts) > 1:
+        raise SystemExit(f"❌ Partials in {shard_dir} come from different shard counts: {sorted(counts)}")
+
+    # Leftovers from an earlier run would bring back stale candidates.
+    newest = max(datetime.fromisoformat(partial['run_clock']) for partial in partials)
+    fresh = []
+    for partial in partials:
+        if newest - datetime.fromisoformat(partial['run_clock']) > timedelta(hours=SHARD_MAX_AGE_HOURS):
+            print(f"⚠️ Skip shard {partial['shard']}: written at {partial['run_clock']}")
+            continue
+        fresh.append(partial)
+
+    count = counts.pop()
+    missing = sorted(set(range(count)) - {partial['shard'] for partial in fresh})
+    if missing:
+        print(f"⚠️ Missing shards {missing} of {count}; their feeds wait for the next run")
+    return sorted(fresh, key=lambda partial: partial['shard'])
+
+
+def merge_shards(args, registry):
+    global RUN_CLOCK
+    partials = load_shard_partials(args.shard_dir)
+    # The latest worker's clock dates the digest and scores recency.
+    if RUN_CLOCK is None:
+        RUN_CLOCK = max(datetime.fromisoformat(partial['run_clock']) for partial in partials)
+    print(f"🧱 Merging {len(partials)} shards from {args.shard_dir}")
+    # Before any late enrichment, so it reuses what the shards extracted.
+    # publish_digest saves the merged caches.
+    for partial in partials:
+        caches = partial['caches']
+        get_extract_store().merge(caches['extracts'])
+        get_image_strategy_stats().merge(caches['image_strategies'])
+        get_image_probes().merge(caches['image_probes'])
+        if 'hedge' in caches:
+            get_hedge_stats().merge(caches['hedge'])
+
+    resolved = {}
+    articles = {}
+    for partial in partials:
+        for link, final_link in partial['resolved'].items():
+            resolved.setdefault(link, final_link)
+        for final_link, article in partial['articles'].items():
+            articles.setdefault(final_link, article)
+
+    seen_keys = set()
+    new_news = []
+    late = 0
+    for category in registry:
+        print(f"{category['icon']} Merging {category['name'].upper()}...")
+        candidates = [
+            shard_candidate_from_record(record)
+            for partial in partials
+            for record in partial['candidates'].get(category['name'], [])
+        ]
+        candidates.sort(key=lambda c: (c['feed'], c['key'], c['link']))
+        ranked = rank_candidates(candidates, category['keyword_pattern'], top_n=category['max_articles'])
+
+        picked = 0
+        for candidate in ranked:
+            if picked >= category['max_articles']:
+                break
+            final_link = resolved.get(candidate['link']) or resolve_final_article_url(candidate['link'])
+            if canonical_key(final_link) in seen_keys:
+                print(f"♻️ Same article as an earlier pick: {candidate['title'][:60]}")
+                continue
+            seen_keys.add(canonical_key(final_link))
+
+            article = articles.get(final_link)
+            if article is None:
+                late += 1
+                item = enrich_candidate(candidate, final_link)
+            else:
+                item = {
+                    'title': candidate['title'],
+                    'link': final_link,
+                    'source': candidate['source'],
+                    'summary': candidate['summary'],
+                }
+                item.update(article)
+            item['category'] = category['label']
+            new_news.append(item)
+            picked += 1
+
+    if late:
+        print(f"🧱 {late} picks were enriched during the merge; their shards ranked them lower")
+
+    watermarks = None
+    if not args.no_watermarks:
+        watermarks = FeedWatermarks.load(run_now(timezone.utc), catch_up_hours=args.catch_up)
+        for partial in partials:
+            watermarks.updates.update(partial['watermarks'])
+    feed_stats = FeedStats.load()
+    for partial in partials:
+        for url, stats in partial['feed_stats'].items():
+            feed_stats.stats[url] = stats
+            feed_stats.touched.add(url)
+
+    model = publish_digest(args, registry, [], new_news, watermarks, feed_stats)
+    if model:
+        check_page_budget(model.get('page_bytes'), args.page_budget_kb, args.page_budget_warn)
+
+
+def shard_worker_argv(args):
+    # Only what changes fetching and selection; outputs, archives, profiling
+    # and serving belong to the merging process alone.
+    argv = [
+        '--feeds', args.feeds, '--state-dir', args.state_dir,
+        '--feed-parser', args.feed_parser, '--feed-order', args.feed_order, '--selection', args.selection,
+        '--parse-workers', str(args.parse_workers), '--fetch-workers', str(args.fetch_workers),
+    ]
+    if args.catch_up:
+        argv += ['--catch-up', str(args.catch_up)]
+    if args.no_watermarks:
+        argv.append('--no-watermarks')
+    if args.hedge:
+        argv += ['--hedge', '--hedge-fraction', str(args.hedge_fraction)]
+    if args.save_pages:
+        argv += ['--save-pages', args.save_pages]
+    return argv
+
+
+def run_local_shards(args, count, shard_dir):
+    # Each worker is its own interpreter, as on separate CI runners.
+    worker_argv = shard_worker_argv(args)
+
+    os.makedirs(shard_dir, exist_ok=True)
+    for name in os.listdir(shard_dir):
+        if SHARD_FILE_PATTERN.match(name):
+            os.remove(os.path.join(shard_dir, name))
+
+    started = time.perf_counter()
+    workers = []
+    for shard in range(count):
+        log_path = os.path.join(shard_dir, f'shard-{shard}-of-{count}.log')
+        log = open(log_path, 'w', encoding='utf-8')
+        command = [sys.executable, os.path.abspath(__file__)] + worker_argv + [
+            '--shard', f'{shard}/{count}', '--shard-dir', shard_dir
+        ]
+        workers.append((shard, log_path, log, subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)))
+
+    for shard, log_path, log, process in workers:
+        code = process.wait()
+        log.close()
+        status = "✅" if code == 0 else f"⚠️ exit {code}"
+        print(f"🧱 Shard {shard}/{count} {status} (log: {log_path})")
+    print(f"🧱 {count} shards finished in {time.perf_counter() - started:.1f} s")
+
 
 
 # =========================
-# DOCX Output
+# Digest Service
 # =========================
+# `--serve PORT` keeps one process up: the parse pool, HTTP connections and
+# every in-memory cache (resolved links, Google News decodes, page extracts,
+# the image index, feed validators) survive between refreshes. Each refresh
+# is an incremental run, so it only reads what changed since the last one.
+#   GET  /               latest HTML digest (and its /assets/...)
+#   GET  /digest.docx    latest DOCX
+#   GET  /status         JSON: last refresh, its duration, new items, errors
+#   POST /refresh        refresh now and answer with the new status
+
+DEFAULT_REFRESH_MINUTES = 60
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+def reset_run_memos(new_day):
+    # Failures are retried on the next refresh; successes stay for the day.
+    GNEWS_FAILED.clear()
+    for memo in (EXTRACT_CACHE, PAGE_HEADS):
+        for url in [url for url, page in memo.items() if page is None]:
+            del memo[url]
+    if IMAGE_STORE is not None:
+        IMAGE_STORE.failed.clear()
+        IMAGE_STORE.downloads = IMAGE_STORE.hits = 0
+    if IMAGE_PROBES is not None:
+        IMAGE_PROBES.failed.clear()
+    if new_day:
+        EXTRACT_CACHE.clear()
+        PAGE_HEADS.clear()
+        CANONICAL_URLS.clear()
+        GNEWS_DECODED.clear()
+
+
+class DigestService:
+    def __init__(self, args, refresh_minutes):
+        self.args = args
+        self.refresh_minutes = refresh_minutes
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.day = None
+        self.status = {'refreshes': 0, 'last_refresh': None, 'seconds': None, 'new_items': None,
+                       'error': None, 'next_refresh': None}
+
+    def refresh(self, reason):
+        with self.lock:
+            today = run_now(IST_OFFSET).date()
+            reset_run_memos(new_day=self.day is not None and today != self.day)
+            self.day = today
+
+            print(f"🔄 Refresh ({reason}) at {run_now(IST_OFFSET):%H:%M:%S}")
+            started = time.perf_counter()
+            error = None
+            new_news = []
+            try:
+                # Re-read so feeds.json edits apply without a restart.
+                new_news = run_digest(self.args, load_feed_registry(self.args.feeds)) or []
+            except (Exception, SystemExit) as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ Refresh failed: {error}")
+
+            self.status.update({
+                'refreshes': self.status['refreshes'] + 1,
+                'last_refresh': run_now(timezone.utc).isoformat(),
+                'seconds': round(time.perf_counter() - started, 2),
+                'new_items': len(new_news),
+                'error': error,
+            })
+            print(f"🔄 Refresh done in {self.status['seconds']:.2f} s, {len(new_news)} new items")
+            return dict(self.status)
+
+    def run_schedule(self):
+        while True:
+            self.refresh('schedule')
+            self.status['next_refresh'] = (
+                run_now(timezone.utc) + timedelta(minutes=self.refresh_minutes)
+            ).isoformat()
+            self.wakeup.wait(self.refresh_minutes * 60)
+            self.wakeup.clear()
+
+
+class DigestServiceHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body, content_type, extra_headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def reply_json(self, status, data):
+        self.reply(status, json.dumps(data, indent=1).encode('utf-8'), 'application/json')
+
+    def reply_file(self, path, content_type, extra_headers=None):
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            self.reply_json(503, {'error': 'digest not ready yet', 'status': self.service.status})
+            return
+        self.reply(200, body, content_type, extra_headers)
+
+    def do_GET(self):
+        path = unquote(urlparse(self.path).path)
+        html_filename, docx_filename = digest_filenames()
+
+        if path in ('/', '/digest.html'):
+            self.reply_file(html_filename, 'text/html; charset=utf-8')
+        elif path == '/digest.docx':
+            self.reply_file(docx_filename, DOCX_CONTENT_TYPE,
+                            {'Content-Disposition': f'attachment; filename="{docx_filename}"'})
+        elif path == '/status':
+            self.reply_json(200, self.service.status)
+        elif path.startswith(f'/{HTML_ASSET_DIR}/'):
+            root = os.path.realpath(HTML_ASSET_DIR)
+            target = os.path.realpath(os.path.join(root, path[len(HTML_ASSET_DIR) + 2:]))
+            if not target.startswith(root + os.sep) or not os.path.isfile(target):
+                self.reply_json(404, {'error': 'not found'})
+                return
+            content_type = {
+                '.css': 'text/css', '.js': 'application/javascript', '.webp': 'image/webp',
+                '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
+            }.get(os.path.splitext(target)[1].lower(), 'application/octet-stream')
+            self.reply_file(target, content_type, {'Cache-Control': 'max-age=31536000, immutable'})
+        else:
+            self.reply_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/refresh':
+            self.reply_json(404, {'error': 'not found'})
+            return
+        status = self.service.refresh('request')
+        self.reply_json(500 if status['error'] else 200, status)
+
+
+def serve_digest(args, port, refresh_minutes=DEFAULT_REFRESH_MINUTES, host='127.0.0.1'):
+    args.incremental = True
+    service = DigestService(args, refresh_minutes)
+    DigestServiceHandler.service = service
+
+    server = ThreadingHTTPServer((host, port), DigestServiceHandler)
+    server.daemon_threads = True
+    threading.Thread(target=service.run_schedule, daemon=True).start()
+    print(f"🛰️ Serving the digest on http://{host}:{port}/ (refresh every {refresh_minutes:g} min, "
+          f"POST /refresh for one now)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# =========================
+# Profiler
+# =========================
+# --profile samples every thread's stack from a background thread. Each
+# sample is put in a stage by its innermost recognised frame, so no pipeline
+# code needs instrumenting. Output goes next to the digest: a collapsed-stack
+# file (thread;stage;outer;...;inner count) for flamegraph.pl or speedscope,
+# and a summary of time per stage and the hottest functions.
+
+PROFILE_INTERVAL = 0.005
+PROFILE_TOP_N = 25
+
+PROFILE_STAGE_FUNCTIONS = {
+    'open_feed': 'feed parsing',
+    'StreamingFeed': 'feed parsing',
+    'iter_feed_candidates': 'feed parsing',
+    'rank_candidates': 'ranking',
+    'decode_google_news_urls': 'URL resolution',
+    'select_canonical_candidates': 'URL resolution',
+    'resolve_final_article_url': 'URL resolution',
+    'canonicalize_article_url': 'URL resolution',
+    'prefetch_page_extracts': 'page download',
+    'get_page_extract': 'page download',
+    'extract_page': 'page parsing',
+    'find_raw_html_images': 'regex extraction',
+    'find_jsonld_images': 'regex extraction',
+    'extract_body_with_regex': 'regex extraction',
+    'find_msn_original_url': 'regex extraction',
+    'ImageStore': 'image download',
+    'dedupe_digest_images': 'image download',
+    'prepare_thumbnails': 'thumbnails',
+    'build_html_page': 'HTML render',
+    'generate_docx': 'python-docx assembly',
+}
+PROFILE_STAGE_MODULES = (
+    (os.sep + 'newspaper' + os.sep, 'newspaper parsing'),
+    (os.sep + 'feedparser' + os.sep, 'feed parsing'),
+    (os.sep + 'docx' + os.sep, 'python-docx assembly'),
+)
+
+
+def profile_frame_label(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)})"
+
+
+def profile_stage(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    stage = PROFILE_STAGE_FUNCTIONS.get(name) or PROFILE_STAGE_FUNCTIONS.get(name.split('.')[0])
+    if stage:
+        return stage
+    for fragment, module_stage in PROFILE_STAGE_MODULES:
+        if fragment in code.co_filename:
+            return module_stage
+    return None
+
+
+class SamplingProfiler:
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stage_wall = Counter()
+        self.stage_busy = Counter()
+        self.self_samples = Counter()
+        self.total_samples = Counter()
+        self.ticks = 0
+        self.sampler_seconds = 0.0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profiler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread.start()
+        print(f"🔬 Profiling every {self.interval * 1000:.0f} ms")
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def run(self):
+        me = threading.get_ident()
+        main = threading.main_thread().ident
+        while not self.stopped.wait(self.interval):
+            tick_started = time.thread_time()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.ticks += 1
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self.sample(frame, ident == main, names.get(ident, str(ident)))
+            self.sampler_seconds += time.thread_time() - tick_started
+
+    def sample(self, frame, is_main, thread_name):
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+
+        stage = None
+        for code in codes:
+            stage = profile_stage(code)
+            if stage:
+                break
+
+        # Idle pool workers and helper threads only count inside a stage.
+        if stage is None and not is_main:
+            return
+        stage = stage or 'other'
+        if is_main:
+            self.stage_wall[stage] += 1
+
+        labels = [profile_frame_label(code) for code in reversed(codes)]
+        self.stage_busy[stage] += 1
+        self.stacks[';'.join(['main' if is_main else thread_name.split('_')[0], stage] + labels)] += 1
+        self.self_samples[labels[-1]] += 1
+        for label in set(labels):
+            self.total_samples[label] += 1
+
+    def write(self, stem):
+        folded_path = stem + '.profile.folded'
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        busy = sum(self.stage_busy.values()) or 1
+        lines = [
+            f"Run {self.elapsed:.1f} s, {self.ticks} ticks every {self.interval * 1000:.0f} ms, "
+            f"sampler overhead {self.sampler_seconds / self.elapsed * 100:.1f}% of one core",
+            "wall: what the main thread was doing or waiting on; thread samples: busy samples in any thread",
+            f"{'stage':<24} {'wall s':>8} {'wall %':>7} {'thread samples':>15} {'share %':>8}",
+        ]
+        wall = sum(self.stage_wall.values()) or 1
+        for stage, count in self.stage_busy.most_common():
+            lines.append(
+                f"{stage:<24} {self.stage_wall[stage] * self.interval:>8.2f} "
+                f"{self.stage_wall[stage] / wall * 100:>6.1f}% {count:>15} {count / busy * 100:>7.1f}%"
+            )
+        lines += ["", f"Top {PROFILE_TOP_N} functions by self samples (all threads)",
+                  f"{'self':>7} {'total':>7}  function"]
+        for label, count in self.self_samples.most_common(PROFILE_TOP_N):
+            lines.append(f"{count:>7} {self.total_samples[label]:>7}  {label}")
+
+        summary_path = stem + '.profile.txt'
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        print('\n'.join(lines[:4 + len(self.stage_busy)]))
+        print(f"🔬 Profile: {folded_path}, {summary_path}")
+
+
+# =========================
+# Benchmarks
+# =========================
+
+def record_feed_copies(feeds, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+
+    cutoff_time = datetime.now(timezone.utc) - timedelta(hours=DEFAULT_WINDOW_HOURS)
 
-digest_date_str = datetime.now(ist_offset).strftime('%A, %d/%m/%Y')
-docx_filename = f"iirs_daily_space_digest_{datetime.now(ist_offset).strftime('%d_%m_%Y')}.docx"
+    for url in feeds:
+        url = expand_feed_url(url, cutoff_time)
+        try:
+            response = http_get(url)
+            response.raise_for_status()
+            path = os.path.join(output_dir, sanitize_filename(url)[:120] + '.xml')
+            with open(path, 'wb') as f:
+                f.write(response.content)
+            print(f"💾 Recorded {url} -> {path} ({len(response.content)} bytes)")
+        except Exception as e:
+            print(f"⚠️ Skip {url}: {e}")
+
+
+def time_call(func, repeats):
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_feed_parsers(corpus_dir, repeats=5):
+    cutoff_time = datetime.now(timezone.utc) - timedelta(hours=24)
+    paths = sorted(
+        os.path.join(corpus_dir, name)
+        for name in os.listdir(corpus_dir)
+        if name.endswith('.xml')
+    )
+    if not paths:
+        print(f"⚠️ No recorded feeds (*.xml) in {corpus_dir}")
+        return
+
+    def run_feedparser(data):
+        parsed = feedparser.parse(data)
+        return [e for e in parsed.entries[:FEED_ENTRY_LIMIT] if is_within_last_24_hours(e, cutoff_time)]
+
+    def run_stream(data):
+        parsed = StreamingFeed.from_bytes(data, cutoff_time=cutoff_time)
+        return [e for e in parsed.entries if is_within_last_24_hours(e, cutoff_time)]
+
+    total_fp = 0.0
+    total_stream = 0.0
+
+    print(f"{'feed':<60} {'KB':>7} {'feedparser ms':>14} {'stream ms':>10} {'speedup':>8} {'in window':>10}")
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        fp_time, fp_entries = time_call(lambda: run_feedparser(data), repeats)
+        stream_time, stream_entries = time_call(lambda: run_stream(data), repeats)
+        total_fp += fp_time
+        total_stream += stream_time
+
+        speedup = fp_time / stream_time if stream_time else 0.0
+        print(
+            f"{os.path.basename(path)[:60]:<60} {len(data) / 1024:>7.1f} "
+            f"{fp_time * 1000:>14.2f} {stream_time * 1000:>10.2f} {speedup:>7.1f}x "
+            f"{len(fp_entries):>4}/{len(stream_entries):<5}"
+        )
+
+    speedup = total_fp / total_stream if total_stream else 0.0
+    print(f"{'TOTAL':<60} {'':>7} {total_fp * 1000:>14.2f} {total_stream * 1000:>10.2f} {speedup:>7.1f}x")
+
+
+def benchmark_ranking(corpus_dir, repeats=20):
+    candidates = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith('.xml'):
+            continue
+        with open(os.path.join(corpus_dir, name), 'rb') as f:
+            feed = StreamingFeed.from_bytes(f.read(), limit=10 ** 6)
+        for entry in feed.entries:
+            candidates.append({
+                'title': re.sub(r'<[^>]+>', '', entry.get('title', '')),
+                'link': entry.get('link', ''),
+                'summary': sanitize_html_content(entry.get('summary', '')),
+                'published': get_entry_published_time(entry),
+                'priority': 1.0,
+            })
+
+    if not candidates:
+        print(f"⚠️ No recorded feeds (*.xml) in {corpus_dir}")
+        return
+
+    for name, pattern in KEYWORD_PATTERNS.items():
+        elapsed, _ = time_call(lambda: score_candidates(candidates, pattern), repeats)
+        print(f"{name:<14} scored {len(candidates)} candidates in {elapsed * 1000:.2f} ms")
+
+
+def benchmark_page_parsing(corpus_dir, max_workers=4, repeats=3):
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith('.html'):
+            with open(os.path.join(corpus_dir, name), 'rb') as f:
+                pages.append((f'https://example.com/{name}', f.read()))
+
+    if not pages:
+        print(f"⚠️ No saved pages (*.html) in {corpus_dir}; record some with --save-pages")
+        return
+
+    total_kb = sum(len(content) for _, content in pages) / 1024
+    print(f"Parsing {len(pages)} pages ({total_kb:.0f} KB), {os.cpu_count()} CPUs available")
+
+    def run_inline():
+        return [extract_page(url, content) for url, content in pages]
+
+    baseline, _ = time_call(run_inline, repeats)
+    print(f"{'inline':<10} {baseline:8.2f} s {len(pages) / baseline:8.1f} pages/s   1.00x")
+
+    for workers in range(1, max_workers + 1):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(extract_page, [pages[0][0]] * workers, [pages[0][1]] * workers))
+
+            def run_pool():
+                futures = [pool.submit(extract_page, url, content) for url, content in pages]
+                return [future.result() for future in futures]
+
+            elapsed, _ = time_call(run_pool, repeats)
+        print(f"{workers:<2} workers {elapsed:8.2f} s {len(pages) / elapsed:8.1f} pages/s {baseline / elapsed:6.2f}x")
+
+
+# Every image and body extractor, run on its own over pages saved with
+# --save-pages. A hand-checked gold.json in the corpus
+# ({"page.html": {"image": url, "body": text}}) adds agreement scores. Each
+# run is appended to extractor_results.jsonl and compared with the last run
+# over the same pages, so numbers carry across versions of the script.
+EXTRACTOR_GOLD = 'gold.json'
+EXTRACTOR_RESULTS = 'extractor_results.jsonl'
+BODY_AGREEMENT_F1 = 0.8
+
+BENCH_EXTRACTORS = [
+    ('image/newspaper', lambda url, text: next(iter(parse_with_newspaper(url, text)['images']), None)),
+    ('image/raw_html', lambda url, text: next(iter(find_raw_html_images(text, url)), None)),
+    ('image/jsonld', lambda url, text: next(iter(find_jsonld_images(text, url)), None)),
+    ('image/head', lambda url, text: next(iter(find_head_images(re.split(r'</head\s*>', text, 1, flags=re.I)[0], url)), None)),
+    ('body/newspaper', lambda url, text: parse_with_newspaper(url, text)['text']),
+    ('body/regex', lambda url, text: extract_body_with_regex(text)),
+]
+
+
+def load_saved_pages(corpus_dir):
+    urls = {}
+    try:
+        with open(os.path.join(corpus_dir, 'index.jsonl'), encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                urls[record['file']] = record['url']
+    except Exception:
+        pass
+
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith('.html'):
+            with open(os.path.join(corpus_dir, name), 'rb') as f:
+                pages.append((name, urls.get(name, f'https://example.com/{name}'), f.read()))
+    return pages
+
+
+def same_image(found, expected):
+    # Hosts serve one image under several schemes and resize queries.
+    def key(url):
+        parsed = urlparse(url or '')
+        return parsed.netloc.lower().removeprefix('www.') + parsed.path
+    return bool(found and expected) and key(found) == key(expected)
+
+
+def body_f1(found, expected):
+    found_words = Counter(re.findall(r'\w+', (found or '').lower()))
+    expected_words = Counter(re.findall(r'\w+', (expected or '').lower()))
+    overlap = sum((found_words & expected_words).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(found_words.values())
+    recall = overlap / sum(expected_words.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def write_gold_template(corpus_dir, pages):
+    # What the digest would pick today, as a starting point for labelling.
+    template = {}
+    for name, url, content in pages:
+        page = extract_page(url, content)
+        images = page['newspaper_images'] + page['raw_html_images'] + page['jsonld_images']
+        text = page['text'] if len(page['text']) >= MIN_BODY_CHARS else page['regex_text']
+        template[name] = {'image': next(iter(images), None), 'body': text}
+    path = os.path.join(corpus_dir, 'gold.template.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(template, f, ensure_ascii=False, indent=1)
+    print(f"📝 No {EXTRACTOR_GOLD}; wrote {path} - check it by hand and rename it to score agreement")
+
+
+def benchmark_extractors(corpus_dir, repeats=3):
+    pages = load_saved_pages(corpus_dir) if os.path.isdir(corpus_dir) else []
+    if not pages:
+        print(f"⚠️ No saved pages (*.html) in {corpus_dir}; record some with --save-pages")
+        return
+
+    gold = {}
+    try:
+        with open(os.path.join(corpus_dir, EXTRACTOR_GOLD), encoding='utf-8') as f:
+            gold = json.load(f)
+    except FileNotFoundError:
+        pass
+    texts = [(name, url, decode_html(content)) for name, url, content in pages]
+    corpus_hash = hashlib.sha1()
+    for name, _, content in pages:
+        corpus_hash.update(name.encode('utf-8') + content)
+    with open(os.path.abspath(__file__), 'rb') as f:
+        script_hash = hashlib.sha1(f.read()).hexdigest()[:12]
+
+    print(f"Running {len(BENCH_EXTRACTORS)} extractors over {len(pages)} pages ({len(gold)} labelled)")
+    results = {}
+    for label, extract in BENCH_EXTRACTORS:
+        kind = label.split('/')[0]
+        latencies, peaks, found, scores = [], [], 0, []
+        for name, url, text in texts:
+            elapsed, value = time_call(lambda: extract(url, text), repeats)
+            latencies.append(elapsed * 1000)
+
+            tracemalloc.start()
+            extract(url, text)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.stop()
+
+            if kind == 'image':
+                found += bool(value)
+            else:
+                found += len(value or '') >= MIN_BODY_CHARS
+            expected = gold.get(name, {}).get(kind)
+            if expected is not None:
+                if kind == 'image':
+                    scores.append(1.0 if same_image(value, expected) else 0.0)
+                else:
+                    scores.append(body_f1(value, expected))
+
+        results[label] = {
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p90_ms': round(percentile(latencies, 90), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'peak_kb': round(max(peaks), 1),
+            'success': round(found / len(texts), 3),
+            'agreement': round(sum(scores) / len(scores), 3) if scores else None,
+            'agree_rate': (
+                round(sum(1 for score in scores if score >= BODY_AGREEMENT_F1) / len(scores), 3)
+                if scores else None
+            ),
+        }
+
+    record = {
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'script': script_hash,
+        'corpus': corpus_hash.hexdigest()[:12],
+        'pages': len(pages),
+        'labelled': len(gold),
+        'extractors': results,
+    }
+    results_path = os.path.join(corpus_dir, EXTRACTOR_RESULTS)
+    previous = None
+    try:
+        with open(results_path, encoding='utf-8') as f:
+            for line in f:
+                past = json.loads(line)
+                if past.get('corpus') == record['corpus']:
+                    previous = past
+    except Exception:
+        pass
+
+    def agreement(value):
+        return f"{value * 100:.0f}%" if value is not None else '-'
+
+    print(f"{'extractor':<16} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'peak KB':>8} "
+          f"{'success':>8} {'gold':>6} {'gold ok':>8}")
+    for label, row in results.items():
+        line = (
+            f"{label:<16} {row['p50_ms']:>8.2f} {row['p90_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['peak_kb']:>8.0f} "
+            f"{row['success'] * 100:>7.0f}% {agreement(row['agreement']):>6} {agreement(row['agree_rate']):>8}"
+        )
+        before = (previous or {}).get('extractors', {}).get(label)
+        if before:
+            line += f"   p50 {row['p50_ms'] - before['p50_ms']:+.2f} ms vs {previous['script']}"
+        print(line)
+    if not gold:
+        write_gold_template(corpus_dir, pages)
+
+    with open(results_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+    print(f"💾 Results appended to {results_path}")
+
+
+def write_synthetic_article_store(count, end_day, days=7):
+    paragraph = (
+        "ISRO's PSLV placed the earth observation satellite into a sun-synchronous orbit, "
+        "and the ground station at Dehradun confirmed telemetry shortly after separation. "
+    ) * 3
+    by_day = {}
+    for i in range(count):
+        day = end_day - timedelta(days=i % days)
+        by_day.setdefault(day, []).append({
+            'category': 'Compendium',
+            'title': f'Synthetic article {i}: satellite mission update',
+            'link': f'https://example.com/articles/{i}',
+            'source': 'Synthetic Source',
+            'summary': paragraph[:300],
+            'image': None,
+            'body': [f'{i}. {paragraph}'] * 6,
+        })
+    for day, items in by_day.items():
+        append_article_records(items, day)
+
+
+def measure_compendium_memory(state_dir, output_dir, end_day, volume_size, queue):
+    global STATE_DIR
+    STATE_DIR = state_dir
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    paths = generate_compendium('weekly', end_day, output_dir, volume_size=volume_size)
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((peak_rss_kb, traced_peak, elapsed, len(paths)))
+
+
+def benchmark_compendium_memory(sizes=(19, 500, 5000), volume_size=DEFAULT_VOLUME_SIZE):
+    # Each size runs in a fresh interpreter so peak RSS is not inherited.
+    global STATE_DIR
+
+    context = multiprocessing.get_context('spawn')
+    end_day = date.today()
+    rows = []
+
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            state_dir = os.path.join(workdir, 'state')
+            previous_state_dir, STATE_DIR = STATE_DIR, state_dir
+            try:
+                write_synthetic_article_store(count, end_day)
+            finally:
+                STATE_DIR = previous_state_dir
+
+            queue = context.Queue()
+            process = context.Process(
+                target=measure_compendium_memory,
+                args=(state_dir, workdir, end_day, volume_size, queue)
+            )
+            process.start()
+            result = queue.get()
+            process.join()
+            rows.append((count,) + result)
+
+    print(f"{'articles':>8} {'volumes':>8} {'peak RSS MB':>12} {'py heap peak MB':>16} {'traced s':>8}")
+    for count, peak_rss_kb, traced_peak, elapsed, volumes in rows:
+        print(f"{count:>8} {volumes:>8} {peak_rss_kb / 1024:>12.1f} {traced_peak / 1048576:>16.1f} {elapsed:>8.1f}")
+
+
+# Synthetic state from 1 MB to 1 GB: 4 MB records shaped like page extracts,
+# plus the small records every run reads. Each size is timed in a fresh
+# interpreter (the OS page cache stays warm): opening the snapshot, loading
+# one small and the first large record, and appending a save; against it, decoding
+# the same state from the old per-name JSON files, all of it up front.
+SNAPSHOT_BENCH_SIZES_MB = (1, 10, 100, 1000)
+SNAPSHOT_BENCH_RECORD_BYTES = 4 * 1024 * 1024
+
+
+def synthetic_extract_record(n, target_bytes):
+    paragraph = "The launch vehicle lifted off on schedule and placed the satellite in orbit. " * 20
+    pages = {}
+    size = 0
+    i = 0
+    while size < target_bytes:
+        url = f"https://example.com/{n}/article-{i}"
+        pages[url] = {
+            'sha': hashlib.sha256(url.encode('utf-8')).hexdigest(),
+            'used': 1700000000 + i,
+            'extract': {'url': url, 'canonical': url, 'text': paragraph, 'regex_text': '',
+                        'newspaper_images': [f"{url}/hero.jpg"], 'raw_html_images': [], 'jsonld_images': []},
+        }
+        size += len(paragraph) + 420
+        i += 1
+    return {'pages': pages}
+
+
+def write_synthetic_state(state_dir, legacy_dir, total_bytes):
+    global STATE_DIR
+    previous, STATE_DIR = STATE_DIR, state_dir
+    try:
+        small = {f"https://example.com/feed-{i}.xml": {'published': '2026-01-01T00:00:00+00:00', 'entry_id': str(i)}
+                 for i in range(100)}
+        records = {'watermarks.json': small}
+        count = -(-total_bytes // SNAPSHOT_BENCH_RECORD_BYTES)
+        for n in range(count):
+            records[f'bench/extracts-{n:04d}.json'] = synthetic_extract_record(
+                n, min(total_bytes - n * SNAPSHOT_BENCH_RECORD_BYTES, SNAPSHOT_BENCH_RECORD_BYTES))
+            for name in list(records):
+                get_state_snapshot().put(name, records[name])
+                path = os.path.join(legacy_dir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(records[name], f, sort_keys=True, separators=(',', ':'))
+            records = {}
+        return count + 1
+    finally:
+        get_state_snapshot().close()
+        STATE_DIR = previous
+
+
+def measure_snapshot_start(state_dir, legacy_dir, queue):
+    global STATE_DIR
+    STATE_DIR = state_dir
+
+    started = time.perf_counter()
+    snapshot = get_state_snapshot()
+    opened = time.perf_counter() - started
+
+    started = time.perf_counter()
+    load_json_state('watermarks.json')
+    small = time.perf_counter() - started
+
+    started = time.perf_counter()
+    load_json_state('bench/extracts-0000.json')
+    large = time.perf_counter() - started
+    lazy_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    save_json_state('watermarks.json', {'saved': True})
+    saved = time.perf_counter() - started
+    snapshot.close()
+
+    started = time.perf_counter()
+    for root, _, files in os.walk(legacy_dir):
+        for name in files:
+            with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+                json.load(f)
+    eager = time.perf_counter() - started
+
+    queue.put((opened, small, large, lazy_rss_kb, saved, eager))
+
+
+def benchmark_snapshot_start(sizes_mb=SNAPSHOT_BENCH_SIZES_MB):
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for size_mb in sizes_mb:
+        with tempfile.TemporaryDirectory() as workdir:
+            state_dir = os.path.join(workdir, 'state')
+            legacy_dir = os.path.join(workdir, 'legacy')
+            records = write_synthetic_state(state_dir, legacy_dir, size_mb * 1024 * 1024)
+            snapshot_bytes = os.path.getsize(os.path.join(state_dir, SNAPSHOT_FILE))
+
+            queue = context.Queue()
+            process = context.Process(target=measure_snapshot_start, args=(state_dir, legacy_dir, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            rows.append((snapshot_bytes, records) + result)
+
+    print(f"{'snapshot MB':>11} {'records':>8} {'open ms':>8} {'small ms':>9} {'large ms':>8} "
+          f"{'RSS MB':>7} {'save ms':>8} {'eager JSON s':>13}")
+    for snapshot_bytes, records, opened, small, large, rss_kb, saved, eager in rows:
+        print(f"{snapshot_bytes / 1048576:>11.1f} {records:>8} {opened * 1000:>8.2f} {small * 1000:>9.2f} "
+              f"{large * 1000:>8.1f} {rss_kb / 1024:>7.0f} {saved * 1000:>8.2f} {eager:>13.2f}")
+
+
+BENCHMARKS = {
+    'feeds': lambda args: benchmark_feed_parsers(args.corpus),
+    'ranking': lambda args: benchmark_ranking(args.corpus),
+    'parse': lambda args: benchmark_page_parsing(args.corpus, max_workers=args.parse_workers or 4),
+    'extractors': lambda args: benchmark_extractors(args.corpus),
+    'memory': lambda args: benchmark_compendium_memory(volume_size=args.volume_size),
+    'snapshot': lambda args: benchmark_snapshot_start(),
+}
+
+
+# =========================
+# Main
+# =========================
 
-generate_docx(
-    news_items=all_news,
-    output_path=docx_filename,
-    digest_date_str=digest_date_str
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="IIRS Daily Space Digest")
+    parser.add_argument(
+        '--feed-parser', choices=['stream', 'feedparser'], default='stream',
+        help="stream: incremental parser with early stop (falls back to feedparser on malformed feeds)"
+    )
+    parser.add_argument(
+        '--catch-up', type=float, metavar='HOURS',
+        help="look back HOURS for every feed (e.g. after downtime), instead of the default "
+             f"{DEFAULT_WINDOW_HOURS}h window and {MAX_LOOKBACK_HOURS}h watermark cap"
+    )
+    parser.add_argument('--no-watermarks', action='store_true', help="ignore per-feed watermarks (plain rolling window)")
+    parser.add_argument('--feeds', default=FEED_REGISTRY_PATH, help="feed registry (JSON)")
+    parser.add_argument(
+        '--feed-order', choices=['adaptive', 'config'], default='adaptive',
+        help="adaptive: read feeds with the best historical yield per second first"
+    )
+    parser.add_argument(
+        '--selection', choices=['rank', 'first'], default='rank',
+        help="rank: score every candidate in a category and enrich only the top N; first: first N matches"
+    )
+    parser.add_argument(
+        '--parse-workers', type=int, default=0, metavar='N',
+        help="parse and extract article pages in N worker processes (0: in the main process)"
+    )
+    parser.add_argument('--hedge', action='store_true',
+                        help="race slow page fetches against an AMP, canonical or fresh-connection copy")
+    parser.add_argument('--hedge-fraction', type=float, default=HEDGE_MAX_FRACTION, metavar='F',
+                        help="at most this share of page fetches may be hedged")
+    parser.add_argument(
+        '--fetch-workers', type=int, default=FETCH_WORKERS, metavar='N',
+        help="download the selected articles' pages N at a time"
+    )
+    parser.add_argument('--save-pages', metavar='DIR', help="also save every fetched article page into DIR")
+    parser.add_argument(
+        '--compendium', choices=sorted(COMPENDIUM_PERIODS),
+        help="build a weekly/monthly DOCX compendium from stored articles instead of the daily digest"
+    )
+    parser.add_argument(
+        '--compendium-end', type=date.fromisoformat, default=None, metavar='YYYY-MM-DD',
+        help="last day covered by the compendium (default: today)"
+    )
+    parser.add_argument(
+        '--volume-size', type=int, default=DEFAULT_VOLUME_SIZE, metavar='N',
+        help="articles per compendium volume"
+    )
+    parser.add_argument('--theme', choices=HTML_THEMES, default='full',
+                        help="HTML theme; 'lite' has no starfield, blur or animations")
+    parser.add_argument('--page-budget-kb', type=int, metavar='KB',
+                        help="fail the run when the HTML page, assets and images exceed KB")
+    parser.add_argument('--page-budget-warn', action='store_true',
+                        help="only warn when the page exceeds --page-budget-kb")
+    parser.add_argument('--output-dir', default='.', help="where compendium volumes are written")
+    parser.add_argument('--state-dir', default=STATE_DIR, help="directory holding persisted run state")
+    parser.add_argument('--formats', type=parse_formats, default=list(RENDER_FORMATS), metavar='LIST',
+                        help=f"comma-separated outputs to render (default: {','.join(RENDER_FORMATS)})")
+    parser.add_argument('--show-state', nargs='?', const='', metavar='NAME',
+                        help="list the records in the state snapshot, or print record NAME as JSON")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="ignore the checkpoint an interrupted run left and start from scratch")
+    parser.add_argument('--incremental', action='store_true',
+                        help="add only items new since the last run to today's HTML and DOCX")
+    parser.add_argument('--profile', action='store_true',
+                        help="sample the run and write a collapsed-stack profile and summary next to the digest")
+    parser.add_argument('--record-archive', metavar='FILE', help="record every HTTP exchange of the run into FILE")
+    parser.add_argument('--replay-archive', metavar='FILE',
+                        help="rebuild a recorded run from FILE with no network access")
+    parser.add_argument('--shard', type=parse_shard, metavar='I/N',
+                        help="fetch and enrich only shard I of N and write a partial to --shard-dir")
+    parser.add_argument('--merge', action='store_true',
+                        help="rank, dedupe and render the partials in --shard-dir")
+    parser.add_argument('--local-shards', type=int, metavar='N',
+                        help="run N shard workers as local processes, then merge")
+    parser.add_argument('--shard-dir', default='shards', metavar='DIR', help="where shard partials are written")
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help="stay up, refresh incrementally on a schedule and serve the digest on PORT")
+    parser.add_argument('--serve-host', default='127.0.0.1', metavar='HOST', help="address --serve listens on")
+    parser.add_argument('--refresh-minutes', type=float, default=DEFAULT_REFRESH_MINUTES, metavar='M',
+                        help="minutes between scheduled refreshes in --serve mode")
+    parser.add_argument('--save-feeds', metavar='DIR', help="record raw copies of every feed into DIR and exit")
+    parser.add_argument('--bench', choices=sorted(BENCHMARKS), help="run a benchmark instead of the digest")
+    parser.add_argument('--corpus', metavar='DIR', default='bench_corpus', help="corpus directory used by --bench")
+    return parser.parse_args(argv)
+
+
+# State that decides what a run selects and which requests it sends;
+# snapshotted into a recording so the replay starts from the same place.
+ARCHIVED_STATE = (
+    WATERMARK_STATE, FEED_STATS_STATE, EXTRACT_STORE_STATE, IMAGE_STRATEGY_STATE, CHECKPOINT_STATE,
+    IMAGE_PROBE_STATE,
 )
 
-print("📱 HTML + DOCX generation complete.")
+
+def start_recording(path, argv, registry_path):
+    global HTTP_ARCHIVE, RUN_CLOCK
+    RUN_CLOCK = datetime.now(timezone.utc)
+    with open(registry_path, 'r', encoding='utf-8') as f:
+        registry = json.load(f)
+    HTTP_ARCHIVE = HttpArchiveWriter(path, {
+        'run_clock': RUN_CLOCK.isoformat(),
+        'argv': argv,
+        'registry': registry,
+        'state': {name: load_json_state(name) for name in ARCHIVED_STATE},
+    })
+    print(f"📼 Recording HTTP exchanges to {path}")
+
+
+def start_replay(path):
+    global HTTP_ARCHIVE, RUN_CLOCK, STATE_DIR
+    HTTP_ARCHIVE = HttpArchiveReader(path)
+    meta = HTTP_ARCHIVE.meta
+
+    args = parse_args(meta['argv'])
+    args.record_archive = None
+    args.save_pages = None
+    RUN_CLOCK = datetime.fromisoformat(meta['run_clock'])
+
+    # A throwaway state dir seeded from the recording keeps the real state
+    # untouched; the extraction cache comes back as it was for the recording,
+    # so the same conditional requests find their recorded answers.
+    STATE_DIR = args.state_dir = tempfile.mkdtemp(prefix='digest-replay-')
+    for name, data in meta['state'].items():
+        if data is not None:
+            save_json_state(name, data)
+    args.feeds = state_path('feeds.json')
+    with open(args.feeds, 'w', encoding='utf-8') as f:
+        json.dump(meta['registry'], f, indent=1)
+
+    print(f"📼 Replaying run of {RUN_CLOCK.isoformat()} from {path} (state in {STATE_DIR})")
+    return args
+
+
+def main(argv=None):
+    global STATE_DIR, FETCH_WORKERS, PAGE_SAVE_DIR, HEDGING, HEDGE_MAX_FRACTION
+
+    if argv is None:
+        argv = sys.argv[1:]
+    args = parse_args(argv)
+    if args.local_shards and (args.record_archive or args.replay_archive or args.serve):
+        # Recording N workers needs N archives; record each --shard run on its own.
+        raise SystemExit("❌ --record-archive, --replay-archive and --serve do not combine with --local-shards")
+    if args.replay_archive:
+        args = start_replay(args.replay_archive)
+    STATE_DIR = args.state_dir
+    FETCH_WORKERS = args.fetch_workers
+    PAGE_SAVE_DIR = args.save_pages
+    HEDGING, HEDGE_MAX_FRACTION = args.hedge, args.hedge_fraction
+
+    registry = load_feed_registry(args.feeds)
+
+    if args.save_feeds:
+        record_feed_copies(registry_feed_urls(registry), args.save_feeds)
+        return
+
+    if args.show_state is not None:
+        show_state(args.show_state)
+        return
+
+    if args.bench:
+        BENCHMARKS[args.bench](args)
+        return
+
+    if args.compendium:
+        generate_compendium(
+            args.compendium,
+            args.compendium_end or datetime.now(IST_OFFSET).date(),
+            output_dir=args.output_dir,
+            volume_size=args.volume_size
+        )
+        return
+
+    if (args.shard or args.merge or args.local_shards) and args.incremental:
+        raise SystemExit("❌ --incremental does not combine with sharded runs")
+
+    if args.local_shards:
+        run_local_shards(args, args.local_shards, args.shard_dir)
+        args.merge = True
+
+    if args.record_archive:
+        start_recording(args.record_archive, argv, args.feeds)
+
+    profiler = SamplingProfiler() if args.profile else None
+    if profiler:
+        if args.parse_workers:
+            print("⚠️ Parsing in worker processes shows up as waiting; profile without --parse-workers")
+        profiler.start()
+
+    start_parse_pool(args.parse_workers)
+    try:
+        if args.serve:
+            serve_digest(args, args.serve, args.refresh_minutes, args.serve_host)
+        elif args.shard:
+            run_shard(args, registry, *args.shard)
+        elif args.merge:
+            merge_shards(args, registry)
+        else:
+            run_digest(args, registry)
+    finally:
+        stop_parse_pool()
+        if HTTP_ARCHIVE is not None:
+            HTTP_ARCHIVE.close()
+        if profiler:
+            profiler.stop()
+            profiler.write(f'IIRS_SpaceNews_Daily_{run_now().strftime("%Y%m%d")}')
+
+
+def run_digest(args, registry):
+    now = run_now(timezone.utc)
+    cutoff_time = now - timedelta(hours=args.catch_up or DEFAULT_WINDOW_HOURS)
+    watermarks = None
+
+    if args.no_watermarks:
+        print(f"🚀 Starting IIRS Daily Space Digest - LAST {args.catch_up or DEFAULT_WINDOW_HOURS} HOURS WINDOW...")
+    else:
+        watermarks = FeedWatermarks.load(now, catch_up_hours=args.catch_up)
+        print("🚀 Starting IIRS Daily Space Digest - NEW SINCE LAST RUN...")
+
+    # Incremental runs start from what today's digest already holds; those
+    # items are neither re-fetched nor re-parsed.
+    published = load_published_items(run_now(IST_OFFSET).date()) if args.incremental else []
+    for item in published:
+        CANONICAL_URLS.setdefault(item['link'], item['link'])
+    if args.incremental:
+        print(f"➕ Incremental run: {len(published)} items already in today's digest")
+
+    feed_stats = FeedStats.load()
+    # Canonical URLs already in the digest; a story found again under another
+    # category is skipped there.
+    fetch_options = dict(
+        seen_keys={canonical_key(item['link']) for item in published},
+        cutoff_time=cutoff_time,
+        parser_mode=args.feed_parser,
+        watermarks=watermarks,
+        feed_stats=feed_stats,
+        selection=args.selection
+    )
+
+    global RUN_CHECKPOINT
+    RUN_CHECKPOINT = checkpoint = RunCheckpoint.open(args, registry)
+    checkpoint.restore(watermarks, feed_stats)
+
+    new_news = []
+    for category in registry:
+        done = checkpoint.categories.get(category['name'])
+        if done is not None:
+            print(f"⏩ {category['name'].upper()}: {len(done)} items from the checkpoint")
+            for item in done:
+                CANONICAL_URLS.setdefault(item['link'], item['link'])
+                fetch_options['seen_keys'].add(canonical_key(item['link']))
+            new_news.extend(done)
+            continue
+
+        print(f"{category['icon']} Fetching {category['name'].upper()}...")
+
+        feeds = category['feeds']
+        if args.feed_order == 'adaptive':
+            feeds = feed_stats.order(feeds)
+
+        news_list = fetch_news_from_feeds(
+            feeds,
+            max_articles=category['max_articles'],
+            keyword_pattern=category['keyword_pattern'],
+            **fetch_options
+        )
+
+        for item in news_list:
+            item['category'] = category['label']
+            new_news.append(item)
+        checkpoint.finish_category(category['name'], news_list, watermarks, feed_stats)
+
+    model = publish_digest(args, registry, published, new_news, watermarks, feed_stats)
+    checkpoint.clear()
+    RUN_CHECKPOINT = None
+    if model:
+        check_page_budget(model.get('page_bytes'), args.page_budget_kb, args.page_budget_warn)
+    return new_news
+
+
+def digest_filenames():
+    html_filename = f'IIRS_SpaceNews_Daily_{run_now().strftime("%Y%m%d")}.html'
+    docx_filename = f"iirs_daily_space_digest_{run_now(IST_OFFSET).strftime('%d_%m_%Y')}.docx"
+    return html_filename, docx_filename
+
+
+def publish_digest(args, registry, published, new_news, watermarks, feed_stats):
+    html_filename, docx_filename = digest_filenames()
+    append_docx = bool(published) and os.path.exists(docx_filename)
+
+    if published and not new_news and append_docx and os.path.exists(html_filename):
+        print("➕ Nothing new since the last run; digest left as it is")
+        if watermarks:
+            watermarks.save()
+        feed_stats.save()
+        get_extract_store().save()
+        return None
+
+    all_news = published + new_news
+    if not all_news:
+        all_news.append({
+            'title': 'No space news in last 24h',
+            'link': '#',
+            'source': 'IIRS Digest',
+            'summary': 'Check back tomorrow!',
+            'image': None,
+            'category': 'System'
+        })
+
+    model = build_digest_model(
+        all_news, registry, html_filename, docx_filename,
+        published_count=len(published) if append_docx else 0
+    )
+    if RUN_CHECKPOINT is not None:
+        # Bodies and images are settled; a crash while rendering only costs the render.
+        RUN_CHECKPOINT.flush()
+    render_digest(model, args)
+
+    append_article_records(new_news, run_now(IST_OFFSET).date())
+
+    # Only a run that produced its outputs moves the watermarks forward.
+    if watermarks:
+        watermarks.save()
+        FEED_VALIDATORS.update(PENDING_FEED_VALIDATORS)
+    PENDING_FEED_VALIDATORS.clear()
+    if feed_stats:
+        feed_stats.save()
+    get_image_store().save()
+    get_extract_store().save()
+    get_image_strategy_stats().save()
+    get_image_probes().save()
+    if HEDGING:
+        get_hedge_stats().save()
+
+    print("📱 HTML + DOCX generation complete.")
+    return model
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from fault_site import FaultSiteHandler, GoogleNewsStubHandler, digest, start_local_server, stub_article_id
+
+
+# Client-side benchmarks against the stub services in fault_site.py:
+#   python tests/bench_stub_services.py gnews     batched vs one-at-a-time Google News decoding
+#   python tests/bench_stub_services.py hedging   page-fetch tail latency with and without --hedge
+
+def benchmark_gnews_decoding(count=60, duplicate_every=5, throttle_every=9):
+    targets = [f"https://publisher.example/space/story-{n}" for n in range(count)]
+    links = [f"https://news.google.com/rss/articles/{stub_article_id(t)}?oc=5" for t in targets]
+    links += links[::duplicate_every]
+
+    server, base = start_local_server(GoogleNewsStubHandler)
+    saved = (digest.GOOGLE_NEWS_BASE, digest.GNEWS_BATCH_SIZE, digest.GNEWS_WORKERS, digest.GNEWS_BACKOFF_SECONDS)
+    digest.GOOGLE_NEWS_BASE, digest.GNEWS_BACKOFF_SECONDS = base, 0.2
+    rows = []
+    try:
+        for label, batch_size, workers in (('one at a time', 1, 1), ('batched', 20, 4)):
+            digest.GNEWS_BATCH_SIZE, digest.GNEWS_WORKERS = batch_size, workers
+            digest.GNEWS_DECODED.clear()
+            digest.GNEWS_FAILED.clear()
+            digest.GNEWS_REQUESTS.clear()
+            GoogleNewsStubHandler.throttle_every = throttle_every
+            GoogleNewsStubHandler.counts = Counter()
+
+            start = time.perf_counter()
+            if batch_size == 1:
+                # The old path: every link, duplicates included, on its own.
+                decoded = []
+                for link in links:
+                    digest.GNEWS_DECODED.clear()
+                    decoded.append(digest.decode_google_news_urls([link])[link])
+            else:
+                result = digest.decode_google_news_urls(links)
+                decoded = [result[link] for link in links]
+            elapsed = time.perf_counter() - start
+
+            expected = targets + targets[::duplicate_every]
+            correct = sum(1 for got, want in zip(decoded, expected) if got == want)
+            counts = GoogleNewsStubHandler.counts
+            rows.append((label, len(links), correct, counts['params'] + counts['batch'],
+                         counts['throttled'], elapsed))
+    finally:
+        (digest.GOOGLE_NEWS_BASE, digest.GNEWS_BATCH_SIZE, digest.GNEWS_WORKERS,
+         digest.GNEWS_BACKOFF_SECONDS) = saved
+        server.shutdown()
+
+    print(f"{'mode':<14} {'links':>6} {'decoded':>8} {'requests':>9} {'throttled':>10} {'seconds':>8}")
+    for label, total, correct, requests_made, throttled, elapsed in rows:
+        print(f"{label:<14} {total:>6} {correct:>8} {requests_made:>9} {throttled:>10} {elapsed:>8.2f}")
+
+
+# Page fetches from FaultSiteHandler under a heavy-tailed delay, plain and
+# then hedged. The plain pass's latencies seed the hedging delay, as an
+# earlier run's would, and each page's <head> is probed first (untimed) so
+# its AMP link is known, as it is after the image strategies ran.
+HEDGE_BENCH_PAGES = 60
+HEDGE_BENCH_DELAY = ('lognormal', 0.05, 1.5)
+
+
+def benchmark_hedging(count=HEDGE_BENCH_PAGES):
+    server, base = start_local_server(FaultSiteHandler)
+    saved = (digest.HEDGING, digest.HEDGE_STATS, FaultSiteHandler.faults)
+    FaultSiteHandler.faults = {'page': {'delay': HEDGE_BENCH_DELAY}}
+    urls = [f"{base}/page/h{n}-0.html" for n in range(count)]
+    rows = []
+
+    def timed_fetch(url):
+        started = time.perf_counter()
+        try:
+            digest.hedged_get(url)
+        except Exception:
+            pass
+        return time.perf_counter() - started
+
+    try:
+        digest.PAGE_HEADS.clear()
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(digest.fetch_page_head, urls))
+
+        samples = []
+        for label, hedging in (('plain', False), ('hedged', True)):
+            digest.HEDGING = hedging
+            digest.HEDGE_STATS = digest.HedgeStats(samples)
+            delay = digest.HEDGE_STATS.delay()
+            with ThreadPoolExecutor(max_workers=digest.FETCH_WORKERS) as pool:
+                latencies = list(pool.map(timed_fetch, urls))
+            rows.append((label, latencies, digest.HEDGE_STATS, delay if hedging else None))
+            samples = latencies
+    finally:
+        digest.HEDGING, digest.HEDGE_STATS, FaultSiteHandler.faults = saved
+        digest.PAGE_HEADS.clear()
+        server.shutdown()
+
+    print(f"{count} pages, delay {HEDGE_BENCH_DELAY}, {digest.FETCH_WORKERS} at a time, "
+          f"hedges capped at {digest.HEDGE_MAX_FRACTION:.0%}")
+    print(f"{'mode':<8} {'hedge after':>11} {'p50 s':>7} {'p90 s':>7} {'p95 s':>7} {'p99 s':>7} {'max s':>7}  hedges")
+    for label, latencies, stats, delay in rows:
+        hedges = '-'
+        if delay is not None:
+            won = ', '.join(f"{n} {name}" for name, n in sorted(stats.wins.items()) if name != 'primary')
+            hedges = f"{stats.hedges}/{stats.requests}" + (f" (won: {won})" if won else '')
+        print(f"{label:<8} {(f'{delay:.2f} s' if delay is not None else '-'):>11} "
+              f"{digest.percentile(latencies, 50):>7.2f} {digest.percentile(latencies, 90):>7.2f} "
+              f"{digest.percentile(latencies, 95):>7.2f} {digest.percentile(latencies, 99):>7.2f} {max(latencies):>7.2f}  {hedges}")
+
+
+BENCHMARKS = {
+    'gnews': benchmark_gnews_decoding,
+    'hedging': benchmark_hedging,
+}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in BENCHMARKS:
+        raise SystemExit(f"usage: {sys.argv[0]} {{{'|'.join(BENCHMARKS)}}}")
+    BENCHMARKS[sys.argv[1]]()
@@ -0,0 +1,88 @@
+import json
+from collections import Counter
+
+import pytest
+
+from fault_site import FaultSiteHandler, digest, start_local_server
+
+
+# Module-level caches and run globals; each test starts from a fresh copy.
+FRESH_GLOBALS = {
+    'HTTP_ARCHIVE': None,
+    'RUN_CLOCK': None,
+    'STATE_SNAPSHOT': None,
+    'RUN_CHECKPOINT': None,
+    'IMAGE_STORE': None,
+    'EXTRACT_STORE': None,
+    'IMAGE_STRATEGY_STATS': None,
+    'IMAGE_PROBES': None,
+    'HEDGE_STATS': None,
+    'HEDGING': False,
+    'PAGE_SAVE_DIR': None,
+}
+FRESH_MEMOS = {
+    'GNEWS_DECODED': dict,
+    'GNEWS_FAILED': set,
+    'GNEWS_REQUESTS': Counter,
+    'CANONICAL_URLS': dict,
+    'EXTRACT_CACHE': dict,
+    'PAGE_HEADS': dict,
+    'FEED_VALIDATORS': dict,
+    'PENDING_FEED_VALIDATORS': dict,
+}
+
+
+def new_process():
+    # What a separate worker process would start from; only the disk is shared.
+    if digest.STATE_SNAPSHOT is not None:
+        digest.STATE_SNAPSHOT.close()
+    for name, value in FRESH_GLOBALS.items():
+        setattr(digest, name, value)
+    for name, factory in FRESH_MEMOS.items():
+        setattr(digest, name, factory())
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    # Outputs land in the test's own directory, state in .digest_state under it.
+    monkeypatch.chdir(tmp_path)
+    for name, value in FRESH_GLOBALS.items():
+        monkeypatch.setattr(digest, name, value)
+    for name, factory in FRESH_MEMOS.items():
+        monkeypatch.setattr(digest, name, factory())
+    monkeypatch.setattr(digest, 'STATE_DIR', str(tmp_path / '.digest_state'))
+    monkeypatch.setattr(digest, 'FETCH_WORKERS', digest.FETCH_WORKERS)
+    monkeypatch.setattr(digest, 'HEDGE_MAX_FRACTION', digest.HEDGE_MAX_FRACTION)
+    monkeypatch.setattr(digest, 'HTTP_TIMEOUT', digest.HTTP_TIMEOUT)
+    monkeypatch.setattr(FaultSiteHandler, 'faults', {})
+    yield tmp_path
+    if digest.STATE_SNAPSHOT is not None:
+        digest.STATE_SNAPSHOT.close()
+
+
+@pytest.fixture(scope='session')
+def fault_site():
+    server, base = start_local_server(FaultSiteHandler)
+    yield base
+    server.shutdown()
+
+
+@pytest.fixture
+def registry_file(run_dir, fault_site):
+    # Two categories over the fault site; feed f2 is in both, as shared feeds are in feeds.json.
+    registry = {'categories': [
+        {'name': 'regional', 'icon': 'R', 'label': 'Regional', 'keywords': 'national', 'max_articles': 4,
+         'feeds': [f"{fault_site}/feed/f0.xml", f"{fault_site}/feed/f1.xml"]},
+        {'name': 'national', 'icon': 'N', 'label': 'National', 'max_articles': 4,
+         'feeds': [f"{fault_site}/feed/f2.xml", f"{fault_site}/feed/f3.xml"]},
+    ]}
+    path = run_dir / 'feeds.json'
+    path.write_text(json.dumps(registry), encoding='utf-8')
+    return str(path)
+
+
+def digest_json(run_dir):
+    # The JSON feed of the day's digest.
+    paths = sorted(run_dir.glob('IIRS_SpaceNews_Daily_*.json'))
+    assert len(paths) == 1
+    return json.loads(paths[0].read_text(encoding='utf-8'))
@@ -0,0 +1,245 @@
+import base64
+import email.utils
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import iirs_space_digest_git as digest  # noqa: E402
+
+
+# Stand-ins for remote services, served from a thread on 127.0.0.1 so the
+# tests and bench_stub_services.py exercise the real client code with no network.
+
+def start_local_server(handler_class):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stub_article_id(target_url):
+    return base64.urlsafe_b64encode(target_url.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+class GoogleNewsStubHandler(BaseHTTPRequestHandler):
+    # Mimics the params page and the batchexecute endpoint. Article ids are
+    # base64 of the publisher URL, so the stub can answer any of them.
+    latency = 0.02
+    throttle_every = 0
+    counts = Counter()
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def throttled(self, kind):
+        time.sleep(self.latency)
+        with self.lock:
+            self.counts[kind] += 1
+            number = self.counts['params'] + self.counts['batch']
+        if self.throttle_every and number % self.throttle_every == 0:
+            self.counts['throttled'] += 1
+            self.send_response(429)
+            self.send_header('Retry-After', '0.2')
+            self.end_headers()
+            return True
+        return False
+
+    def reply(self, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.throttled('params'):
+            return
+        article_id = urlparse(self.path).path.rsplit('/', 1)[-1]
+        self.reply(
+            f'<c-wiz><div jscontroller="x" data-n-a-sg="sig-{article_id[:12]}" '
+            f'data-n-a-ts="1700000000"></div></c-wiz>',
+            'text/html; charset=utf-8'
+        )
+
+    def do_POST(self):
+        if self.throttled('batch'):
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        rows = []
+        for envelope in json.loads(form['f.req'][0])[0]:
+            inner = json.loads(envelope[1])
+            article_id, signature = inner[2], inner[4]
+            if signature != f"sig-{article_id[:12]}":
+                continue
+            target = base64.urlsafe_b64decode(article_id + '=' * (-len(article_id) % 4)).decode('utf-8')
+            rows.append(['wrb.fr', 'Fbv4je', json.dumps(['garturlres', target, 1]), None, None, None, envelope[3]])
+        rows.append(['di', 12])
+        self.reply(")]}'\n\n" + json.dumps(rows), 'application/json; charset=utf-8')
+
+
+class FaultSiteHandler(BaseHTTPRequestHandler):
+    # A small news site - /feed/<f>.xml, /page/<f>-<n>.html, /img/<f>-<n>.jpg -
+    # with faults injected per kind ('feed', 'page', 'img'). A profile may set:
+    #   delay          ('fixed', s) | ('uniform', lo, hi) | ('lognormal', median, sigma)
+    #   error_rate     share of paths answered with a 503
+    #   stall_rate     share of paths that stop mid-body for `stall` seconds
+    #   oversize_rate  share of paths padded to `oversize` bytes
+    #   malformed_rate share of feeds cut off inside an unclosed item
+    #   content_type   served instead of the real type
+    #   etag           send an ETag and answer a matching If-None-Match with 304
+    # Which paths misbehave is seeded by the path, so every run sees the same.
+    faults = {}
+    stories = 8
+    image_cache = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def profile(self, kind):
+        return self.faults.get(kind, {})
+
+    def chance(self, name, rate):
+        return rate > 0 and random.Random(f"{name}:{self.path}").random() < rate
+
+    def delay(self, kind):
+        spec = self.profile(kind).get('delay')
+        if not spec:
+            return
+        rng = random.Random(f"delay:{self.path}")
+        if spec[0] == 'fixed':
+            seconds = spec[1]
+        elif spec[0] == 'uniform':
+            seconds = rng.uniform(spec[1], spec[2])
+        else:
+            seconds = rng.lognormvariate(math.log(spec[1]), spec[2])
+        time.sleep(min(seconds, 60))
+
+    def story_xml(self, base, feed_id, n):
+        published = digest.run_now(timezone.utc) - timedelta(minutes=10 + 25 * n)
+        return (
+            f"<item><title>ISRO mission update {feed_id}-{n}: satellite checkout continues</title>"
+            f"<link>{base}/page/{feed_id}-{n}.html</link><guid>{base}/page/{feed_id}-{n}.html</guid>"
+            f"<pubDate>{email.utils.format_datetime(published)}</pubDate>"
+            f"<description>Short wire summary for story {feed_id}-{n}.</description></item>"
+        )
+
+    def feed_body(self, base, feed_id, kind):
+        items = [self.story_xml(base, feed_id, n) for n in range(self.stories)]
+        if self.chance('malformed', self.profile(kind).get('malformed_rate', 0)):
+            items = items[:self.stories // 2] + ['<item><title>Truncated & unescaped <b>story']
+            return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Fault feed {feed_id}</title>' + ''.join(items)
+        return (
+            f'<?xml version="1.0"?><rss version="2.0"><channel><title>Fault feed {feed_id}</title>'
+            + ''.join(items) + '</channel></rss>'
+        )
+
+    def page_body(self, base, story_id):
+        paragraphs = ''.join(
+            f"<p>Paragraph {i} of story {story_id}: engineers at the spaceport reported that the "
+            f"satellite completed its orbit-raising manoeuvres and the payload checks are on schedule.</p>"
+            for i in range(6)
+        )
+        return (
+            f'<html><head><title>Story {story_id}</title>'
+            f'<link rel="canonical" href="{base}/page/{story_id}.html">'
+            f'<link rel="amphtml" href="{base}/page/{story_id}.html?amp=1">'
+            f'<meta property="og:image" content="{base}/img/{story_id}.jpg"></head>'
+            f'<body><article><h1>ISRO mission update {story_id}</h1>{paragraphs}</article></body></html>'
+        )
+
+    def image_body(self, story_id):
+        with self.lock:
+            if story_id not in self.image_cache:
+                if digest.Image is None:
+                    data = base64.b64decode('R0lGODlhAQABAIAAAP///wAAACH5BAEAAAAALAAAAAABAAEAAAICRAEAOw==')
+                else:
+                    rng = random.Random(story_id)
+                    img = digest.Image.frombytes('L', (96, 64), bytes(rng.getrandbits(8) for _ in range(96 * 64)))
+                    out = BytesIO()
+                    img.resize((640, 360)).convert('RGB').save(out, 'JPEG')
+                    data = out.getvalue()
+                self.image_cache[story_id] = data
+            return self.image_cache[story_id]
+
+    def route(self):
+        match = re.match(r'^/(feed|page|img)/([\w-]+)\.(xml|html|jpg)$', urlparse(self.path).path)
+        if not match:
+            return None, None, None
+        kind, name = match.group(1), match.group(2)
+        base = f"http://{self.headers.get('Host')}"
+        if kind == 'feed':
+            return kind, self.feed_body(base, name, kind).encode('utf-8'), 'application/rss+xml'
+        if kind == 'page':
+            return kind, self.page_body(base, name).encode('utf-8'), 'text/html; charset=utf-8'
+        return kind, self.image_body(name), 'image/jpeg'
+
+    def respond(self, with_body):
+        kind, body, content_type = self.route()
+        if kind is None:
+            self.send_error(404)
+            return
+
+        profile = self.profile(kind)
+        self.delay(kind)
+        if self.chance('error', profile.get('error_rate', 0)):
+            self.send_error(503)
+            return
+
+        declared = True
+        if self.chance('oversize', profile.get('oversize_rate', 0)):
+            # Half announce their size up front; the rest only reveal it by streaming.
+            declared = self.chance('declared', 0.5)
+            body = body + b' ' * (profile.get('oversize', 50 * 1024 * 1024) - len(body))
+        stall = self.chance('stall', profile.get('stall_rate', 0))
+
+        etag = f'"{hashlib.sha1(body).hexdigest()}"' if profile.get('etag') else None
+        if etag and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', profile.get('content_type', content_type))
+        if etag:
+            self.send_header('ETag', etag)
+        if declared:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not with_body:
+            return
+
+        try:
+            if stall:
+                self.wfile.write(body[:len(body) // 2])
+                self.wfile.flush()
+                time.sleep(profile.get('stall', 30))
+                body = body[len(body) // 2:]
+            for i in range(0, len(body), 65536):
+                self.wfile.write(body[i:i + 65536])
+        except OSError:
+            # The client gave up on us, which is the point.
+            pass
+
+    def do_GET(self):
+        self.respond(True)
+
+    def do_HEAD(self):
+        self.respond(False)
@@ -0,0 +1,63 @@
+import filecmp
+import os
+
+import pytest
+import requests
+
+from conftest import digest, new_process
+
+
+def test_archive_round_trips_responses_and_errors(tmp_path):
+    path = str(tmp_path / 'run.arc')
+    writer = digest.HttpArchiveWriter(path, {'argv': ['--catch-up', '6']})
+    writer.record('GET https://example.com/a', {
+        'url': 'https://example.com/a', 'status': 200,
+        'headers': {'Content-Type': 'text/html'}, 'encoding': 'utf-8',
+    }, b'<p>archived</p>')
+    writer.record('GET https://example.com/down', {'error': 'ConnectTimeout: too slow'})
+    writer.close()
+
+    reader = digest.HttpArchiveReader(path)
+    assert reader.meta['argv'] == ['--catch-up', '6']
+    response = reader.replay('GET https://example.com/a')
+    assert response.status_code == 200 and response.text == '<p>archived</p>'
+    assert response.headers['content-type'] == 'text/html'
+    with pytest.raises(requests.ConnectionError, match='too slow'):
+        reader.replay('GET https://example.com/down')
+    with pytest.raises(requests.ConnectionError, match='not in archive'):
+        reader.replay('GET https://example.com/other')
+    assert reader.misses == 1
+    reader.close()
+
+
+def test_interrupted_recording_is_rejected(tmp_path):
+    path = tmp_path / 'cut.arc'
+    writer = digest.HttpArchiveWriter(str(path), {})
+    writer.file.flush()
+    with pytest.raises(ValueError, match='no index'):
+        digest.HttpArchiveReader(str(path))
+    writer.close()
+
+
+def test_replay_rebuilds_the_recorded_digest_offline(run_dir, registry_file, monkeypatch):
+    archive = str(run_dir / 'run.arc')
+    for name in ('recorded', 'replayed'):
+        os.makedirs(run_dir / name)
+
+    monkeypatch.chdir(run_dir / 'recorded')
+    digest.main(['--feeds', registry_file, '--no-watermarks', '--record-archive', archive])
+
+    new_process()
+    monkeypatch.chdir(run_dir / 'replayed')
+
+    def offline(*args, **kwargs):
+        raise AssertionError("replay went to the network")
+    monkeypatch.setattr(requests.Session, 'request', offline)
+    digest.main(['--replay-archive', archive])
+
+    recorded = sorted(os.listdir(run_dir / 'recorded'))
+    assert recorded == sorted(os.listdir(run_dir / 'replayed'))
+    files = [name for name in recorded if os.path.isfile(run_dir / 'recorded' / name)]
+    assert any(name.endswith('.docx') for name in files) and any(name.endswith('.html') for name in files)
+    match, mismatch, errors = filecmp.cmpfiles(run_dir / 'recorded', run_dir / 'replayed', files, shallow=False)
+    assert (mismatch, errors) == ([], [])
@@ -0,0 +1,66 @@
+import os
+import zipfile
+from datetime import date
+from io import BytesIO
+
+import pytest
+
+from conftest import digest
+
+
+def no_network(*args, **kwargs):
+    raise AssertionError("compendium went to the network")
+
+
+def test_published_items_keep_empty_bodies_apart_from_missing_ones(run_dir):
+    day = date(2026, 1, 5)
+    digest.append_article_records([
+        {'title': 'Full', 'link': 'https://example.com/full', 'body': ['One.', 'Two.']},
+        {'title': 'Empty', 'link': 'https://example.com/empty', 'body': []},
+        {'title': 'Missing', 'link': 'https://example.com/missing'},
+    ], day)
+
+    bodies = {item['title']: item['body'] for item in digest.load_published_items(day)}
+    assert bodies == {'Full': ['One.', 'Two.'], 'Empty': [], 'Missing': None}
+
+
+def test_compendium_reads_stored_images_without_downloading(run_dir, monkeypatch):
+    if digest.Image is None:
+        pytest.skip("needs Pillow")
+    day = date(2026, 1, 5)
+    url = 'https://images.example.com/stored.jpg'
+    out = BytesIO()
+    digest.Image.new('RGB', (64, 48), 'navy').save(out, 'JPEG')
+    store = digest.get_image_store()
+    store.write_blob('stored', out.getvalue(), {'bytes': len(out.getvalue())})
+    store.urls[url] = 'stored'
+    digest.append_article_records([
+        {'title': 'Stored', 'link': 'https://example.com/stored', 'image': url, 'body': ['Text.']},
+    ], day)
+
+    monkeypatch.setattr(digest, 'http_get', no_network)
+
+    [path] = digest.generate_compendium('weekly', day, output_dir=str(run_dir))
+    with zipfile.ZipFile(path) as docx:
+        assert any(name.startswith('word/media/') for name in docx.namelist())
+
+
+def test_compendium_splits_volumes_and_skips_repeated_links(run_dir, monkeypatch):
+    monkeypatch.setattr(digest, 'http_get', no_network)
+    end = date(2026, 1, 7)
+    for offset in range(3):
+        day = date(2026, 1, 5 + offset)
+        digest.append_article_records([
+            {'title': f'Story {day:%d}-{n}', 'link': f'https://example.com/{day:%d}-{n}', 'body': ['Text.']}
+            for n in range(2)
+        ] + [{'title': 'Repeated', 'link': 'https://example.com/repeated', 'body': ['Again.']}], day)
+
+    records = list(digest.iter_article_records(date(2026, 1, 5), end))
+    assert len(records) == 7
+    assert not hasattr(records[0], '__dict__')
+
+    paths = digest.generate_compendium('weekly', end, output_dir=str(run_dir), volume_size=3)
+    assert [os.path.basename(path) for path in paths] == [
+        f'iirs_weekly_space_compendium_07_01_2026_vol0{n}.docx' for n in (1, 2, 3)
+    ]
+    assert all(zipfile.is_zipfile(path) for path in paths)
@@ -0,0 +1,105 @@
+import pytest
+
+from conftest import digest, digest_json
+
+
+RUN_ARGS = ['--no-watermarks', '--formats', 'html,json']
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    # Feed lists each category fetch was asked for.
+    calls = []
+    original = digest.fetch_news_from_feeds
+
+    def counting(feeds, **kwargs):
+        calls.append([feed['url'] for feed in feeds])
+        return original(feeds, **kwargs)
+
+    monkeypatch.setattr(digest, 'fetch_news_from_feeds', counting)
+    return calls
+
+
+def crash(*args, **kwargs):
+    raise RuntimeError("killed")
+
+
+def test_resume_after_crash_while_rendering(run_dir, registry_file, fetches, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(digest, 'render_digest', crash)
+        with pytest.raises(RuntimeError):
+            digest.main(['--feeds', registry_file] + RUN_ARGS)
+    assert len(fetches) == 2
+    checkpoint = digest.load_json_state(digest.CHECKPOINT_STATE)
+    assert set(checkpoint['categories']) == {'regional', 'national'}
+    # Bodies were settled before rendering, so the checkpoint carries them.
+    assert all(item.get('body') for items in checkpoint['categories'].values() for item in items)
+
+    fetches.clear()
+    digest.main(['--feeds', registry_file] + RUN_ARGS)
+    assert fetches == []
+    assert len(digest_json(run_dir)['items']) == 8
+    assert digest.load_json_state(digest.CHECKPOINT_STATE) is None
+
+
+def test_resume_fetches_only_unfinished_categories(run_dir, registry_file, fetches, monkeypatch):
+    counting = digest.fetch_news_from_feeds
+
+    def crash_on_second(feeds, **kwargs):
+        if len(fetches) == 1:
+            raise RuntimeError("killed")
+        return counting(feeds, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(digest, 'fetch_news_from_feeds', crash_on_second)
+        with pytest.raises(RuntimeError):
+            digest.main(['--feeds', registry_file] + RUN_ARGS)
+    checkpoint = digest.load_json_state(digest.CHECKPOINT_STATE)
+    assert set(checkpoint['categories']) == {'regional'}
+
+    fetches.clear()
+    digest.main(['--feeds', registry_file] + RUN_ARGS)
+    assert len(fetches) == 1 and fetches[0][0].endswith('/feed/f2.xml')
+    tags = [item['tags'][0] for item in digest_json(run_dir)['items']]
+    assert tags.count('R Regional') == 4 and tags.count('N National') == 4
+
+
+def test_no_resume_and_changed_options_start_over(run_dir, registry_file, fetches, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(digest, 'render_digest', crash)
+        with pytest.raises(RuntimeError):
+            digest.main(['--feeds', registry_file] + RUN_ARGS)
+
+    fetches.clear()
+    digest.main(['--feeds', registry_file, '--no-resume'] + RUN_ARGS)
+    assert len(fetches) == 2
+
+    with monkeypatch.context() as patch:
+        patch.setattr(digest, 'render_digest', crash)
+        with pytest.raises(RuntimeError):
+            digest.main(['--feeds', registry_file] + RUN_ARGS)
+    fetches.clear()
+    digest.main(['--feeds', registry_file, '--catch-up', '48'] + RUN_ARGS)
+    assert len(fetches) == 2
+
+
+def test_resumed_run_keeps_the_finished_categories_feed_state(run_dir, registry_file, fetches, monkeypatch):
+    counting = digest.fetch_news_from_feeds
+
+    def crash_on_second(feeds, **kwargs):
+        if len(fetches) == 1:
+            raise RuntimeError("killed")
+        return counting(feeds, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(digest, 'fetch_news_from_feeds', crash_on_second)
+        with pytest.raises(RuntimeError):
+            digest.main(['--feeds', registry_file, '--formats', 'json'])
+    # Nothing is saved for good until the run publishes.
+    assert digest.load_json_state(digest.WATERMARK_STATE) is None
+
+    digest.main(['--feeds', registry_file, '--formats', 'json'])
+    feeds = digest.registry_feed_urls(digest.load_feed_registry(registry_file))
+    assert set(digest.load_json_state(digest.WATERMARK_STATE)) == set(feeds)
+    stats = digest.load_json_state(digest.FEED_STATS_STATE)
+    assert {url: stats[url]['runs'] for url in feeds} == {url: 1 for url in feeds}
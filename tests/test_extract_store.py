@@ -0,0 +1,54 @@
+import requests
+
+from conftest import digest, new_process
+from fault_site import FaultSiteHandler
+
+
+def response(content, status=200, headers=None):
+    r = requests.Response()
+    r.status_code = status
+    r._content = content
+    r.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    return r
+
+
+def test_lookup_reuses_extracts_of_unchanged_pages(run_dir):
+    store = digest.ExtractStore({})
+    url = 'https://example.com/story'
+    extract = {'body': ['Text.']}
+    assert store.lookup(url, response(b'v1')) is None
+    store.put(url, response(b'v1', headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 05 Jan 2026 10:00:00 GMT'}),
+              extract)
+
+    assert store.validators(url) == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 05 Jan 2026 10:00:00 GMT'}
+    assert store.lookup(url, response(b'', status=304)) == extract
+    assert store.lookup(url, response(b'v1')) == extract
+    assert store.lookup(url, response(b'v2')) is None
+    assert store.counts == {'parsed': 2, 'revalidated': 1, 'unchanged': 1}
+
+
+def test_next_run_revalidates_instead_of_parsing(run_dir, fault_site, monkeypatch):
+    monkeypatch.setattr(FaultSiteHandler, 'faults', {'page': {'etag': True}})
+    url = f"{fault_site}/page/store-0.html"
+    first = digest.get_page_extract(url)
+    assert first
+    digest.get_extract_store().save()
+
+    new_process()
+
+    def no_parse(*args):
+        raise AssertionError("an unchanged page was parsed again")
+    monkeypatch.setattr(digest, 'extract_page', no_parse)
+    assert digest.get_page_extract(url) == first
+    assert digest.get_extract_store().counts['revalidated'] == 1
+
+
+def test_changed_page_is_parsed_again(run_dir, fault_site):
+    url = f"{fault_site}/page/store-1.html"
+    store = digest.get_extract_store()
+    store.put(url, response(b'an older copy', headers={'ETag': '"old"'}), {'body': ['Old.']})
+
+    fresh = digest.get_page_extract(url)
+    assert fresh and fresh != {'body': ['Old.']}
+    assert store.counts['parsed'] == 1
+    assert store.pages[url]['extract'] == fresh
@@ -0,0 +1,33 @@
+import json
+import os
+
+from conftest import digest
+
+
+def test_saved_pages_are_benchmarked_against_gold_labels(run_dir, registry_file):
+    corpus = str(run_dir / 'pages')
+    digest.main(['--feeds', registry_file, '--no-watermarks', '--formats', 'json', '--save-pages', corpus])
+    pages = digest.load_saved_pages(corpus)
+    assert pages and all('/page/' in url for _, url, _ in pages)
+
+    digest.benchmark_extractors(corpus, repeats=1)
+    with open(os.path.join(corpus, 'gold.template.json'), encoding='utf-8') as f:
+        template = json.load(f)
+    assert set(template) == {name for name, _, _ in pages}
+    os.rename(os.path.join(corpus, 'gold.template.json'), os.path.join(corpus, digest.EXTRACTOR_GOLD))
+
+    digest.benchmark_extractors(corpus, repeats=1)
+    with open(os.path.join(corpus, digest.EXTRACTOR_RESULTS), encoding='utf-8') as f:
+        first, second = [json.loads(line) for line in f]
+    assert first['corpus'] == second['corpus'] and first['labelled'] == 0
+    assert second['labelled'] == len(pages)
+    assert second['extractors']['image/head']['agreement'] == 1.0
+    assert second['extractors']['image/head']['success'] == 1.0
+
+
+def test_agreement_measures():
+    assert digest.same_image('https://www.example.com/a.jpg?w=800', 'http://example.com/a.jpg')
+    assert not digest.same_image(None, 'http://example.com/a.jpg')
+    assert digest.body_f1('Satellite reached orbit', 'satellite reached orbit') == 1.0
+    assert digest.body_f1('', 'satellite') == 0.0
+    assert 0 < digest.body_f1('satellite reached orbit today', 'satellite reached orbit') < 1
@@ -0,0 +1,68 @@
+import contextlib
+import time
+from io import StringIO
+
+import pytest
+
+from conftest import digest
+from fault_site import FaultSiteHandler
+
+
+# Each scenario runs feed fetching, page extraction and image downloads
+# against FaultSiteHandler and must stay inside its bounds:
+# (name, faults, max seconds, min items, min full bodies, min images).
+FAULT_FEEDS = 3
+FAULT_MAX_ARTICLES = 12
+FAULT_HTTP_TIMEOUT = 2
+FAULT_SCENARIOS = [
+    ('baseline', {}, 5, 12, 12, 12),
+    ('slow tail', {
+        'page': {'delay': ('lognormal', 0.05, 2.0)},
+        'img': {'delay': ('lognormal', 0.05, 2.0)},
+    }, 12, 12, 8, 6),
+    ('5xx errors', {
+        'feed': {'error_rate': 0.34},
+        'page': {'error_rate': 0.3},
+        'img': {'error_rate': 0.3},
+    }, 5, 8, 6, 3),
+    ('mid-body stalls', {
+        'feed': {'stall_rate': 0.34, 'stall': 30},
+        'page': {'stall_rate': 0.3, 'stall': 30},
+        'img': {'stall_rate': 0.3, 'stall': 30},
+    }, 12, 8, 6, 3),
+    ('oversized', {
+        'page': {'oversize_rate': 0.3},
+        'img': {'oversize_rate': 0.3, 'oversize': 20 * 1024 * 1024},
+    }, 8, 12, 6, 3),
+    ('malformed xml', {'feed': {'malformed_rate': 1.0}}, 5, 12, 12, 12),
+    ('wrong content type', {'img': {'content_type': 'text/html'}}, 5, 12, 12, 0),
+    ('everything', {
+        'feed': {'error_rate': 0.2, 'malformed_rate': 0.5, 'delay': ('uniform', 0, 0.5)},
+        'page': {'delay': ('lognormal', 0.05, 2.0), 'error_rate': 0.15, 'stall_rate': 0.15,
+                 'oversize_rate': 0.1},
+        'img': {'error_rate': 0.15, 'stall_rate': 0.1, 'content_type': 'application/octet-stream'},
+    }, 15, 4, 2, 0),
+]
+
+
+@pytest.mark.parametrize('name,faults,max_seconds,min_items,min_bodies,min_images', FAULT_SCENARIOS,
+                         ids=[scenario[0] for scenario in FAULT_SCENARIOS])
+def test_fault_scenario(run_dir, fault_site, monkeypatch, name, faults, max_seconds, min_items, min_bodies,
+                        min_images):
+    monkeypatch.setattr(digest, 'HTTP_TIMEOUT', FAULT_HTTP_TIMEOUT)
+    monkeypatch.setattr(FaultSiteHandler, 'faults', faults)
+    feeds = [{'url': f"{fault_site}/feed/f{n}.xml", 'priority': 1.0} for n in range(FAULT_FEEDS)]
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(StringIO()):
+        news = digest.fetch_news_from_feeds(feeds, max_articles=FAULT_MAX_ARTICLES,
+                                            keyword_pattern=digest.NATIONAL_KEYWORDS)
+        digest.build_digest_model(news, [], '', '')
+    elapsed = time.perf_counter() - start
+
+    bodies = sum(1 for item in news if len(' '.join(item.get('body') or [])) >= digest.MIN_BODY_CHARS)
+    images = sum(1 for item in news if item.get('image') and digest.get_image_store().get(item['image']))
+    assert elapsed <= max_seconds
+    assert len(news) >= min_items
+    assert bodies >= min_bodies
+    assert images >= min_images
@@ -0,0 +1,60 @@
+import json
+import os
+
+from conftest import digest
+
+
+REPO_REGISTRY = os.path.join(os.path.dirname(os.path.abspath(digest.__file__)), 'feeds.json')
+
+
+def test_registry_defaults_and_disabled_feeds(tmp_path):
+    path = tmp_path / 'feeds.json'
+    path.write_text(json.dumps({'categories': [
+        {'name': 'regional', 'icon': 'R', 'feeds': [
+            'https://a.example/feed',
+            {'url': 'https://b.example/feed', 'priority': 2},
+            {'url': 'https://c.example/feed', 'enabled': False},
+        ]},
+        {'name': 'custom', 'keywords': r'(?i)\bgaganyaan\b', 'max_articles': 3, 'edition': True, 'feeds': []},
+    ]}), encoding='utf-8')
+
+    regional, custom = digest.load_feed_registry(str(path))
+    assert regional['feeds'] == [
+        {'url': 'https://a.example/feed', 'priority': 1.0},
+        {'url': 'https://b.example/feed', 'priority': 2.0},
+    ]
+    assert regional['label'] == 'R Regional' and regional['max_articles'] == 6
+    assert regional['keyword_pattern'] == digest.REGIONAL_KEYWORDS
+    assert custom['keyword_pattern'] == r'(?i)\bgaganyaan\b'
+    assert custom['max_articles'] == 3 and custom['edition']
+
+
+def test_shipped_registry_loads():
+    categories = digest.load_feed_registry(REPO_REGISTRY)
+    assert categories and all(category['feeds'] for category in categories)
+
+
+def test_feeds_are_ordered_by_expected_yield_per_second(run_dir):
+    stats = digest.FeedStats({})
+    for _ in range(3):
+        stats.record('fast', passed=4, latency=0.5)
+        stats.record('slow', passed=4, latency=8.0)
+        stats.record('broken', error=True, latency=1.0)
+    feeds = [{'url': url, 'priority': 1.0} for url in ('broken', 'slow', 'new-a', 'fast', 'new-b')]
+
+    order = [feed['url'] for feed in stats.order(feeds)]
+    assert order[0] == 'fast'
+    # Feeds without history start from the prior and keep their file order.
+    assert order.index('new-a') < order.index('new-b')
+    assert order.index('new-b') < order.index('slow')
+    assert order[-1] == 'broken'
+
+
+def test_feed_rank_weight_stays_in_bounds(run_dir):
+    stats = digest.FeedStats({})
+    for _ in range(5):
+        stats.record('prolific', passed=50, latency=0.1)
+        stats.record('broken', error=True, latency=10.0)
+    assert stats.rank_weight('new') == 1.0
+    assert 1.0 < stats.rank_weight('prolific') <= digest.FEED_RANK_MAX
+    assert stats.rank_weight('broken') == digest.FEED_RANK_MIN
@@ -0,0 +1,56 @@
+from collections import Counter
+
+import pytest
+
+from conftest import digest
+from fault_site import GoogleNewsStubHandler, start_local_server, stub_article_id
+
+
+@pytest.fixture(scope='module')
+def gnews_stub():
+    server, base = start_local_server(GoogleNewsStubHandler)
+    yield base
+    server.shutdown()
+
+
+@pytest.fixture
+def stub(run_dir, gnews_stub, monkeypatch):
+    monkeypatch.setattr(digest, 'GOOGLE_NEWS_BASE', gnews_stub)
+    monkeypatch.setattr(digest, 'GNEWS_BACKOFF_SECONDS', 0.05)
+    monkeypatch.setattr(GoogleNewsStubHandler, 'latency', 0)
+    monkeypatch.setattr(GoogleNewsStubHandler, 'throttle_every', 0)
+    monkeypatch.setattr(GoogleNewsStubHandler, 'counts', Counter())
+    return GoogleNewsStubHandler
+
+
+def links(count):
+    targets = [f"https://publisher.example/space/story-{n}" for n in range(count)]
+    return targets, [f"https://news.google.com/rss/articles/{stub_article_id(t)}?oc=5" for t in targets]
+
+
+def test_links_are_decoded_in_batches_once_each(stub):
+    targets, urls = links(25)
+    decoded = digest.decode_google_news_urls(urls + urls[:5])
+
+    assert [decoded[url] for url in urls] == targets
+    assert stub.counts['params'] == 25
+    assert stub.counts['batch'] == 2
+
+    again = digest.decode_google_news_urls(urls)
+    assert [again[url] for url in urls] == targets
+    assert stub.counts['params'] + stub.counts['batch'] == 27
+
+
+def test_throttled_requests_back_off_and_retry(stub):
+    stub.throttle_every = 4
+    targets, urls = links(10)
+    decoded = digest.decode_google_news_urls(urls)
+
+    assert [decoded[url] for url in urls] == targets
+    assert stub.counts['throttled'] >= 2
+
+
+def test_other_links_pass_through(stub):
+    url = 'https://publisher.example/space/direct'
+    assert digest.decode_google_news_urls([url]) == {url: url}
+    assert not stub.counts
@@ -0,0 +1,85 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from conftest import digest
+from fault_site import start_local_server
+
+
+SLOW_SECONDS = 2.0
+
+
+class SlowFirstHandler(BaseHTTPRequestHandler):
+    # The first request for a plain page path stalls; AMP copies and repeats answer at once.
+    seen = set()
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.lock:
+            first = self.path not in self.seen
+            self.seen.add(self.path)
+        if first and '?amp=1' not in self.path:
+            time.sleep(SLOW_SECONDS)
+        body = f'<html><body>{self.path}</body></html>'.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope='module')
+def slow_site():
+    server, base = start_local_server(SlowFirstHandler)
+    yield base
+    server.shutdown()
+
+
+@pytest.fixture
+def hedging(run_dir, monkeypatch):
+    monkeypatch.setattr(digest, 'HEDGING', True)
+    monkeypatch.setattr(digest, 'HEDGE_MAX_FRACTION', 1.0)
+    # Past fetches all took 50 ms, so hedging starts after the minimum delay.
+    monkeypatch.setattr(digest, 'HEDGE_STATS', digest.HedgeStats([0.05] * 20))
+    return digest.HEDGE_STATS
+
+
+def timed_get(url):
+    started = time.perf_counter()
+    response = digest.hedged_get(url)
+    return response, time.perf_counter() - started
+
+
+def test_slow_page_is_raced_against_its_amp_copy(hedging, slow_site):
+    url = f"{slow_site}/page/race.html"
+    digest.PAGE_HEADS[url] = f'<link rel="amphtml" href="{slow_site}/page/race.html?amp=1">'
+    response, elapsed = timed_get(url)
+    assert response.text.endswith('?amp=1</body></html>')
+    assert elapsed < SLOW_SECONDS
+    assert hedging.wins == {'amp': 1} and hedging.hedges == 1
+
+
+def test_page_without_a_known_copy_is_retried_on_a_fresh_connection(hedging, slow_site):
+    response, elapsed = timed_get(f"{slow_site}/page/fresh-race.html")
+    assert response.status_code == 200 and elapsed < SLOW_SECONDS
+    assert hedging.wins == {'fresh': 1}
+    # The primary was cut off, but its sample still says it was slow.
+    assert hedging.samples[-1] >= digest.HEDGE_MIN_DELAY
+
+
+def test_hedges_stop_at_the_cap(hedging, slow_site, monkeypatch):
+    monkeypatch.setattr(digest, 'HEDGE_MAX_FRACTION', 0.1)
+    response, elapsed = timed_get(f"{slow_site}/page/capped.html")
+    assert response.status_code == 200 and elapsed >= SLOW_SECONDS
+    assert hedging.hedges == 0 and hedging.wins == {'primary': 1}
+
+
+def test_hedge_delay_follows_past_fetch_times():
+    assert digest.HedgeStats([0.05] * 5).delay() == digest.HEDGE_INITIAL_DELAY
+    assert digest.HedgeStats([0.05] * 20).delay() == digest.HEDGE_MIN_DELAY
+    assert digest.HedgeStats([0.1] * 18 + [0.9, 3.0]).delay() == 0.9
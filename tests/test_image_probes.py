@@ -0,0 +1,55 @@
+import base64
+
+import pytest
+
+from conftest import digest
+
+
+TRACKER_GIF = base64.b64decode('R0lGODlhAQABAIAAAP///wAAACH5BAEAAAAALAAAAAABAAEAAAICRAEAOw==')
+
+
+def test_header_verdicts():
+    cache = digest.ImageProbeCache({})
+    assert digest.parse_image_header(TRACKER_GIF) == ('gif', 1, 1)
+    assert cache.verdict({'format': 'gif', 'width': 1, 'height': 1}) == 'tracker'
+    assert cache.verdict({'format': 'jpeg', 'width': 120, 'height': 90}) == 'small'
+    assert cache.verdict({'format': 'svg', 'width': None, 'height': None}) == 'format'
+    assert cache.verdict({'error': 'HTTP 404'}) == 'error'
+    assert cache.verdict({'format': 'png', 'width': None, 'height': None}) is None
+    assert cache.verdict({'format': 'jpeg', 'width': 640, 'height': 360}) is None
+
+
+def test_screen_drops_unusable_candidates_and_caches_the_rest(run_dir, fault_site):
+    if digest.Image is None:
+        pytest.skip("needs Pillow")
+    good = f"{fault_site}/img/probe-0.jpg"
+    missing = f"{fault_site}/img/missing/photo.jpg"
+    page = f"{fault_site}/page/probe-0.html"
+    items = [{'image_candidates': [missing, page, good]}]
+
+    digest.screen_image_candidates(items)
+    cache = digest.get_image_probes()
+    assert items[0]['image_candidates'] == [good] and items[0]['image'] == good
+    assert cache.probes[good]['width'] == 640 and cache.probes[good]['read'] < 64 * 1024
+    assert cache.counts['probed'] == 3 and cache.counts['error'] == 2
+    assert set(cache.failed) == {missing, page}
+
+    cache.save()
+    digest.IMAGE_PROBES = None
+    # The next run reads the good probe back; only the failure is tried again.
+    digest.screen_image_candidates([{'image_candidates': [good, missing]}])
+    counts = digest.get_image_probes().counts
+    assert counts['cached'] == 1 and counts['probed'] == 1
+
+
+def test_failures_are_forgotten_between_refreshes(run_dir, fault_site):
+    missing = f"{fault_site}/img/missing/photo.jpg"
+    cache = digest.get_image_probes()
+    cache.probe_all([missing])
+    cache.probe_all([missing])
+    assert cache.counts['probed'] == 1 and cache.counts['cached'] == 1
+
+    digest.reset_run_memos(False)
+    assert not cache.failed
+    cache.probe_all([missing])
+    assert cache.counts['probed'] == 2
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from conftest import digest
+
+
+def flip(phash, bits):
+    # phash with the given bit positions inverted.
+    value = int(phash, 16)
+    for bit in bits:
+        value ^= 1 << bit
+    return f'{value:016x}'
+
+
+def test_find_similar_picks_the_closest_indexed_hash(run_dir):
+    store = digest.get_image_store()
+    base = '0f1e2d3c4b5a6978'
+    store.write_blob('far', b'far', {'phash': flip(base, [0, 9, 18, 27, 36]), 'bytes': 3})
+    store.write_blob('near', b'near', {'phash': flip(base, [63]), 'bytes': 4})
+    store.write_blob('other', b'other', {'phash': flip(base, range(0, 64, 8)), 'bytes': 5})
+
+    assert store.find_similar(base) == 'near'
+    # Spread over every byte, so no band is shared with anything stored.
+    assert store.find_similar(flip(base, range(3, 64, 8))) is None
+    assert store.find_similar(None) is None
+
+
+def test_lru_eviction_drops_blobs_urls_and_thumbnails(run_dir, fault_site, monkeypatch):
+    if digest.Image is None:
+        pytest.skip("needs Pillow")
+    store = digest.get_image_store()
+    urls = [f"{fault_site}/img/lru-{n}.jpg" for n in range(3)]
+    records = [store.get(url) for url in urls]
+    for used, record in enumerate(records):
+        store.blobs[record['sha']]['used'] = used
+    items = [{'image': url} for url in urls]
+    digest.prepare_thumbnails(items, asset_dir=str(run_dir / 'assets'))
+    thumb_files = os.listdir(digest.state_path(digest.THUMB_STATE_DIR))
+
+    monkeypatch.setattr(digest, 'IMAGE_STORE_MAX_BYTES', records[1]['bytes'] + records[2]['bytes'])
+    store.save()
+    oldest = records[0]['sha']
+    assert oldest not in store.blobs and urls[0] not in store.urls
+    assert not os.path.exists(store.blob_path(oldest))
+    assert all(store.record(record['sha']) for record in records[1:])
+    assert digest.load_json_state(digest.IMAGE_INDEX_STATE)['blobs'].keys() == store.blobs.keys()
+
+    digest.prepare_thumbnails([], asset_dir=str(run_dir / 'assets'))
+    left = os.listdir(digest.state_path(digest.THUMB_STATE_DIR))
+    assert not any(name.startswith(oldest[:20]) for name in left)
+    assert len(left) == len(thumb_files) * 2 // 3
+    assert oldest not in digest.load_json_state(digest.THUMB_INDEX_STATE)
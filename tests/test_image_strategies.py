@@ -0,0 +1,36 @@
+from conftest import digest
+
+
+def test_strategy_with_only_broken_images_is_a_miss(run_dir, fault_site):
+    entry = {'media_content': [{'url': f"{fault_site}/img/missing/photo.jpg"}]}
+    article_url = f"{fault_site}/page/strategy-0.html"
+
+    candidates = digest.extract_image_candidates(entry, article_url)
+
+    stats = digest.get_image_strategy_stats().domains[digest.image_domain(article_url)]
+    assert stats['feed'] == [1, 0]
+    assert stats['head'] == [1, 1]
+    assert candidates[0] == f"{fault_site}/img/strategy-0.jpg"
+
+
+def test_usable_feed_image_wins_without_a_page_request(run_dir, fault_site):
+    entry = {'media_content': [{'url': f"{fault_site}/img/strategy-1.jpg"}]}
+    article_url = f"{fault_site}/page/strategy-1.html"
+
+    candidates = digest.extract_image_candidates(entry, article_url)
+
+    stats = digest.get_image_strategy_stats().domains[digest.image_domain(article_url)]
+    assert stats['feed'] == [1, 1] and 'head' not in stats
+    assert candidates == [f"{fault_site}/img/strategy-1.jpg"]
+    assert article_url not in digest.PAGE_HEADS
+
+
+def test_winning_strategy_contributes_only_usable_images_first(run_dir, fault_site):
+    broken = f"{fault_site}/img/missing/photo.jpg"
+    entry = {'media_content': [{'url': broken}, {'url': f"{fault_site}/img/strategy-2.jpg"}]}
+    article_url = f"{fault_site}/page/strategy-2.html"
+
+    candidates = digest.extract_image_candidates(entry, article_url)
+
+    assert candidates[0] == f"{fault_site}/img/strategy-2.jpg"
+    assert candidates.index(broken) > 0
@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import digest
+
+
+RUN_ARGS = ['--no-watermarks', '--formats', 'html,json']
+
+
+def test_over_budget_run_saves_state_before_failing(run_dir, registry_file):
+    with pytest.raises(SystemExit, match='exceeds the 1 KB budget'):
+        digest.main(['--feeds', registry_file, '--page-budget-kb', '1'] + RUN_ARGS)
+
+    assert list(run_dir.glob('IIRS_SpaceNews_Daily_*.html'))
+    assert digest.load_json_state(digest.EXTRACT_STORE_STATE)['pages']
+    assert digest.load_json_state(digest.FEED_STATS_STATE)
+    assert digest.load_json_state(digest.IMAGE_INDEX_STATE)['blobs']
+    assert digest.load_json_state(digest.CHECKPOINT_STATE) is None
+
+
+def test_budget_warning_does_not_fail(run_dir, registry_file, capsys):
+    digest.main(['--feeds', registry_file, '--page-budget-kb', '1', '--page-budget-warn'] + RUN_ARGS)
+    assert '⚠️ Page weight' in capsys.readouterr().out
+
+
+def test_page_within_budget_passes(run_dir, registry_file):
+    digest.main(['--feeds', registry_file, '--page-budget-kb', '100000'] + RUN_ARGS)
+
+
+def test_assets_are_content_hashed_and_lite_drops_effects(tmp_path):
+    asset_dir = str(tmp_path / 'assets')
+    full = digest.write_static_assets('full', asset_dir)
+    lite = digest.write_static_assets('lite', asset_dir)
+
+    assert full == digest.write_static_assets('full', asset_dir)
+    assert full['js'] == lite['js']
+    assert full['css']['href'] != lite['css']['href']
+    assert lite['css']['bytes'] < full['css']['bytes']
+    css = (tmp_path / lite['css']['href']).read_text(encoding='utf-8')
+    assert '/*' not in css and '@keyframes' not in css and 'backdrop-filter' not in css
+
+    page = digest.build_html_page([], 'now', lite)
+    assert f'href="{lite["css"]["href"]}"' in page and f'src="{lite["js"]["href"]}"' in page
+
+
+def test_check_page_budget_limits():
+    digest.check_page_budget(2048, None)
+    digest.check_page_budget(None, 1)
+    digest.check_page_budget(1024, 1)
+    with pytest.raises(SystemExit):
+        digest.check_page_budget(1025, 1)
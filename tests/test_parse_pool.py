@@ -0,0 +1,36 @@
+import os
+
+import requests
+
+from conftest import digest, digest_json, new_process
+
+
+def test_pool_parses_pages_like_the_main_process(run_dir, fault_site):
+    url = f"{fault_site}/page/pool-0.html"
+    page = requests.get(url, timeout=10).content
+    in_process = digest.run_parser(digest.extract_page, url, page, 'utf-8')
+
+    digest.start_parse_pool(2)
+    try:
+        worker_pids = {digest.run_parser(digest.parse_worker_ready) for _ in range(4)}
+        pooled = digest.run_parser(digest.extract_page, url, page, 'utf-8')
+    finally:
+        digest.stop_parse_pool()
+
+    assert os.getpid() not in worker_pids
+    assert pooled == in_process
+    assert digest.PARSE_POOL is None
+
+
+def test_run_with_parse_workers_publishes_the_same_items(run_dir, registry_file):
+    def run(*extra):
+        new_process()
+        for path in run_dir.glob('IIRS_SpaceNews_Daily_*'):
+            os.remove(path)
+        digest.main(['--feeds', registry_file, '--no-watermarks', '--formats', 'json'] + list(extra))
+        return [(item['url'], item['title'], item.get('content_text')) for item in digest_json(run_dir)['items']]
+
+    inline = run('--state-dir', str(run_dir / 'inline'))
+    pooled = run('--state-dir', str(run_dir / 'pooled'), '--parse-workers', '2')
+    assert pooled == inline and inline
+    assert digest.PARSE_POOL is None
@@ -0,0 +1,36 @@
+import time
+
+from conftest import digest
+
+
+def rank_candidates(seconds):
+    # Named like the digest's ranker, so samples taken here count as ranking.
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+def test_main_thread_samples_are_attributed_to_stages():
+    profiler = digest.SamplingProfiler(interval=0.002)
+    profiler.start()
+    rank_candidates(0.3)
+    time.sleep(0.05)
+    profiler.stop()
+
+    assert profiler.stage_wall['ranking'] > profiler.stage_wall['other']
+    assert any(stack.startswith('main;ranking;') for stack in profiler.stacks)
+    assert profiler.total_samples[digest.profile_frame_label(rank_candidates.__code__)]
+
+
+def test_profiled_run_writes_folded_stacks_and_a_summary(run_dir, registry_file):
+    digest.main(['--feeds', registry_file, '--no-watermarks', '--formats', 'html,json', '--profile'])
+
+    [folded] = run_dir.glob('IIRS_SpaceNews_Daily_*.profile.folded')
+    [summary] = run_dir.glob('IIRS_SpaceNews_Daily_*.profile.txt')
+    for line in folded.read_text(encoding='utf-8').splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert stack.split(';')[0] and int(count) > 0
+    text = summary.read_text(encoding='utf-8')
+    assert text.startswith('Run ') and f"Top {digest.PROFILE_TOP_N} functions" in text
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from conftest import digest
+
+
+NOW = datetime(2026, 1, 5, 12, tzinfo=timezone.utc)
+
+
+def candidate(title, summary=''):
+    return {'title': title, 'summary': summary, 'link': f"https://example.com/{len(title)}", 'published': NOW}
+
+
+def test_keywords_with_groups_score_whole_matches():
+    candidates = [candidate('Chandrayaan (lander) update'), candidate('Rover news', 'chandrayaan rover')]
+    digest.score_candidates(candidates, r'(?i)(chandra)(yaan)|(rover)', now=NOW)
+    assert all(c['score'] > 0 for c in candidates)
+
+
+def test_distinctive_terms_outrank_common_ones():
+    candidates = [candidate(f'ISRO launch update {n}', 'launch window opens') for n in range(4)]
+    candidates.append(candidate('Gaganyaan crew module test', 'launch window opens'))
+    digest.score_candidates(candidates, r'(?i)\b(?:launch|gaganyaan|isro)\b', now=NOW)
+    assert max(candidates, key=lambda c: c['score'])['title'].startswith('Gaganyaan')
+
+
+def test_title_terms_weigh_more_and_old_news_less():
+    pattern = r'(?i)\bchandrayaan\b'
+    in_title = candidate('Chandrayaan orbit raised')
+    in_summary = candidate('Orbit raised', 'Chandrayaan orbit raised')
+    stale = dict(candidate('Chandrayaan orbit raised again'), published=NOW - timedelta(hours=36))
+    digest.score_candidates([in_title, in_summary, stale], pattern, now=NOW)
+    assert in_title['score'] > in_summary['score']
+    assert in_title['score'] > stale['score'] >= in_title['score'] * digest.MIN_RECENCY_FACTOR
+
+
+def test_rank_candidates_drops_cheap_duplicates():
+    first = dict(candidate('ISRO launch'), link='https://example.com/story?id=1')
+    tracked = dict(candidate('ISRO launch today'), link='https://example.com/story?id=1&utm_source=rss')
+    retitled = dict(candidate('ISRO  launch!'), link='https://other.example/isro')
+    ranked = digest.rank_candidates([first, tracked, retitled], r'(?i)\b(?:isro|launch)\b', top_n=3, now=NOW)
+    assert len(ranked) == 1
+
+
+def test_rank_selection_enriches_only_the_top_n(run_dir, fault_site, monkeypatch):
+    pages = []
+    http_get = digest.http_get
+
+    def counting(url, *args, **kwargs):
+        if '/page/' in url:
+            pages.append(url.split('?')[0])
+        return http_get(url, *args, **kwargs)
+    monkeypatch.setattr(digest, 'http_get', counting)
+
+    feeds = [{'url': f"{fault_site}/feed/rank{n}.xml", 'priority': 1.0} for n in range(2)]
+    candidates = []
+    news = digest.fetch_news_from_feeds(feeds, max_articles=3, keyword_pattern=digest.NATIONAL_KEYWORDS,
+                                        candidates=candidates)
+    assert len(news) == 3
+    assert len(candidates) == 16
+    assert set(pages) == {item['link'] for item in news}
@@ -0,0 +1,50 @@
+import argparse
+import json
+
+import pytest
+import requests
+
+from conftest import digest, digest_json
+
+
+def test_parse_formats_keeps_known_names():
+    assert digest.parse_formats('html, json') == ['html', 'json']
+
+
+@pytest.mark.parametrize('value', ['', ' , ', 'html,pdf'])
+def test_parse_formats_rejects_empty_and_unknown_lists(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        digest.parse_formats(value)
+
+
+def test_every_format_renders_from_the_model_without_network(run_dir, registry_file, monkeypatch):
+    registry = json.loads(open(registry_file, encoding='utf-8').read())
+    registry['categories'][1]['edition'] = True
+    with open(registry_file, 'w', encoding='utf-8') as f:
+        json.dump(registry, f)
+
+    render_digest = digest.render_digest
+    rendered = []
+
+    def offline_render(model, args):
+        rendered.append(model)
+        def offline(*args, **kwargs):
+            raise AssertionError("a renderer went to the network")
+        with monkeypatch.context() as patch:
+            patch.setattr(requests.Session, 'request', offline)
+            render_digest(model, args)
+    monkeypatch.setattr(digest, 'render_digest', offline_render)
+
+    digest.main(['--feeds', registry_file, '--no-watermarks'])
+    assert len(rendered) == 1
+
+    feed = digest_json(run_dir)
+    assert feed['version'] == 'https://jsonfeed.org/version/1.1'
+    titles = [item['title'] for item in feed['items']]
+    assert len(titles) == 8
+    [text] = run_dir.glob('IIRS_SpaceNews_Email_*.txt')
+    assert all(title in text.read_text(encoding='utf-8') for title in titles)
+    assert list(run_dir.glob('IIRS_SpaceNews_Email_*.html'))
+    assert list(run_dir.glob('iirs_daily_space_digest_*.docx'))
+    assert [path.name.split('_')[1] for path in run_dir.glob('iirs_*_space_digest_*.docx')
+            if 'daily' not in path.name] == ['national']
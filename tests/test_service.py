@@ -0,0 +1,54 @@
+import pytest
+import requests
+
+from conftest import digest
+from fault_site import start_local_server
+
+
+@pytest.fixture
+def service(run_dir, registry_file, monkeypatch):
+    args = digest.parse_args(['--feeds', registry_file, '--no-watermarks'])
+    args.incremental = True
+    service = digest.DigestService(args, refresh_minutes=60)
+    monkeypatch.setattr(digest.DigestServiceHandler, 'service', service)
+    server, base = start_local_server(digest.DigestServiceHandler)
+    yield base
+    server.shutdown()
+
+
+def test_service_serves_the_digest_after_a_refresh(service):
+    assert requests.get(f"{service}/", timeout=10).status_code == 503
+
+    refreshed = requests.post(f"{service}/refresh", timeout=60)
+    assert refreshed.status_code == 200
+    assert refreshed.json()['new_items'] == 8 and refreshed.json()['error'] is None
+
+    page = requests.get(f"{service}/", timeout=10)
+    assert page.status_code == 200 and 'IIRS Daily Space Digest' in page.text
+    assert requests.get(f"{service}/status", timeout=10).json()['refreshes'] == 1
+    docx = requests.get(f"{service}/digest.docx", timeout=10)
+    assert docx.headers['Content-Disposition'].startswith('attachment;') and docx.content[:2] == b'PK'
+
+    css = page.text.split('<link rel="stylesheet" href="', 1)[1].split('"', 1)[0]
+    asset = requests.get(f"{service}/{css}", timeout=10)
+    assert asset.status_code == 200 and 'immutable' in asset.headers['Cache-Control']
+
+
+def test_service_refuses_paths_outside_the_assets(service):
+    for path in ('/assets/../feeds.json', '/assets/%2e%2e/feeds.json', '/feeds.json'):
+        assert requests.get(f"{service}{path}", timeout=10).status_code == 404
+    assert requests.post(f"{service}/other", timeout=10).status_code == 404
+
+
+def test_refresh_memos_retry_failures_and_reset_daily(run_dir):
+    digest.EXTRACT_CACHE.update({'ok': {'body': []}, 'failed': None})
+    digest.PAGE_HEADS.update({'ok': {}, 'failed': None})
+    digest.GNEWS_FAILED.add('gnews')
+    digest.GNEWS_DECODED['gnews-ok'] = 'https://publisher.example/'
+
+    digest.reset_run_memos(new_day=False)
+    assert digest.EXTRACT_CACHE == {'ok': {'body': []}} and digest.PAGE_HEADS == {'ok': {}}
+    assert not digest.GNEWS_FAILED and digest.GNEWS_DECODED
+
+    digest.reset_run_memos(new_day=True)
+    assert not digest.EXTRACT_CACHE and not digest.PAGE_HEADS and not digest.GNEWS_DECODED
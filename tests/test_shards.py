@@ -0,0 +1,105 @@
+import json
+import os
+
+import pytest
+
+from conftest import digest, digest_json, new_process
+
+
+RUN_ARGS = ['--no-watermarks', '--formats', 'html,json']
+
+
+def run(registry_file, *args):
+    # Each call stands for its own process, as workers and the merge are in CI.
+    new_process()
+    digest.main(['--feeds', registry_file] + list(args) + RUN_ARGS)
+
+
+def picks_by_category(run_dir):
+    picks = {}
+    for item in digest_json(run_dir)['items']:
+        picks.setdefault(item['tags'][0], set()).add(item['url'])
+    return picks
+
+
+def test_merge_picks_what_an_unsharded_run_picks(run_dir, registry_file):
+    run(registry_file, '--state-dir', str(run_dir / 'whole'))
+    whole = picks_by_category(run_dir)
+
+    for path in run_dir.glob('IIRS_SpaceNews_Daily_*'):
+        os.remove(path)
+    for shard in range(2):
+        run(registry_file, '--state-dir', str(run_dir / 'sharded'), '--shard', f'{shard}/2')
+    run(registry_file, '--state-dir', str(run_dir / 'sharded'), '--merge')
+
+    assert picks_by_category(run_dir) == whole
+    assert sum(len(links) for links in whole.values()) == 8
+
+
+def test_shard_caches_are_saved_once_by_the_merge(run_dir, registry_file):
+    for shard in range(2):
+        run(registry_file, '--shard', f'{shard}/2')
+    # Workers leave the shared caches alone; their changes wait in the partials.
+    assert digest.load_json_state(digest.EXTRACT_STORE_STATE) is None
+    shard_pages = []
+    for shard in range(2):
+        with open(os.path.join('shards', f'shard-{shard}-of-2.json'), encoding='utf-8') as f:
+            shard_pages.extend(json.load(f)['caches']['extracts']['pages'])
+    assert len(shard_pages) == len(set(shard_pages)) > 0
+
+    run(registry_file, '--merge')
+    stored = digest.load_json_state(digest.EXTRACT_STORE_STATE)['pages']
+    assert set(shard_pages) <= set(stored)
+
+
+def test_merge_uses_the_shards_it_has(run_dir, registry_file):
+    urls = digest.registry_feed_urls(digest.load_feed_registry(registry_file))
+    # The smallest shard count that leaves shard 0 with some feeds but not all.
+    count = next(n for n in range(2, 64) if 0 < sum(digest.shard_of(url, n) == 0 for url in urls) < len(urls))
+    run(registry_file, '--shard', f'0/{count}')
+    run(registry_file, '--merge')
+
+    feeds = {url.rsplit('/', 1)[-1].split('.')[0] for url in urls if digest.shard_of(url, count) == 0}
+    sources = {item['url'].rsplit('/', 1)[-1].split('-')[0] for item in digest_json(run_dir)['items']}
+    assert sources == feeds
+
+
+def test_local_shard_workers_get_only_fetch_options(registry_file):
+    args = digest.parse_args([
+        '--feeds', registry_file, '--catch-up', '6', '--local-shards', '3',
+        '--record-archive', 'run.arc', '--profile', '--formats', 'html',
+    ])
+    worker_argv = digest.shard_worker_argv(args)
+    assert worker_argv[:2] == ['--feeds', registry_file]
+    assert '--catch-up' in worker_argv
+    for flag in ('--local-shards', '--record-archive', '--profile', '--formats'):
+        assert flag not in worker_argv
+
+
+def test_local_shards_reject_archive_flags(run_dir, registry_file):
+    for flag in (['--record-archive', 'run.arc'], ['--replay-archive', 'run.arc']):
+        with pytest.raises(SystemExit, match='do not combine with --local-shards'):
+            digest.main(['--feeds', registry_file, '--local-shards', '2'] + flag)
+    assert not os.path.exists(run_dir / 'run.arc')
+
+
+def test_merge_of_the_same_partials_is_byte_identical(run_dir, registry_file):
+    for shard in range(2):
+        run(registry_file, '--shard', f'{shard}/2')
+    outputs = []
+    for _ in range(2):
+        for path in run_dir.glob('IIRS_SpaceNews_Daily_*'):
+            os.remove(path)
+        run(registry_file, '--merge', '--state-dir', str(run_dir / f'merge-{len(outputs)}'))
+        outputs.append({path.name: path.read_bytes() for path in run_dir.glob('IIRS_SpaceNews_Daily_*')})
+    assert outputs[0] == outputs[1] and outputs[0]
+
+
+def test_local_shards_run_workers_and_merge(run_dir, registry_file):
+    run(registry_file, '--state-dir', str(run_dir / 'whole'))
+    whole = picks_by_category(run_dir)
+
+    run(registry_file, '--state-dir', str(run_dir / 'local'), '--local-shards', '2')
+    assert sorted(name for name in os.listdir('shards') if name.endswith('.json')) == \
+        ['shard-0-of-2.json', 'shard-1-of-2.json']
+    assert picks_by_category(run_dir) == whole
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+from conftest import digest
+
+
+def snapshot_path():
+    return digest.state_path(digest.SNAPSHOT_FILE)
+
+
+def test_round_trip_and_delete(run_dir):
+    digest.save_json_state('a.json', {'x': 1})
+    digest.save_json_state('b.json', [1, 2, 3])
+    digest.save_json_state('a.json', {'x': 2})
+    assert digest.load_json_state('a.json') == {'x': 2}
+    assert digest.load_json_state('b.json') == [1, 2, 3]
+
+    digest.delete_json_state('a.json')
+    assert digest.load_json_state('a.json', 'gone') == 'gone'
+    assert set(digest.get_state_snapshot().names()) == {'b.json'}
+
+
+def test_legacy_json_file_is_read_until_saved(run_dir):
+    os.makedirs(digest.STATE_DIR, exist_ok=True)
+    with open(digest.state_path('old.json'), 'w', encoding='utf-8') as f:
+        f.write('{"kept": true}')
+    assert digest.load_json_state('old.json') == {'kept': True}
+
+    digest.save_json_state('old.json', {'kept': False})
+    assert not os.path.exists(digest.state_path('old.json'))
+    assert digest.load_json_state('old.json') == {'kept': False}
+
+
+def test_record_failing_its_checksum_reads_as_missing(run_dir):
+    digest.save_json_state('good.json', {'value': 'good'})
+    digest.save_json_state('bad.json', {'value': 'bad'})
+    snapshot = digest.get_state_snapshot()
+    offset, length, crc = snapshot.names()['bad.json']
+    snapshot.close()
+    with open(snapshot_path(), 'r+b') as f:
+        f.seek(offset + length // 2)
+        byte = f.read(1)
+        f.seek(offset + length // 2)
+        f.write(bytes([byte[0] ^ 0xff]))
+
+    with pytest.raises(digest.SnapshotCorrupt):
+        digest.get_state_snapshot().get('bad.json')
+    assert digest.load_json_state('bad.json', 'default') == 'default'
+    assert digest.load_json_state('good.json') == {'value': 'good'}
+
+
+def test_torn_write_falls_back_to_the_previous_index(run_dir):
+    digest.save_json_state('state.json', {'generation': 1})
+    size = os.path.getsize(snapshot_path())
+    digest.save_json_state('state.json', {'generation': 2})
+    # Cut the second save off inside its index, as a crash mid-write would.
+    with open(snapshot_path(), 'r+b') as f:
+        f.truncate(os.path.getsize(snapshot_path()) - 5)
+    digest.get_state_snapshot().open()
+
+    assert digest.load_json_state('state.json') == {'generation': 1}
+    digest.save_json_state('other.json', {'after': 'crash'})
+    assert os.path.getsize(snapshot_path()) > size
+    assert digest.load_json_state('state.json') == {'generation': 1}
+    assert digest.load_json_state('other.json') == {'after': 'crash'}
+
+
+def test_unreadable_snapshot_is_set_aside(run_dir):
+    os.makedirs(digest.STATE_DIR, exist_ok=True)
+    with open(snapshot_path(), 'wb') as f:
+        f.write(b'this is not a snapshot at all')
+
+    assert digest.load_json_state('state.json', 'default') == 'default'
+    digest.save_json_state('state.json', {'fresh': True})
+    assert os.path.exists(snapshot_path() + '.corrupt')
+    assert digest.load_json_state('state.json') == {'fresh': True}
+
+
+def test_compaction_keeps_live_records(run_dir, monkeypatch):
+    monkeypatch.setattr(digest, 'SNAPSHOT_COMPACT_MIN_BYTES', 4096)
+    digest.save_json_state('static.json', {'kept': 'as is'})
+    for n in range(200):
+        digest.save_json_state('busy.json', {'n': n, 'padding': 'x' * 200})
+
+    assert os.path.getsize(snapshot_path()) < 8 * 4096
+    assert digest.load_json_state('busy.json')['n'] == 199
+    assert digest.load_json_state('static.json') == {'kept': 'as is'}
+
+
+def test_saves_append_without_rewriting_earlier_records(run_dir):
+    digest.save_json_state('first.json', {'n': 1})
+    with open(snapshot_path(), 'rb') as f:
+        before = f.read()
+    offset, length, crc = digest.get_state_snapshot().names()['first.json']
+
+    digest.save_json_state('second.json', {'n': 2})
+    with open(snapshot_path(), 'rb') as f:
+        after = f.read()
+    assert after[:offset + length] == before[:offset + length]
+    assert digest.get_state_snapshot().names()['first.json'] == [offset, length, crc]
+
+
+def test_show_state_lists_records_and_prints_one(run_dir, capsys):
+    digest.save_json_state('shown.json', {'answer': 42})
+    digest.main(['--show-state'])
+    listing = capsys.readouterr().out
+    assert 'shown.json' in listing and 'crc' in listing
+
+    digest.main(['--show-state', 'shown.json'])
+    assert '"answer": 42' in capsys.readouterr().out
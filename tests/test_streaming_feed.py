@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+
+from conftest import digest
+
+
+CUTOFF = datetime(2026, 1, 5, 10, 30, tzinfo=timezone.utc)
+
+
+def rss(titles, hours=None):
+    # Entry n is published at 12:00 - n hours unless `hours` says otherwise.
+    hours = hours or [12 - n for n in range(len(titles))]
+    items = ''.join(
+        f"<item><title>{title}</title><link>https://example.com/{n}</link><guid>id-{n}</guid>"
+        f"<pubDate>Mon, 05 Jan 2026 {hour:02d}:00:00 GMT</pubDate></item>"
+        for n, (title, hour) in enumerate(zip(titles, hours))
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Test</title>{items}</channel></rss>'.encode()
+
+
+def ids(feed):
+    return [entry.get('id') for entry in feed.entries]
+
+
+def test_malformed_tail_is_recovered_once_by_feedparser():
+    feed = digest.StreamingFeed.from_bytes(rss(['a', 'b', 'c', 'R&D', 'e']), chunk_size=64)
+    assert ids(feed) == ['id-0', 'id-1', 'id-2', 'id-3', 'id-4']
+    assert feed.used_fallback
+
+
+def test_recovery_respects_the_entry_limit():
+    feed = digest.StreamingFeed.from_bytes(rss(['a', 'b', 'c', 'R&D', 'e']), limit=4, chunk_size=64)
+    assert ids(feed) == ['id-0', 'id-1', 'id-2', 'id-3']
+
+
+def test_newest_first_feed_stops_at_the_cutoff():
+    chunks = []
+
+    def tracked(data, size=64):
+        for i in range(0, len(data), size):
+            chunks.append(i)
+            yield data[i:i + size]
+
+    data = rss(['a', 'b', 'c', 'd', 'e', 'f'])
+    feed = digest.StreamingFeed(tracked(data), cutoff_time=CUTOFF)
+    assert ids(feed) == ['id-0', 'id-1']
+    assert feed.stopped_early and not feed.used_fallback
+    assert feed.feed['title'] == 'Test'
+    # The rest of the document was never read.
+    assert len(chunks) < len(range(0, len(data), 64))
+
+
+def test_out_of_order_feed_is_read_past_old_entries():
+    feed = digest.StreamingFeed.from_bytes(rss(['a', 'b', 'c', 'd'], hours=[11, 12, 8, 7]), cutoff_time=CUTOFF)
+    assert ids(feed) == ['id-0', 'id-1', 'id-2', 'id-3']
+    assert not feed.stopped_early
+
+
+def test_entry_limit_stops_the_stream():
+    feed = digest.StreamingFeed.from_bytes(rss(['a', 'b', 'c', 'd']), limit=2)
+    assert ids(feed) == ['id-0', 'id-1'] and feed.stopped_early
+
+
+def test_non_feed_document_falls_back_to_feedparser():
+    feed = digest.StreamingFeed.from_bytes(b'<html><body>Not a feed</body></html>')
+    assert feed.used_fallback
+    assert list(feed.entries) == []
+
+
+def test_stream_and_feedparser_agree_on_a_served_feed(run_dir, fault_site):
+    url = f"{fault_site}/feed/agree.xml"
+    streamed = list(digest.open_feed(url, parser_mode='stream').entries)
+    parsed = digest.open_feed(url, parser_mode='feedparser').entries
+    assert [(e['title'], e['link']) for e in streamed] == [(e['title'], e['link']) for e in parsed]
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from conftest import digest
+
+
+pytestmark = pytest.mark.skipif(digest.Image is None, reason="needs Pillow")
+
+
+def failing_format(fmt, monkeypatch):
+    save = digest.save_thumbnail_variant
+
+    def flaky(img, path, kind):
+        if kind == fmt:
+            raise OSError(f"encoder {kind} not available")
+        return save(img, path, kind)
+    monkeypatch.setattr(digest, 'save_thumbnail_variant', flaky)
+
+
+def test_missing_webp_encoder_leaves_jpeg_thumbnails(run_dir, fault_site, monkeypatch):
+    failing_format('webp', monkeypatch)
+    items = [{'image': f"{fault_site}/img/thumb-webp.jpg"}]
+    digest.prepare_thumbnails(items, asset_dir=str(run_dir / 'assets'))
+
+    thumb = items[0]['thumbnail']
+    assert thumb['src'].endswith('.jpg') and thumb['srcset_webp'] == ''
+    assert os.listdir(run_dir / 'assets' / 'img')
+
+
+def test_jpeg_failure_keeps_the_original_image(run_dir, fault_site, monkeypatch):
+    failing_format('jpg', monkeypatch)
+    items = [{'image': f"{fault_site}/img/thumb-jpg.jpg"}]
+    digest.prepare_thumbnails(items, asset_dir=str(run_dir / 'assets'))
+
+    assert 'thumbnail' not in items[0]
+    assert not digest.load_json_state(digest.THUMB_INDEX_STATE)
+
+
+def test_thumbnails_are_resized_published_and_reused(run_dir, fault_site, monkeypatch):
+    items = [{'image': f"{fault_site}/img/thumb-set.jpg"}]
+    asset_dir = str(run_dir / 'assets')
+    original_bytes, thumb_bytes = digest.prepare_thumbnails(items, asset_dir=asset_dir)
+
+    thumb = items[0]['thumbnail']
+    # The fault site's images are 640 px wide, so no variant is upscaled.
+    assert (thumb['width'], thumb['height']) == (640, 360)
+    assert thumb['srcset_jpg'].endswith('640w') and '400w' in thumb['srcset_jpg']
+    assert thumb['placeholder'].startswith('data:image/jpeg;base64,')
+    assert thumb_bytes < original_bytes
+    for entry in thumb['srcset_jpg'].split(', ') + thumb['srcset_webp'].split(', '):
+        assert os.path.exists(run_dir / entry.split()[0])
+
+    def no_resize(*args):
+        raise AssertionError("cached thumbnail was made again")
+    monkeypatch.setattr(digest, 'make_thumbnail_set', no_resize)
+    again = [{'image': items[0]['image']}]
+    digest.prepare_thumbnails(again, asset_dir=asset_dir)
+    assert again[0]['thumbnail'] == thumb
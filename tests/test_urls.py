@@ -0,0 +1,27 @@
+import pytest
+
+from conftest import digest
+
+
+@pytest.mark.parametrize('url,expected', [
+    ('https://Example.com:443/a?utm_source=x&id=7&fbclid=1', 'https://example.com/a?id=7'),
+    ('http://example.com:8080/a?flag&gclid=2', 'http://example.com:8080/a?flag'),
+    ('https://example.com/a?path=1%2F2&q=a+b', 'https://example.com/a?path=1%2F2&q=a+b'),
+    ('https://example.com/a?ref=home&spm=3.1', 'https://example.com/a?ref=home&spm=3.1'),
+    ('https://example.com/a?utm_medium=rss#top', 'https://example.com/a'),
+    ('https://example.com', 'https://example.com/'),
+    ('not a url', 'not a url'),
+])
+def test_normalize_url_drops_only_tracking_parameters(url, expected):
+    assert digest.normalize_url(url) == expected
+
+
+def test_canonical_key_folds_fetchable_variants():
+    keys = {digest.canonical_key(url) for url in (
+        'https://www.example.com/news/story/?b=2&a=1',
+        'http://amp.example.com/news/story/amp?a=1&b=2&utm_campaign=z',
+        'https://m.example.com/news/story?b=2&amp=1&a=1',
+    )}
+    assert len(keys) == 1
+    assert digest.canonical_key('https://example.com/news/story?ref=home') != \
+        digest.canonical_key('https://example.com/news/story')
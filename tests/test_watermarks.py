@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone
+
+from conftest import digest
+
+
+NOW = datetime(2026, 1, 5, 12, tzinfo=timezone.utc)
+FEED = 'https://example.com/feed.xml'
+
+
+def entry(n, hours_ago):
+    return {'id': f'id-{n}', 'published_dt': NOW - timedelta(hours=hours_ago)}
+
+
+def test_cutoff_starts_at_the_mark_within_the_lookback_cap(run_dir):
+    marks = digest.FeedWatermarks.load(NOW)
+    assert marks.cutoff_for(FEED) == NOW - timedelta(hours=digest.DEFAULT_WINDOW_HOURS)
+
+    marks.marks[FEED] = {'published': (NOW - timedelta(hours=30)).isoformat(), 'entry_id': 'id-0'}
+    assert marks.cutoff_for(FEED) == NOW - timedelta(hours=30)
+
+    marks.marks[FEED]['published'] = (NOW - timedelta(days=10)).isoformat()
+    assert marks.cutoff_for(FEED) == NOW - timedelta(hours=digest.MAX_LOOKBACK_HOURS)
+
+    caught_up = digest.FeedWatermarks(marks.marks, NOW - timedelta(hours=6), NOW - timedelta(hours=6))
+    assert caught_up.cutoff_for(FEED) == NOW - timedelta(hours=6)
+
+
+def test_complete_feed_moves_the_mark_to_its_newest_entry(run_dir):
+    marks = digest.FeedWatermarks.load(NOW)
+    for n, hours_ago in enumerate([3, 1, 2]):
+        marks.observe(FEED, entry(n, hours_ago))
+    marks.finish_feed(FEED, True, ['id-0', 'id-1', 'id-2'])
+    marks.save()
+
+    reloaded = digest.FeedWatermarks.load(NOW)
+    assert reloaded.cutoff_for(FEED) == NOW - timedelta(hours=1)
+    assert reloaded.is_seen(FEED, entry(1, 1))
+    assert not reloaded.is_seen(FEED, entry(3, 0.5))
+
+
+def test_feed_stopped_at_the_quota_keeps_its_lower_bound(run_dir):
+    marks = digest.FeedWatermarks.load(NOW)
+    first_cutoff = marks.cutoff_for(FEED)
+    marks.observe(FEED, entry(0, 1))
+    marks.finish_feed(FEED, False, ['id-0'])
+    marks.save()
+
+    reloaded = digest.FeedWatermarks.load(NOW)
+    assert reloaded.cutoff_for(FEED) == first_cutoff
+    assert reloaded.is_seen(FEED, entry(0, 1))
+    assert not reloaded.is_seen(FEED, entry(1, 2))